@@ -0,0 +1,59 @@
+import pytest
+from pathlib import Path
+from easydict import EasyDict
+
+from vortex.utils.data.dataset import dataset
+from vortex.utils.data.autotune import candidate_worker_counts, check_autotune_args
+from vortex.core.factory import create_dataloader
+
+def test_autotune_args():
+    assert candidate_worker_counts(0) == [0]
+    assert candidate_worker_counts(6) == [0, 1, 2, 4, 6]
+    assert candidate_worker_counts(8) == [0, 1, 2, 4, 8]
+    args = check_autotune_args(True)
+    assert args['max_workers'] >= 1 and args['warmup_batches'] == 10
+    with pytest.raises(RuntimeError):
+        check_autotune_args({'num_workers' : 2})
+
+def test_autotune_dataloader():
+    preprocess_args = EasyDict({
+        'input_size' : 64,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+    dummy_dataset_conf = EasyDict({
+        'train' : {
+            'dataset' : "DummyDataset",
+            'args' : {'total' : 16}
+        },
+        'dataloader' : {
+            'dataloader' : "DataLoader",
+            'args' : {
+                'batch_size' : 2,
+                'shuffle' : True,
+                'pin_memory' : False
+            },
+            'autotune' : {
+                'warmup_batches' : 2,
+                'max_workers' : 2,
+                'memory_budget' : 1024
+            }
+        }
+    })
+    dataset.register_dvc_dataset("dummy_dataset", path=Path("tests"))
+    dataloader = create_dataloader(dummy_dataset_conf, preprocess_config=preprocess_args, stage="train")
+    assert dataloader.num_workers in [0, 1, 2]
+    ## explicit setting is kept
+    assert dataloader.pin_memory is False
+    images, targets = next(iter(dataloader))
+    assert tuple(images.shape) == (2, 3, 64, 64)
+    ## same configuration reuses the selected setting
+    from vortex.utils.data import autotune
+    n_cached = len(autotune._autotune_cache)
+    assert create_dataloader(dummy_dataset_conf, preprocess_config=preprocess_args, stage="train").num_workers == dataloader.num_workers
+    assert len(autotune._autotune_cache) == n_cached
+    ## explicit worker count is not tuned
+    dummy_dataset_conf.dataloader.args.num_workers = 1
+    assert create_dataloader(dummy_dataset_conf, preprocess_config=preprocess_args, stage="train").num_workers == 1
@@ -0,0 +1,71 @@
+import torch
+from easydict import EasyDict
+
+from vortex.utils.data.augment import create_transform
+from vortex.utils.data.augment.batch import BatchAugmentCollate
+from vortex.utils.data.collater import create_collater
+
+data_format = EasyDict({
+    'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+    'class_label': {'indices': [4], 'axis': 1},
+    'landmarks': {'indices': [5, 6, 7, 8], 'axis': 1, 'asymm_pairs': [[0, 1]]},
+})
+
+input_normalization = EasyDict({'mean': [0., 0., 0.], 'std': [1., 1., 1.], 'scaler': 1})
+
+def _create_batch(n_boxes=[2, 1, 3, 4], height=64, width=96):
+    torch.manual_seed(0)
+    batch = []
+    for n in n_boxes:
+        xy, wh = torch.rand(n, 2) * 0.5, torch.rand(n, 2) * 0.3 + 0.1
+        landmarks = torch.cat((xy + wh * 0.3, xy + wh * 0.6), dim=1)
+        target = torch.cat((xy, wh, torch.randint(0, 3, (n, 1)).float(), landmarks), dim=1)
+        image = torch.randint(0, 255, (height, width, 3), dtype=torch.uint8)
+        batch.append((image, target))
+    return batch
+
+def _create_collater(transforms, collater=None):
+    augment = create_transform('batch_augment', transforms=transforms, data_format=data_format)
+    return BatchAugmentCollate(collater, [augment], data_format, input_normalization)
+
+def test_batch_horizontal_flip():
+    batch = _create_batch()
+    collater = _create_collater([{'transform': 'HorizontalFlip', 'args': {'p': 1.0}}])
+    images, targets = collater.apply(*collater(batch))
+    for (image, target), output_image, output in zip(batch, images, targets):
+        assert torch.equal(output_image, image.permute(2, 0, 1).flip(-1).float())
+        assert torch.allclose(output[:, 0], 1. - target[:, 0] - target[:, 2])
+        ## asymmetric keypoints are swapped
+        assert torch.allclose(output[:, 5], 1. - target[:, 7])
+        assert torch.allclose(output[:, 7], 1. - target[:, 5])
+
+def test_batch_affine():
+    batch = _create_batch()
+    collater = _create_collater([{'transform': 'RandomAffine',
+        'args': {'p': 1.0, 'degrees': 0., 'scale': 0., 'translate': [0.25, 0.25]}}])
+    images, targets = collater.apply(*collater(batch))
+    inputs = torch.stack([image for image, _ in batch]).permute(0, 3, 1, 2).float()
+    assert torch.equal(images[:, :, 16:, 24:], inputs[:, :, :48, :72])
+    for (_, target), output in zip(batch, targets):
+        assert torch.allclose(output[:, 0:2], target[:, 0:2] + 0.25)
+
+def test_batch_augment_collater():
+    batch = _create_batch()
+    transforms = [
+        {'transform': 'Mosaic', 'args': {'p': 1.0}},
+        {'transform': 'RandomAffine', 'args': {'p': 1.0, 'degrees': 10.}},
+        {'transform': 'HSVJitter', 'args': {'p': 1.0}},
+        {'transform': 'VerticalFlip', 'args': {'p': 0.5}},
+    ]
+    collater = _create_collater(transforms, create_collater('DarknetCollate', dataformat=data_format))
+    images, targets = collater.apply(*collater(batch))
+    assert images.shape == (4, 3, 64, 96) and images.dtype == torch.float32
+    assert targets.shape[1] == 6
+    ## every image keeps at least one box
+    assert torch.unique(targets[:, 0]).tolist() == [0., 1., 2., 3.]
+    assert torch.all(targets[:, 2:4] >= 0.) and torch.all(targets[:, 2:4] <= 1.)
+
+if __name__ == "__main__":
+    test_batch_horizontal_flip()
+    test_batch_affine()
+    test_batch_augment_collater()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from sklearn.metrics import average_precision_score, roc_auc_score, precision_recall_fscore_support
+
+from vortex.utils.metrics.accumulator import ClassificationAccumulator
+
+def get_data(n=300, n_classes=5, seed=0):
+    rng = np.random.RandomState(seed)
+    labels = rng.randint(n_classes, size=n)
+    predictions = np.where(rng.rand(n) < 0.5, labels, rng.randint(n_classes, size=n))
+    scores = rng.rand(n)
+    return labels, predictions, scores
+
+def test_confusion_matrix():
+    labels, predictions, scores = get_data()
+    ## capacity is grown when exceeded
+    accumulator = ClassificationAccumulator(n_samples=10)
+    for i in range(0, len(labels), 7):
+        accumulator.update(labels[i:i+7], predictions[i:i+7], scores[i:i+7])
+    assert accumulator.count == len(labels)
+    assert accumulator.correct == np.sum(labels == predictions)
+    expected = np.zeros((5, 5), dtype=np.int64)
+    np.add.at(expected, (labels, predictions), 1)
+    assert np.array_equal(accumulator.confusion, expected)
+    y_true, y_pred, weights = accumulator.confusion_pairs()
+    for average in ('micro', 'macro', 'weighted'):
+        assert np.allclose(
+            precision_recall_fscore_support(labels, predictions, average=average)[:3],
+            precision_recall_fscore_support(y_true, y_pred, average=average, sample_weight=weights)[:3]
+        )
+
+def test_curve_inputs():
+    labels, predictions, scores = get_data()
+    n_classes = 5
+    ## classes absent from ground truth don't change the curves
+    accumulator = ClassificationAccumulator(len(labels), n_classes + 2)
+    accumulator.update(labels, predictions, scores)
+    for class_label, class_scores, class_truths, class_weights in accumulator.curve_inputs():
+        ## equivalent to one hot score matrix of the samples of the class
+        index = labels == class_label
+        n = np.sum(index)
+        scores_mat = np.zeros((n, n_classes))
+        truths_mat = np.zeros((n, n_classes))
+        scores_mat[np.arange(n), predictions[index]] = scores[index]
+        truths_mat[:, class_label] = 1
+        assert np.isclose(
+            average_precision_score(truths_mat.flatten(), scores_mat.flatten()),
+            average_precision_score(class_truths, class_scores, sample_weight=class_weights)
+        )
+        assert np.isclose(
+            roc_auc_score(truths_mat.flatten(), scores_mat.flatten()),
+            roc_auc_score(class_truths, class_scores, sample_weight=class_weights)
+        )
+
+def test_merge_and_bins():
+    labels, predictions, scores = get_data()
+    for curve_bins in [None, 10]:
+        expected = ClassificationAccumulator(len(labels), curve_bins=curve_bins)
+        expected.update(labels, predictions, scores)
+        merged = ClassificationAccumulator(100, curve_bins=curve_bins)
+        merged.update(labels[:100], predictions[:100], scores[:100])
+        other = ClassificationAccumulator(200, curve_bins=curve_bins)
+        other.update(labels[100:], predictions[100:], scores[100:])
+        merged.merge(other)
+        assert np.array_equal(merged.confusion, expected.confusion)
+        for (c0, s0, t0, w0), (c1, s1, t1, w1) in zip(expected.curve_inputs(), merged.curve_inputs()):
+            assert c0 == c1
+            assert np.isclose(
+                average_precision_score(t0, s0, sample_weight=w0),
+                average_precision_score(t1, s1, sample_weight=w1)
+            )
+    ## bounded by the number of bins, positive and negative per bin and zero score entries
+    for _, class_scores, class_truths, class_weights in expected.curve_inputs():
+        assert len(class_scores) <= 2 * 10 + 2
+        assert np.all((class_scores >= 0) & (class_scores < 1))
+
+if __name__ == "__main__":
+    test_confusion_matrix()
+    test_curve_inputs()
+    test_merge_and_bins()
@@ -0,0 +1,65 @@
+import torch
+
+from easydict import EasyDict
+from vortex.utils.data.collater import create_collater
+from vortex.utils.data.collater.utils import unpad_targets
+
+darknet_format = EasyDict({
+    'class_label': {'indices': [4], 'axis': 1},
+    'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+})
+
+retinaface_format = EasyDict({
+    'class_label': None,
+    'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+    'landmarks': {'indices': [4, 5, 6, 7], 'axis': 1, 'asymm_pairs': []},
+})
+
+def _create_batch(n_columns, n_boxes=[3, 0, 1, 5]):
+    torch.manual_seed(0)
+    batch = []
+    for n in n_boxes:
+        image = torch.rand(3, 64, 64)
+        target = torch.rand(n, n_columns)
+        batch.append((image, target))
+    return batch
+
+def test_darknet_collater():
+    batch = _create_batch(5)
+    images, targets = create_collater('DarknetCollate', dataformat=darknet_format)(batch)
+    assert images.shape == (4, 3, 64, 64)
+    expected = torch.cat([torch.cat((torch.full((len(t), 1), float(i)), t[:, 4:5], t[:, 0:4]), dim=1)
+                          for i, (_, t) in enumerate(batch)])
+    assert torch.allclose(targets, expected)
+
+    images, (padded, mask) = create_collater('DarknetCollate', dataformat=darknet_format, padded=True)(batch)
+    assert padded.shape == (4, 5, 5) and mask.shape == (4, 5)
+    assert mask.sum(dim=1).tolist() == [3, 0, 1, 5]
+    values, image_index = unpad_targets(padded, mask)
+    assert torch.allclose(values, expected[:, 1:])
+    assert torch.equal(image_index.float(), expected[:, 0])
+
+def test_ssd_collater():
+    batch = _create_batch(5)
+    images, targets = create_collater('SSDCollate', dataformat=darknet_format)(batch)
+    assert isinstance(targets, list) and len(targets) == 4
+    for (_, target), output in zip(batch, targets):
+        expected = torch.cat((target[:, 0:2], target[:, 0:2] + target[:, 2:4], target[:, 4:5]), dim=1)
+        assert torch.allclose(output, expected)
+
+    images, (padded, mask) = create_collater('SSDCollate', dataformat=darknet_format, padded=True)(batch)
+    for i, output in enumerate(targets):
+        assert torch.allclose(padded[i][mask[i]], output)
+
+def test_retinaface_collater():
+    batch = _create_batch(8)
+    images, targets = create_collater('RetinaFaceCollate', dataformat=retinaface_format)(batch)
+    for (_, target), output in zip(batch, targets):
+        assert output.shape == (len(target), 9)
+        assert torch.allclose(output[:, 4:8], target[:, 4:8])
+        assert torch.all(output[:, 8] == 0)
+
+if __name__ == "__main__":
+    test_darknet_collater()
+    test_ssd_collater()
+    test_retinaface_collater()
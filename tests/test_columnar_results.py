@@ -0,0 +1,56 @@
+import numpy as np
+
+from vortex_runtime.basic_runtime import ColumnarResults, format_columns, IMAGE_INDEX
+
+classification_format = {
+    'class_label': {'indices': [0], 'axis': 0},
+    'class_confidence': {'indices': [1], 'axis': 0},
+}
+detection_format = {
+    'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+    'class_confidence': {'indices': [4], 'axis': 1},
+    'class_label': {'indices': [5], 'axis': 1},
+}
+
+def _per_image(outputs, output_format):
+    ## per image formatting, same as `BaseRuntime` results
+    return [{key: np.take(output, fmt['indices'], axis=fmt['axis']) if all(output.shape) else None
+             for key, fmt in output_format.items()} for output in outputs]
+
+def _assert_equal(results, expected):
+    assert len(results) == len(expected)
+    for result, other in zip(results, expected):
+        for key, value in other.items():
+            if value is None:
+                assert result[key] is None
+            else:
+                assert result[key].shape == value.shape
+                np.testing.assert_array_equal(result[key], value)
+
+def test_classification_columns():
+    outputs = np.random.rand(4, 2).astype(np.float32)
+    results = format_columns(outputs, classification_format)
+    assert isinstance(results, ColumnarResults)
+    assert results.row_per_image and results.n_images == 4
+    assert results['class_label'].shape == (4, 1)
+    np.testing.assert_array_equal(results[IMAGE_INDEX], np.arange(4))
+    _assert_equal(results.split(), _per_image(outputs, classification_format))
+    _assert_equal(results.head(3).split(), _per_image(outputs[:3], classification_format))
+
+def test_detection_columns():
+    outputs = [np.random.rand(3, 6), np.zeros((0, 6)), np.random.rand(2, 6), np.zeros((0, 6))]
+    results = format_columns(outputs, detection_format)
+    assert not results.row_per_image and results.n_images == 4
+    assert results['bounding_box'].shape == (5, 4)
+    np.testing.assert_array_equal(results[IMAGE_INDEX], [0, 0, 0, 2, 2])
+    _assert_equal(results.split(), _per_image(outputs, detection_format))
+    head = results.head(2)
+    assert head.n_images == 2 and len(head['class_label']) == 3
+    _assert_equal(head.split(), _per_image(outputs[:2], detection_format))
+
+    ## uniform batch array and batch without any detection
+    outputs = np.random.rand(2, 5, 6)
+    _assert_equal(format_columns(outputs, detection_format).split(), _per_image(outputs, detection_format))
+    results = format_columns([np.zeros((0, 6))] * 2, detection_format)
+    assert results['bounding_box'].shape == (0, 4)
+    assert all(result['bounding_box'] is None for result in results.split())
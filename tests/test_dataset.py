@@ -4,10 +4,14 @@ import subprocess
 from pathlib import Path
 proj_path = os.path.abspath(Path(__file__).parents[1])
 sys.path.append(proj_path)
+import pytest
+import numpy as np
 from easydict import EasyDict
 
 from vortex.utils.data.dataset import dataset
-from vortex.core.factory import create_dataset
+from vortex.utils.data.dataset.subset import create_subset_indices
+from vortex.utils.data.dataset.bucket import create_bucket_shapes, AspectRatioBatchSampler
+from vortex.core.factory import create_dataset, create_dataloader
 
 def test_dataset_register_dvc():
     dataset.register_dvc_dataset("dummy_dataset", path=Path("tests"))
@@ -64,8 +68,243 @@ def test_torchvision_dataset():
     assert isinstance(data.dataset[0][0], str), "ImageFolder expected to return input "\
         "of type 'str', got %s" % type(data.dataset[0][0])
 
+def test_dataset_subset():
+    preprocess_args = EasyDict({
+        'input_size' : 640,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+
+    dummy_dataset_conf = EasyDict(
+        {
+            'train' : {
+                'dataset' : "DummyDataset",
+                'args' : {
+                    'total' : 20
+                },
+                'subset' : {
+                    'count' : 5,
+                    'seed' : 1
+                }
+            }
+        }
+    )
+
+    dataset.register_dvc_dataset("dummy_dataset", path=Path("tests"))
+    ## dummy dataset labels are random, use the same labels for both datasets
+    np.random.seed(0)
+    data = create_dataset(dummy_dataset_conf, stage="train", preprocess_config=preprocess_args)
+    assert len(data) == 5
+    assert len(data.dataset) == 20
+    np.random.seed(0)
+    data_again = create_dataset(dummy_dataset_conf, stage="train", preprocess_config=preprocess_args)
+    assert data.subset_indices == data_again.subset_indices
+
+
+def test_subset_indices_stratified():
+    class LabelDataset:
+        def __init__(self, labels):
+            self.labels = labels
+        def __getitem__(self, index):
+            return 'image_%s.jpg' % index, self.labels[index]
+        def __len__(self):
+            return len(self.labels)
+
+    labels = [0] * 60 + [1] * 30 + [2] * 10
+    data_format = EasyDict({'class_label': None})
+    indices = create_subset_indices(LabelDataset(labels), data_format, fraction=0.1, seed=0)
+    assert len(indices) == 10
+    subset_labels = [labels[i] for i in indices]
+    assert subset_labels.count(0) == 6
+    assert subset_labels.count(1) == 3
+    assert subset_labels.count(2) == 1
+    assert indices == create_subset_indices(LabelDataset(labels), data_format, fraction=0.1, seed=0)
+    assert indices != create_subset_indices(LabelDataset(labels), data_format, fraction=0.1, seed=1)
+
+    detection_format = EasyDict({
+        'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+        'class_label': None,
+    })
+    indices = create_subset_indices(LabelDataset(labels), detection_format, count=7, seed=0)
+    assert len(indices) == 7 and len(set(indices)) == 7
+
+def test_lazy_dataset_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, 'all_datasets', {'torchvision.datasets': [], 'external': []})
+    monkeypatch.setattr(dataset, 'lazy_datasets', {})
+    root = tmp_path / 'datasets'
+    module_dir = root / 'lazy_dummy' / 'utils'
+    module_dir.mkdir(parents=True)
+    module_file = module_dir / 'dataset.py'
+    ## importing this module would fail, scanning must not import it
+    module_file.write_text("supported_dataset = ['LazyDummy']\nraise ImportError('imported')\n")
+    manifest_path = tmp_path / 'manifest.json'
+
+    found = dataset._scan_dvc_dataset(root, manifest_path=manifest_path)
+    assert found == {'lazy_dummy': ['LazyDummy']}
+    assert 'LazyDummy' in dataset.all_datasets['external']
+    assert dataset.lazy_datasets['LazyDummy'][0] == 'lazy_dummy'
+    assert manifest_path.exists()
+
+    ## modified module invalidates its manifest entry
+    module_file.write_text("supported_dataset = ['LazyDummy', 'LazyDummy2']\n")
+    os.utime(str(module_file), (0, 0))
+    found = dataset._scan_dvc_dataset(root, manifest_path=manifest_path)
+    assert found == {'lazy_dummy': ['LazyDummy', 'LazyDummy2']}
+    assert 'lazy_dummy' not in sys.modules
+
+    ## module failing to import is reported when its dataset is requested
+    module_file.write_text("supported_dataset = ['LazyDummy']\nraise ImportError('broken')\n")
+    with pytest.raises(ImportError, match='lazy_dummy.*broken'):
+        dataset.get_base_dataset('LazyDummy')
+
+def test_aspect_ratio_bucket():
+    ## wide, landscape, portrait and square images
+    image_shapes = [(720, 1280)] * 4 + [(480, 640)] * 4 + [(640, 480)] * 2 + [(500, 500)] * 2
+    bucket_ids, bucket_shapes = create_bucket_shapes(image_shapes, input_size=640, n_buckets=3, stride=32)
+    assert bucket_shapes.tolist() == [[384, 640], [480, 640], [640, 640]]
+    assert all(bucket_ids[:4] == 0) and all(bucket_ids[4:8] == 1) and all(bucket_ids[8:] == 2)
+    assert all(shape % 32 == 0 for shape in bucket_shapes.flatten())
+
+    sampler = AspectRatioBatchSampler(bucket_ids, batch_size=3, shuffle=True, seed=0)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 6
+    assert sorted(sum(batches, [])) == list(range(len(image_shapes)))
+    assert all(len(set(bucket_ids[batch])) == 1 for batch in batches)
+    assert batches != list(sampler), "expects different order on next epoch"
+    sampler = AspectRatioBatchSampler(bucket_ids, batch_size=3, drop_last=True)
+    assert len(list(sampler)) == len(sampler) == 3
+
+def test_dataset_aspect_ratio_bucket():
+    preprocess_args = EasyDict({
+        'input_size' : 640,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+    dummy_dataset_conf = EasyDict(
+        {
+            'train' : {
+                'dataset' : "DummyDataset",
+                'args' : {},
+                'aspect_ratio_bucket' : {
+                    'n_buckets' : 2,
+                    'stride' : 32
+                }
+            }
+        }
+    )
+
+    dataset.register_dvc_dataset("dummy_dataset", path=Path("tests"))
+    data = create_dataset(dummy_dataset_conf, stage="train", preprocess_config=preprocess_args)
+    assert data.bucket_shapes.tolist() == [[640, 640], [640, 640]]
+    assert tuple(data[0][0].shape) == (3, 640, 640)
+    batches = list(data.batch_sampler(batch_size=4))
+    assert sorted(sum(batches, [])) == list(range(len(data)))
+
+    ## collater without rectangular input support
+    dummy_dataset_conf.dataloader = EasyDict({'dataloader' : 'DataLoader', 'args' : {'batch_size' : 4}})
+    with pytest.raises(RuntimeError, match='aspect_ratio_bucket'):
+        create_dataloader(dummy_dataset_conf, preprocess_config=preprocess_args, stage='train',
+                          collate_fn=lambda batch: batch)
+
+def test_dataset_getitems():
+    preprocess_args = EasyDict({
+        'input_size' : 224,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+    dummy_dataset_conf = EasyDict(
+        {
+            'train' : {
+                'dataset' : "DummyDataset",
+                'args' : {},
+                'decode_threads' : 2
+            },
+            'dataloader' : {
+                'dataloader' : "DataLoader",
+                'args' : {
+                    'batch_size' : 4,
+                    'shuffle' : False
+                }
+            }
+        }
+    )
+
+    dataset.register_dvc_dataset("dummy_dataset", path=Path("tests"))
+    data = create_dataset(dummy_dataset_conf, stage="train", preprocess_config=preprocess_args)
+    assert data.decode_threads == 2
+    batch = data.__getitems__([0, 3, 5])
+    for index, (image, target) in zip([0, 3, 5], batch):
+        expected_image, expected_target = data[index]
+        assert (image == expected_image).all() and (target == expected_target).all()
+
+    dataloader = create_dataloader(dummy_dataset_conf, preprocess_config=preprocess_args, stage="train")
+    images, targets = next(iter(dataloader))
+    assert tuple(images.shape) == (4, 3, 224, 224)
+    assert len(dataloader) == 3
+
+def test_in_memory_torchvision_dataset(monkeypatch):
+    import torch
+    import torchvision.datasets
+
+    class FakeMNIST:
+        classes = [str(i) for i in range(10)]
+        def __init__(self, **kwargs):
+            generator = torch.Generator().manual_seed(0)
+            self.data = torch.randint(0, 255, (10, 28, 28), dtype=torch.uint8, generator=generator)
+            self.targets = torch.arange(10)
+        def __len__(self):
+            return len(self.data)
+
+    monkeypatch.setattr(torchvision.datasets, 'MNIST', FakeMNIST, raising=False)
+    preprocess_args = EasyDict({
+        'input_size' : 32,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+    mnist_conf = EasyDict(
+        {
+            'train' : {
+                'dataset' : "MNIST",
+                'args' : {}
+            },
+            'dataloader' : {
+                'dataloader' : "DataLoader",
+                'args' : {
+                    'batch_size' : 4,
+                    'shuffle' : False
+                }
+            }
+        }
+    )
+    data = create_dataset(mnist_conf, stage="train", preprocess_config=preprocess_args)
+    assert data.in_memory_batch and data.batch_fetch
+    batch = data.__getitems__([1, 4, 7])
+    for index, (image, target) in zip([1, 4, 7], batch):
+        ## same as per sample letterbox and normalization
+        expected_image, expected_target = data._get_item(index, data.dataset[index])
+        assert torch.allclose(image, expected_image, atol=2e-2)
+        assert target.tolist() == expected_target.tolist() == [index]
+
+    dataloader = create_dataloader(mnist_conf, preprocess_config=preprocess_args, stage="train")
+    images, targets = next(iter(dataloader))
+    assert tuple(images.shape) == (4, 3, 32, 32)
+    assert targets.flatten().tolist() == [0, 1, 2, 3]
+
 
 if __name__ == "__main__":
     test_dataset_register_dvc()
     test_create_dataset()
     test_torchvision_dataset()
+    test_dataset_subset()
+    test_subset_indices_stratified()
+    test_aspect_ratio_bucket()
+    test_dataset_aspect_ratio_bucket()
+    test_dataset_getitems()
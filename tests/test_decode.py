@@ -0,0 +1,46 @@
+import cv2
+import pytest
+import numpy as np
+
+from vortex.utils.data.decode import get_reduced_factor, read_image, read_video, video_fps
+
+def test_reduced_factor():
+    assert get_reduced_factor((1080, 1920), (224, 224)) == 8
+    assert get_reduced_factor((640, 480), (224, 224)) == 2
+    assert get_reduced_factor((480, 640), (256, 320)) == 2
+    assert get_reduced_factor((480, 640), (300, 400)) == 1
+    assert get_reduced_factor((200, 100), (224, 224)) == 1
+
+def test_read_image(tmp_path):
+    image = np.random.randint(0, 255, (960, 1280, 3), dtype=np.uint8)
+    jpg, png = str(tmp_path / 'image.jpg'), str(tmp_path / 'image.png')
+    cv2.imwrite(jpg, image)
+    cv2.imwrite(png, image)
+    for path, size, shape in [(jpg, (224, 224), (240, 320, 3)), (jpg, (480, 640), (480, 640, 3)),
+                              (jpg, None, (960, 1280, 3)), (png, (224, 224), (960, 1280, 3))]:
+        output, original_shape = read_image(path, size)
+        assert output.shape == shape
+        assert original_shape == (960, 1280)
+
+def test_read_video(tmp_path):
+    path = str(tmp_path / 'video.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10., (64, 48))
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), 40 * i, dtype=np.uint8))
+    writer.release()
+    frames = list(read_video(path))
+    assert len(frames) == 5
+    assert all(frame.shape == (48, 64, 3) for frame in frames)
+    assert abs(int(frames[-1].mean()) - 160) <= 2
+    assert video_fps(path) == 10.
+    assert video_fps(str(tmp_path / 'missing.avi')) == 30.
+    with pytest.raises(RuntimeError):
+        next(read_video(str(tmp_path / 'missing.avi')))
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_reduced_factor()
+    with tempfile.TemporaryDirectory() as tmp_path:
+        test_read_image(Path(tmp_path))
+        test_read_video(Path(tmp_path))
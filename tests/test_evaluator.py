@@ -1,3 +1,5 @@
+import numpy as np
+
 from vortex.utils.metrics.evaluator import *
 from vortex.utils.prediction.bboxes import BoundingBox
 
@@ -153,3 +155,42 @@ def test_evaluator():
     assert ap == 1.0
     assert precision[-1] == 1.0
     assert recall[-1] == 1.0
+
+def test_streaming_evaluator():
+    rng = np.random.RandomState(0)
+    evaluator = DetectionEvaluator()
+    streaming = StreamingDetectionEvaluator()
+    shards = [StreamingDetectionEvaluator(), StreamingDetectionEvaluator()]
+    binned = StreamingDetectionEvaluator(score_bins=100)
+    ## contiguous shards, same as sharded validation
+    evaluator_shards = [DetectionEvaluator(), DetectionEvaluator()]
+    for img in range(30):
+        n_labels, n_detections = rng.randint(0, 5), rng.randint(0, 8)
+        labels = np.concatenate([rng.randint(0, 20, (n_labels, 2)), rng.randint(1, 10, (n_labels, 2))], axis=1).astype(np.float32)
+        label_classes = rng.randint(0, 3, n_labels)
+        detections = labels[rng.randint(0, max(n_labels, 1), n_detections)] if n_labels else np.zeros((n_detections, 4), dtype=np.float32)
+        detections = detections + rng.randint(-2, 3, (n_detections, 4))
+        detections[:, 2:] = np.abs(detections[:, 2:]) + 1
+        detection_classes = rng.randint(0, 3, n_detections)
+        ## two decimals, exactly representable by 100 score bins
+        detection_scores = rng.randint(0, 100, n_detections) / 100 + 0.005
+        detection_bboxes = [BoundingBox(x=b[0], y=b[1], w=b[2], h=b[3], class_label=int(c), img_name=str(img), confidence=s)
+            for b, c, s in zip(detections, detection_classes, detection_scores)]
+        label_bboxes = [BoundingBox(x=b[0], y=b[1], w=b[2], h=b[3], class_label=int(c), img_name=str(img))
+            for b, c in zip(labels, label_classes)]
+        evaluator.update(detection_bboxes, label_bboxes)
+        evaluator_shards[img // 15].update(detection_bboxes, label_bboxes)
+        for e in [streaming, shards[img % 2], binned]:
+            e.update(detections, detection_classes, detection_scores, labels, label_classes)
+    expected, expected_map = evaluator.evaluate()
+    merged = shards[0].merge(shards[1])
+    for e in [streaming, merged, binned, evaluator_shards[0].merge(evaluator_shards[1])]:
+        results, mean_ap = e.evaluate()
+        assert mean_ap == expected_map
+        assert [r['class'] for r in results] == [r['class'] for r in expected]
+        for result, expected_result in zip(results, expected):
+            assert result['ap'] == expected_result['ap']
+    results, _ = streaming.evaluate()
+    for result, expected_result in zip(results, expected):
+        assert np.array_equal(result['precision'], expected_result['precision'])
+        assert np.array_equal(result['recall'], expected_result['recall'])
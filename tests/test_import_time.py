@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+proj_path = os.path.abspath(Path(__file__).parents[1])
+
+## dependencies that must only be imported by the stage actually using them
+HEAVY_MODULES = [
+    'torch',
+    'torchvision',
+    'onnx',
+    'albumentations',
+    'optuna',
+    'comet_ml',
+    'matplotlib',
+    'seaborn',
+]
+
+_script = """
+import sys, time, json, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': list(sys.modules.keys())}))
+"""
+
+def _measure_import(module : str):
+    output = subprocess.check_output([sys.executable, '-c', _script, module], cwd=proj_path)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def _common_test(module : str):
+    result = _measure_import(module)
+    imported = [name for name in HEAVY_MODULES if name in result['modules']]
+    assert len(imported) == 0, "importing '%s' also imports %s" % (module, imported)
+    ## wall-clock time is only reported, it depends on the machine load
+    print("importing '%s' took %.3fs" % (module, result['elapsed']))
+
+def test_vortex_runtime_import_time():
+    _common_test('vortex_runtime')
+
+def test_vortex_import_time():
+    _common_test('vortex')
+
+def test_vortex_cli_import_time():
+    _common_test('vortex.vortex_cli')
+
+if __name__ == "__main__":
+    test_vortex_runtime_import_time()
+    test_vortex_import_time()
+    test_vortex_cli_import_time()
@@ -0,0 +1,76 @@
+import cv2
+import pytest
+import numpy as np
+
+from vortex_runtime.basic_runtime import BaseRuntime, aligned_empty
+from vortex_runtime.letterbox import letterbox, letterbox_params, letterbox_batch, letterbox_to_original
+
+def test_letterbox():
+    for shape, size in [((300, 500, 3), (224, 224)), ((100, 60, 3), (224, 224)), ((224, 224, 3), (224, 224)), ((480, 640, 3), (256, 320))]:
+        image = np.random.randint(0, 255, shape, dtype=np.uint8)
+        output, scale, offset = letterbox(image, size)
+        assert output.shape == size + (3,)
+        ## equivalent to resize then pad to center
+        _, (offset_x, offset_y), (width, height) = letterbox_params(shape, size)
+        expected = np.zeros_like(output)
+        expected[offset_y:offset_y+height, offset_x:offset_x+width] = cv2.resize(image, (width, height))
+        assert offset == (offset_x, offset_y)
+        assert np.abs(output.astype(np.int32) - expected).mean() < 1.
+
+def test_letterbox_batch():
+    images = [np.random.randint(0, 255, shape, dtype=np.uint8) for shape in [(300, 500, 3), (100, 60, 3)]]
+    dst = np.full((3, 64, 64, 3), 255, dtype=np.uint8)
+    batch, scales, offsets = letterbox_batch(images, (3, 3, 64, 64), dst=dst)
+    assert batch is dst
+    assert np.all(batch[2] == 0)
+    for image, output, scale, offset in zip(images, batch, scales, offsets):
+        expected, expected_scale, expected_offset = letterbox(image, (64, 64))
+        assert np.array_equal(output, expected)
+        assert np.isclose(scale, expected_scale) and tuple(offset) == expected_offset
+    resized = BaseRuntime.resize_batch(images, (3, 64, 64, 3), resize_kind='pad')
+    assert np.array_equal(resized, batch)
+    ## destination of other dtype wouldn't be written by cv2
+    with pytest.raises(RuntimeError):
+        letterbox_batch(images, (3, 64, 64, 3), dst=np.zeros((3, 64, 64, 3), dtype=np.float32))
+
+class _BufferedRuntime(BaseRuntime):
+    def __init__(self, input_shape, input_type='uint8'):
+        super(_BufferedRuntime, self).__init__(
+            input_specs={'input': {'shape': input_shape, 'type': input_type}},
+            output_name='output', output_format={}, class_names=[])
+
+    def predict(self, *args, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+def test_input_buffer():
+    buffer = aligned_empty((2, 32, 48, 3), np.uint8)
+    assert buffer.shape == (2, 32, 48, 3) and buffer.ctypes.data % 64 == 0
+
+    runtime = _BufferedRuntime([2, 3, 32, 48])
+    buffer = runtime.input_buffer()
+    assert buffer.shape == (2, 32, 48, 3) and buffer.dtype == np.uint8
+    assert runtime.input_buffer() is buffer
+    images = [np.random.randint(0, 255, (100, 60, 3), dtype=np.uint8)]
+    for resize_kind in ['pad', 'stretch']:
+        batch = BaseRuntime.resize_batch(images, (2, 32, 48, 3), resize_kind=resize_kind, dst=buffer)
+        assert batch is buffer and np.all(batch[1] == 0)
+    assert np.array_equal(batch[0], cv2.resize(images[0], (48, 32)))
+    ## no buffer for input of other type than images
+    assert _BufferedRuntime([2, 3, 32, 48], input_type='float').input_buffer() is None
+    with pytest.raises(RuntimeError):
+        BaseRuntime.resize_batch(images, (2, 32, 48, 3), dst=np.zeros((2, 32, 48, 3), dtype=np.float32))
+
+def test_letterbox_to_original():
+    image = np.zeros((300, 500, 3), dtype=np.uint8)
+    image[60:120, 100:200] = 255
+    output, scale, offset = letterbox(image, (224, 224))
+    ys, xs = np.nonzero(output[..., 0] > 127)
+    box = np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1], dtype=np.float32) / 224
+    box = letterbox_to_original(box, (224, 224), scale, offset)
+    assert np.allclose(box, [100, 60, 200, 120], atol=3)
+
+if __name__ == "__main__":
+    test_letterbox()
+    test_letterbox_batch()
+    test_input_buffer()
+    test_letterbox_to_original()
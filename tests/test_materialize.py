@@ -0,0 +1,97 @@
+import numpy as np
+from easydict import EasyDict
+
+from vortex.core.factory import create_dataset
+from vortex.utils.data.dataset.materialize import MaterializedDataset, materialize_epochs
+from vortex.utils.data.dataset.shard import write_shards
+
+preprocess_args = EasyDict({
+    'input_size' : 32,
+    'input_normalization' : {
+        'mean' : [0.5, 0.5, 0.5],
+        'std' : [0.5, 0.5, 0.5]
+    }
+})
+
+class _Dataset:
+    def __init__(self, total=5):
+        self.data_format = {'class_label': None}
+        self.class_names = ['0', '1', '2', '3', '4']
+        self.images = np.random.RandomState(0).randint(0, 255, (total, 24, 48, 3), dtype=np.uint8)
+    def __getitem__(self, index):
+        return self.images[index], index
+    def __len__(self):
+        return len(self.images)
+
+def _create_dataset(root):
+    dataset_conf = EasyDict({
+        'train' : {
+            'dataset' : 'ShardDataset',
+            'args' : {'root' : str(root)},
+            'augmentations' : [EasyDict({
+                'module' : 'albumentations',
+                'args' : {'transforms' : [{'transform' : 'HorizontalFlip', 'args' : {'p' : 0.5}}]}
+            })]
+        }
+    })
+    return create_dataset(dataset_conf, preprocess_config=preprocess_args, stage='train')
+
+def test_materialize_epochs(tmp_path):
+    write_shards(_Dataset(), tmp_path / 'shards')
+    dataset = _create_dataset(tmp_path / 'shards')
+    materialize_epochs(dataset, tmp_path / 'first', epochs=2, seed=1)
+    materialize_epochs(dataset, tmp_path / 'second', epochs=2, seed=1, num_workers=2)
+    first, second = MaterializedDataset(tmp_path / 'first'), MaterializedDataset(tmp_path / 'second')
+    assert len(first) == 5 and first.epochs == 2
+    for epoch in range(3):
+        first.set_epoch(epoch)
+        second.set_epoch(epoch)
+        for index in range(len(first)):
+            image, target = first[index]
+            expected_image, expected_target = second[index]
+            assert image.shape == (32, 32, 3) and image.dtype == np.uint8
+            assert np.array_equal(image, expected_image)
+            assert target.tolist() == expected_target.tolist() == [index]
+    ## augmentation differs across epochs
+    first.set_epoch(0)
+    images = [first[index][0] for index in range(len(first))]
+    first.set_epoch(1)
+    assert any(not np.array_equal(image, first[index][0]) for index, image in enumerate(images))
+
+    dataset_conf = EasyDict({
+        'train' : {
+            'dataset' : 'MaterializedDataset',
+            'args' : {'root' : str(tmp_path / 'first')}
+        }
+    })
+    dataset = create_dataset(dataset_conf, preprocess_config=preprocess_args, stage='train')
+    dataset.set_epoch(1)
+    image, target = dataset[2]
+    assert tuple(image.shape) == (3, 32, 32) and target.tolist() == [2]
+
+class _DetectionDataset(_Dataset):
+    def __init__(self):
+        super(_DetectionDataset, self).__init__(total=3)
+        self.data_format = {
+            'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1},
+            'class_label': {'indices': [4], 'axis': 1},
+        }
+        ## first image has no object
+        self.targets = [np.zeros((0, 5), dtype=np.float32),
+                        np.array([[0.1, 0.2, 0.3, 0.4, 1.]], dtype=np.float32),
+                        np.array([[0.5, 0.5, 0.2, 0.2, 0.], [0., 0., 0.5, 0.5, 2.]], dtype=np.float32)]
+    def __getitem__(self, index):
+        return self.images[index], self.targets[index]
+
+def test_materialize_empty_targets(tmp_path):
+    write_shards(_DetectionDataset(), tmp_path / 'shards')
+    dataset_conf = EasyDict({
+        'train' : {
+            'dataset' : 'ShardDataset',
+            'args' : {'root' : str(tmp_path / 'shards')}
+        }
+    })
+    dataset = create_dataset(dataset_conf, preprocess_config=preprocess_args, stage='train')
+    materialize_epochs(dataset, tmp_path / 'materialized', epochs=1)
+    materialized = MaterializedDataset(tmp_path / 'materialized')
+    assert [materialized[index][1].shape for index in range(3)] == [(0, 5), (1, 5), (2, 5)]
@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+
+from vortex.core.pipelines.validation_pipeline import decode_dataset, split_cpus
+
+
+class DummyWrapper:
+    def __init__(self, total=5):
+        self.data_format = {'class_label': None}
+        self.dataset = type('Base', (), {'class_names': ['a', 'b']})()
+        self.images = np.random.randint(0, 255, (total, 8, 8, 3), dtype=np.uint8)
+        self.targets = [np.array([i % 2]) for i in range(total)]
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, index):
+        return self.images[index], torch.from_numpy(self.targets[index])
+
+
+def test_decode_dataset(tmp_path):
+    dataset = DummyWrapper()
+    decoded = decode_dataset(dataset, tmp_path)
+    assert len(decoded) == len(dataset)
+    assert decoded.class_names == ['a', 'b']
+    assert decoded.data_format == dataset.data_format
+    ## memory map is reopened after pickling, e.g. in backend process
+    import pickle
+    decoded = pickle.loads(pickle.dumps(decoded))
+    for index in range(len(dataset)):
+        image, target = decoded[index]
+        expected_image, expected_target = dataset[index]
+        assert np.array_equal(image, expected_image)
+        assert torch.equal(target, expected_target)
+
+
+def test_split_cpus():
+    for n_backends in [1, 2, 3]:
+        splits = split_cpus(n_backends)
+        assert len(splits) == n_backends
+        assert all(len(cpus) > 0 for cpus in splits)
@@ -363,6 +363,68 @@ class TestIRPredictionPipeline():
         # Check list member type
         assert isinstance(results.prediction[0],EasyDict)
 
+    @pytest.mark.parametrize("model_input", [onnx_model_path,pt_model_path])
+    def test_input_from_frame_stream(self,model_input):
+        # Instantiate predictor
+        kwargs = {}
+        vortex_ir_predictor = IRPredictionPipeline(model = model_input,
+                                                runtime = 'cpu')
+
+        # Stream of frames, more than model batch size
+        image_data = cv2.imread('tests/images/cat.jpg')
+        frames = (image_data for _ in range(3))
+        output_video = Path('tests/output_predict_test') / 'ir_prediction_stream.mp4'
+
+        results = list(vortex_ir_predictor.run_stream(source = frames,
+                                                      visualize = True,
+                                                      output_video = output_video,
+                                                      **kwargs))
+
+        # One result per frame, in order
+        assert [result.index for result in results] == [0, 1, 2]
+        assert isinstance(results[0].prediction,EasyDict)
+        assert isinstance(results[0].visualization,np.ndarray)
+        assert output_video.exists()
+
+    @pytest.mark.parametrize("model_input", [onnx_model_path,pt_model_path])
+    def test_input_from_image_dir_bulk(self,model_input):
+        # Instantiate predictor
+        kwargs = {}
+        vortex_ir_predictor = IRPredictionPipeline(model = model_input,
+                                                runtime = 'cpu')
+
+        output = Path('tests/output_predict_test') / 'ir_prediction_bulk.jsonl'
+        summary = vortex_ir_predictor.run_bulk(images = ['tests/images'],
+                                               output = output,
+                                               resume = False,
+                                               **kwargs)
+
+        # One record per image, written to output
+        assert isinstance(summary,EasyDict)
+        assert summary.predicted + summary.errors == summary.images
+        assert len(output.read_text().splitlines()) == summary.images
+
+        # Completed run is resumed without prediction
+        summary = vortex_ir_predictor.run_bulk(images = ['tests/images'],
+                                               output = output,
+                                               **kwargs)
+        assert summary.resumed == summary.images and summary.predicted == 0
+
+def test_prefetch_stop():
+    import time
+    import threading
+    from vortex.core.pipelines.prediction_pipeline import _prefetch
+
+    threads = set(threading.enumerate())
+    items = _prefetch(iter([0, 1]), size = 1)
+    assert next(items) == 0
+    # Producer exhausted the source with a full queue, then consumer stops early
+    time.sleep(0.3)
+    items.close()
+    producer, = set(threading.enumerate()) - threads
+    producer.join(timeout = 1)
+    assert not producer.is_alive()
+
 class TestHypOptPipeline:
 
     def test_train_obj(self):
@@ -0,0 +1,58 @@
+import os
+import time
+import numpy as np
+
+from easydict import EasyDict
+from vortex.core.engine.validator.base_validator import BaseValidator
+from vortex.core.engine.validator.prediction_cache import PredictionCache, file_hash
+
+def test_prediction_cache(tmp_path):
+    cache = PredictionCache(tmp_path / 'cache')
+    key = PredictionCache.make_key(model='abc', dataset={'dataset': 'A', 'args': {}}, backend='cpu')
+    ## key doesn't depend on argument order
+    assert key == PredictionCache.make_key(backend='cpu', dataset={'args': {}, 'dataset': 'A'}, model='abc')
+    assert key != PredictionCache.make_key(model='abc', dataset={'dataset': 'A', 'args': {}}, backend='cuda')
+    assert cache.get(key) is None
+    value = dict(items=[(0, [{'class_label': np.array([1])}], np.array([1]), True)], predict_time=[0.1])
+    cache.put(key, value)
+    assert key in cache
+    cached = cache.get(key)
+    assert cached['predict_time'] == [0.1]
+    assert np.array_equal(cached['items'][0][1][0]['class_label'], [1])
+    cache.invalidate(key)
+    assert key not in cache
+
+def test_prediction_cache_size(tmp_path):
+    cache = PredictionCache(tmp_path, max_size=0.25)
+    keys = [PredictionCache.make_key(index=i) for i in range(3)]
+    for key in keys:
+        cache.put(key, np.zeros(2 ** 14))
+        ## distinct modification time for least recently used order
+        time.sleep(0.01)
+    assert cache.size() <= 0.25
+    assert keys[0] not in cache and keys[2] in cache
+    ## larger than the cache size, not kept
+    cache.put('large', np.zeros(2 ** 16))
+    assert 'large' not in cache
+    cache.invalidate()
+    assert len(cache.entries()) == 0
+
+def test_prediction_cache_record(tmp_path):
+    ## recorded predictions are dropped once larger than the cache size, every item is still yielded
+    validator = EasyDict(prediction_cache=PredictionCache(tmp_path, max_size=0.25), format_output=lambda x: x)
+    items = [(i, np.zeros(2 ** 13), np.array([i]), i == 3) for i in range(4)]
+    record = []
+    assert len(list(BaseValidator._record(validator, items[:2], record))) == 2
+    assert len(record) == 2
+    record = []
+    assert len(list(BaseValidator._record(validator, items, record))) == 4
+    assert len(record) == 0
+
+def test_file_hash(tmp_path):
+    path = tmp_path / 'model.pt'
+    path.write_bytes(b'weights')
+    expected = file_hash(path)
+    path.write_bytes(b'weights')
+    assert file_hash(path) == expected
+    path.write_bytes(b'other weights')
+    assert file_hash(path) != expected
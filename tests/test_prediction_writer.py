@@ -0,0 +1,86 @@
+import json
+import cv2
+import pytest
+import numpy as np
+
+from vortex.utils.prediction.writer import list_images, prediction_record, BulkCheckpoint, create_writer
+
+
+def test_list_images(tmp_path):
+    (tmp_path / 'images' / 'sub').mkdir(parents=True)
+    for name in ['b.jpg', 'a.png', 'sub/c.jpeg']:
+        cv2.imwrite(str(tmp_path / 'images' / name), np.zeros((4, 4, 3), dtype=np.uint8))
+    (tmp_path / 'images' / 'notes.md').write_text('x')
+    image_list = tmp_path / 'list.txt'
+    image_list.write_text('x.jpg\n\ny.jpg\n')
+    paths = list_images([tmp_path / 'images', image_list, tmp_path / 'images' / 'b.jpg'])
+    assert paths == [str(tmp_path / 'images' / name) for name in ['a.png', 'b.jpg', 'sub/c.jpeg']] + \
+        ['x.jpg', 'y.jpg', str(tmp_path / 'images' / 'b.jpg')]
+    with pytest.raises(RuntimeError):
+        list_images([tmp_path / 'missing'])
+
+
+## class label of one row per image and bounding boxes of rows of detections
+PREDICTION_FORMAT = {'class_label': {'indices': [0], 'axis': 0}, 'bounding_box': {'indices': [0, 1, 2, 3], 'axis': 1}}
+
+
+def _records(start, stop):
+    return [prediction_record('%d.jpg' % i, {'class_label': np.array([i % 2]), 'bounding_box': np.zeros((i % 3, 4))})
+            if i != 3 else prediction_record('%d.jpg' % i, None, "can't decode image") for i in range(start, stop)]
+
+
+def _write(output, output_format, start, stop, interrupt_at=None):
+    checkpoint = BulkCheckpoint(output, identity=dict(images=BulkCheckpoint.hash_paths(['a', 'b'])))
+    resumed = checkpoint.load()
+    writer = create_writer(output, output_format, state=checkpoint.state if resumed else None,
+                           prediction_format=PREDICTION_FORMAT)
+    for i in range(checkpoint.done, stop, 2):
+        writer.write(_records(i, min(i + 2, stop)))
+        if i + 2 == interrupt_at:
+            ## written but not checkpointed
+            return
+        checkpoint.save(min(i + 2, stop), writer.commit())
+    checkpoint.save(stop, writer.commit(final=True))
+    writer.close()
+
+
+def test_jsonl_writer_resume(tmp_path):
+    output = tmp_path / 'predictions.jsonl'
+    _write(output, None, 0, 7, interrupt_at=6)
+    _write(output, None, 0, 7)
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record['path'] for record in records] == ['%d.jpg' % i for i in range(7)]
+    assert records[3] == {'path': '3.jpg', 'error': "can't decode image"}
+    assert records[5]['bounding_box'] == [[0.] * 4] * 2
+    with pytest.raises(RuntimeError):
+        BulkCheckpoint(output, identity=dict(images=BulkCheckpoint.hash_paths(['a']))).load()
+
+
+def test_parquet_writer_resume(tmp_path):
+    dataset = pytest.importorskip('pyarrow.dataset')
+    output = tmp_path / 'predictions.parquet'
+    _write(output, None, 0, 7, interrupt_at=6)
+    _write(output, None, 0, 7)
+    table = dataset.dataset(str(output)).to_table().sort_by('path')
+    assert table.column('path').to_pylist() == ['%d.jpg' % i for i in range(7)]
+    assert table.column('error').to_pylist()[3] == "can't decode image"
+    assert table.column('bounding_box').to_pylist()[5] == [[0.] * 4] * 2
+
+
+def test_parquet_writer_empty_first(tmp_path):
+    dataset = pytest.importorskip('pyarrow.dataset')
+    output = tmp_path / 'predictions.parquet'
+    with pytest.raises(RuntimeError):
+        create_writer(output)
+    ## first image without detection, column dimensions are known from the prediction format
+    writer = create_writer(output, prediction_format=PREDICTION_FORMAT)
+    writer.write([prediction_record('0.jpg', {'class_label': None, 'bounding_box': None})])
+    state = writer.commit()
+    writer.close()
+    assert state == {'part': 1}
+    writer = create_writer(output, state=json.loads(json.dumps(state)), prediction_format=PREDICTION_FORMAT)
+    writer.write([prediction_record('1.jpg', {'class_label': np.array([1]), 'bounding_box': np.zeros((1, 4))})])
+    writer.commit(final=True)
+    table = dataset.dataset(str(output)).to_table().sort_by('path')
+    assert table.column('bounding_box').to_pylist() == [None, [[0.] * 4]]
+    assert table.column('class_label').to_pylist() == [None, [1.]]
@@ -0,0 +1,117 @@
+import cv2
+import json
+import time
+import socket
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+import pytest
+
+from vortex.core.pipelines.serving_pipeline import MicroBatcher, QueueFullError, create_server
+
+def predict_fn(images):
+    time.sleep(0.01)
+    return [{'shape': list(image.shape), 'batch_size': len(images)} for image in images]
+
+def encode(height, width):
+    _, data = cv2.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))
+    return data.tobytes()
+
+def request(url, data=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_micro_batcher():
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait=0.05).start()
+    futures = [batcher.submit(np.zeros((i + 1, 2, 3))) for i in range(6)]
+    results = [future.result(timeout=10) for future in futures]
+    assert [result['shape'][0] for result in results] == list(range(1, 7))
+    assert max(result['batch_size'] for result in results) == 4
+    report = batcher.metrics.report()
+    assert report['requests'] == 6 and report['batched_requests'] == 6
+    assert report['batches'] < 6
+    assert report['latency_ms']['count'] == 6
+    batcher.stop()
+
+def test_micro_batcher_backpressure():
+    release = threading.Event()
+    def blocking_fn(images):
+        release.wait(10)
+        return images
+    batcher = MicroBatcher(blocking_fn, max_batch_size=1, max_wait=0., queue_size=2).start()
+    futures = [batcher.submit(1)]
+    ## wait for the first request to be taken by the inference thread
+    while batcher.qsize():
+        time.sleep(0.01)
+    futures += [batcher.submit(2), batcher.submit(3)]
+    with pytest.raises(QueueFullError):
+        batcher.submit(4)
+    release.set()
+    assert [future.result(timeout=10) for future in futures] == [1, 2, 3]
+    assert batcher.metrics.report()['rejected'] == 1
+    batcher.stop()
+
+def test_http_server():
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait=0.05).start()
+    server = create_server(batcher, host='127.0.0.1', port=0, info={'model': 'dummy'})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    try:
+        status, health = request(url + '/health')
+        assert status == 200 and health['status'] == 'ok' and health['model'] == 'dummy'
+        outputs = [None] * 8
+        def predict(i):
+            outputs[i] = request(url + '/predict', encode(8 + i, 16))
+        threads = [threading.Thread(target=predict, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i, (status, output) in enumerate(outputs):
+            assert status == 200
+            assert output['results']['shape'] == [8 + i, 16, 3]
+        status, _ = request(url + '/predict', b'not an image')
+        assert status == 400
+        status, metrics = request(url + '/metrics')
+        assert status == 200
+        assert metrics['requests'] == 8
+        assert metrics['batches'] < 8
+        assert set(['p50', 'p99']) <= set(metrics['latency_ms'])
+        assert metrics['queue_time_ms']['count'] == 8
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.stop()
+    assert not batcher.is_alive()
+
+def test_unix_socket_server(tmp_path):
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('unix socket is not available')
+    path = str(tmp_path / 'serve.sock')
+    batcher = MicroBatcher(predict_fn, max_batch_size=2).start()
+    server = create_server(batcher, unix_socket=path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.sendall(b'GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+        response = b''
+        while True:
+            data = client.recv(4096)
+            if not data:
+                break
+            response += data
+        client.close()
+        header, body = response.split(b'\r\n\r\n', 1)
+        assert header.startswith(b'HTTP/1.1 200')
+        assert json.loads(body)['status'] == 'ok'
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.stop()
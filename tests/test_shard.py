@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from easydict import EasyDict
+
+from vortex.utils.data.dataset.shard import ShardDataset, write_shards
+from vortex.core.factory import create_dataset, create_dataloader
+
+class _Dataset:
+    def __init__(self, total=7):
+        self.data_format = {'class_label': None}
+        self.class_names = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+        self.images = np.random.RandomState(0).randint(0, 255, (total, 16, 24, 3), dtype=np.uint8)
+    def __getitem__(self, index):
+        return self.images[index], index
+    def __len__(self):
+        return len(self.images)
+
+def test_write_and_read_shards(tmp_path):
+    base = _Dataset()
+    shards = write_shards(base, tmp_path, samples_per_shard=3)
+    assert len(shards) == 3
+    dataset = ShardDataset(tmp_path)
+    assert len(dataset) == 7 and dataset.class_names == base.class_names
+    for index, (image, target) in enumerate(dataset):
+        assert np.array_equal(image, base.images[index]) and target.tolist() == [index]
+    ## random access
+    image, target = dataset[5]
+    assert np.array_equal(image, base.images[5]) and target.tolist() == [5]
+    ## shuffle buffer, every sample read once per epoch
+    dataset = ShardDataset(tmp_path, shuffle_buffer=4)
+    first = [int(target[0]) for _, target in dataset]
+    dataset.set_epoch(1)
+    second = [int(target[0]) for _, target in dataset]
+    assert sorted(first) == sorted(second) == list(range(7))
+    assert first != second
+
+def test_shards_rank_split(tmp_path, monkeypatch):
+    write_shards(_Dataset(), tmp_path, samples_per_shard=2)
+    targets = []
+    for rank in range(2):
+        monkeypatch.setenv('RANK', str(rank))
+        monkeypatch.setenv('WORLD_SIZE', '2')
+        dataset = ShardDataset(tmp_path)
+        targets.append([int(target[0]) for _, target in dataset])
+        ## random access is not split across ranks
+        assert len(dataset) == 7 and dataset[6][1].tolist() == [6]
+        assert dataset.rank_len() == len(targets[-1])
+        ## training dataloader length is the number of samples of this rank
+        wrapper = create_dataset(EasyDict({'train' : {'dataset' : 'ShardDataset', 'args' : {'root' : str(tmp_path)}}}),
+            preprocess_config=EasyDict({'input_size' : 32, 'input_normalization' : {'mean' : [0.5] * 3, 'std' : [0.5] * 3}}),
+            stage='train')
+        assert len(wrapper) == len(targets[-1])
+    assert targets == [[0, 1, 4, 5], [2, 3, 6]]
+
+def test_shards_seed(tmp_path):
+    write_shards(_Dataset(), tmp_path, samples_per_shard=2)
+    orders = [[int(target[0]) for _, target in ShardDataset(tmp_path, shuffle_buffer=3, seed=seed)] for seed in [0, 0, 1]]
+    assert orders[0] == orders[1] and orders[0] != orders[2]
+
+def test_malformed_shard(tmp_path):
+    import tarfile
+    write_shards(_Dataset(), tmp_path, samples_per_shard=10)
+    with tarfile.open(str(tmp_path / 'shard-000000.tar'), mode='a') as tar:
+        tar.add(str(tmp_path / 'shards.json'), arcname='9999999.npy')
+    with pytest.raises(RuntimeError, match='malformed shard'):
+        ShardDataset(tmp_path)[0]
+
+def test_shard_dataloader(tmp_path):
+    write_shards(_Dataset(), tmp_path, samples_per_shard=2)
+    preprocess_args = EasyDict({
+        'input_size' : 32,
+        'input_normalization' : {
+            'mean' : [0.5, 0.5, 0.5],
+            'std' : [0.5, 0.5, 0.5]
+        }
+    })
+    shard_conf = EasyDict({
+        'train' : {
+            'dataset' : 'ShardDataset',
+            'args' : {'root' : str(tmp_path), 'shuffle_buffer' : 2}
+        },
+        'eval' : {
+            'dataset' : 'ShardDataset',
+            'args' : {'root' : str(tmp_path)}
+        },
+        'dataloader' : {
+            'dataloader' : 'DataLoader',
+            'args' : {'batch_size' : 2, 'shuffle' : True, 'num_workers' : 2}
+        }
+    })
+    dataloader = create_dataloader(shard_conf, preprocess_config=preprocess_args, stage='train')
+    targets = []
+    for images, target in dataloader:
+        assert tuple(images.shape[1:]) == (3, 32, 32)
+        targets += target.flatten().tolist()
+    assert sorted(targets) == list(range(7))
+    ## epoch set by the training pipeline wouldn't reach persistent workers
+    shard_conf.dataloader.args.persistent_workers = True
+    with pytest.raises(RuntimeError, match='persistent_workers'):
+        create_dataloader(shard_conf, preprocess_config=preprocess_args, stage='train')
+    dataset = create_dataset(shard_conf, preprocess_config=preprocess_args, stage='validate')
+    assert len(dataset) == 7 and dataset[3][1].tolist() == [3]
+    with pytest.raises(RuntimeError):
+        shard_conf.train.subset = {'count' : 2}
+        create_dataset(shard_conf, preprocess_config=preprocess_args, stage='train')
@@ -1,3 +1,4 @@
+import copy
 import numpy as np
 import torch.nn as nn
 from easydict import EasyDict
@@ -78,4 +79,124 @@ def test_create_validator():
         model, dataset=DummyDataset(), 
         validation_args=validation_args,
     )
-    assert isinstance(validator, engine.validator.get_validator('detection'))
\ No newline at end of file
+    assert isinstance(validator, engine.validator.get_validator('detection'))
+def test_validator_dataloader():
+    softmax = dict(
+        network_args=dict(
+            backbone='shufflenetv2_x1.0',
+            n_classes=10,
+            freeze_backbone=False,
+        ),
+        preprocess_args=dict(
+            input_size=32,
+            input_normalization=dict(
+                mean=[0.4914, 0.4822, 0.4465],
+                std=[0.2023, 0.1994, 0.2010]
+            )
+        ),
+        loss_args=dict(
+            reduction='mean'
+        ),
+        postprocess_args={}
+    )
+    model = create_model(
+        EasyDict(name='softmax', **softmax)
+    )
+    dataset = DummyDataset(total=4)
+    dataset.images = (np.random.rand(4, 32, 32, 3) * 255).astype(np.float32)
+    validator = engine.create_validator(
+        model, dataset=dataset,
+        validation_args={'batch_size' : 1},
+    )
+    expected = validator()
+    ## batch_size of 1 with workers, kept across validation rounds
+    validator = engine.create_validator(
+        model, dataset=dataset,
+        validation_args={'batch_size' : 1, 'dataloader_args' : {'num_workers' : 2}},
+    )
+    assert validator.dataset.persistent_workers
+    assert validator() == expected
+    assert validator() == expected
+def test_validator_pipelined():
+    softmax = dict(
+        network_args=dict(
+            backbone='shufflenetv2_x1.0',
+            n_classes=10,
+            freeze_backbone=False,
+        ),
+        preprocess_args=dict(
+            input_size=32,
+            input_normalization=dict(
+                mean=[0.4914, 0.4822, 0.4465],
+                std=[0.2023, 0.1994, 0.2010]
+            )
+        ),
+        loss_args=dict(
+            reduction='mean'
+        ),
+        postprocess_args={}
+    )
+    model = create_model(
+        EasyDict(name='softmax', **softmax)
+    )
+    dataset = DummyDataset(total=8)
+    dataset.images = (np.random.rand(8, 32, 32, 3) * 255).astype(np.float32)
+    for batch_size in [1, 4]:
+        validator = engine.create_validator(
+            model, dataset=dataset,
+            validation_args={'batch_size' : batch_size},
+        )
+        expected = validator()
+        validator = engine.create_validator(
+            model, dataset=dataset,
+            validation_args={'batch_size' : batch_size, 'pipelined' : True, 'queue_size' : 2},
+        )
+        assert validator() == expected
+
+def test_validator_sharded():
+    softmax = dict(
+        network_args=dict(
+            backbone='shufflenetv2_x1.0',
+            n_classes=10,
+            freeze_backbone=False,
+        ),
+        preprocess_args=dict(
+            input_size=32,
+            input_normalization=dict(
+                mean=[0.4914, 0.4822, 0.4465],
+                std=[0.2023, 0.1994, 0.2010]
+            )
+        ),
+        loss_args=dict(
+            reduction='mean'
+        ),
+        postprocess_args={}
+    )
+    model = create_model(
+        EasyDict(name='softmax', **softmax)
+    )
+    dataset = DummyDataset(total=10)
+    dataset.images = (np.random.rand(10, 32, 32, 3) * 255).astype(np.float32)
+    validator = engine.create_validator(
+        model, dataset=dataset,
+        validation_args={'batch_size' : 4},
+    )
+    expected = validator()
+    outputs = []
+    for index in range(3):
+        shard_validator = engine.create_validator(
+            model, dataset=dataset,
+            validation_args={'batch_size' : 4, 'shard' : (index, 3)},
+        )
+        shard_validator.evaluate()
+        outputs.append(shard_validator.shard_output())
+    ## shard results are merged in place
+    merge_outputs = copy.deepcopy(outputs)
+    validator.merge_shards(outputs)
+    assert validator.accumulator.count == 10
+    assert validator.compute_metrics() == expected
+    ## merge target only needs `merge_info` of a shard, no predictor nor dataset
+    merge_target = type(shard_validator).merge_target(shard_validator.merge_info(), batch_size=4)
+    merge_target.merge_shards(merge_outputs)
+    assert merge_target.predictor_name == validator.predictor_name
+    assert merge_target.compute_metrics() == expected
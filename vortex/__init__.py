@@ -1,13 +1,37 @@
-import comet_ml
-from vortex import core
-from vortex import export
-from vortex import exporter
-from vortex import hypopt
-from vortex import predict
-from vortex import train
-from vortex import validate
-from vortex import predictor
-from vortex import utils
-from vortex import networks
-from vortex import ir_runtime_predict
-from vortex import ir_runtime_validate
\ No newline at end of file
+import sys
+import importlib
+
+## subpackages and cli stages are imported on first attribute access (e.g. `vortex.train`),
+## so `import vortex` doesn't pull torch, comet_ml or optuna; note that `comet_ml` is now
+## imported by the training pipeline itself, before torch, as required by comet
+_submodules = [
+    'core',
+    'export',
+    'exporter',
+    'hypopt',
+    'predict',
+    'train',
+    'validate',
+    'predictor',
+    'utils',
+    'networks',
+    'ir_runtime_predict',
+    'ir_runtime_validate',
+    'list_datasets',
+    'convert_shards',
+    'materialize',
+    'serve',
+]
+
+def __getattr__(name : str):
+    if name in _submodules:
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+def __dir__():
+    return sorted(list(globals().keys()) + _submodules)
+
+## module-level __getattr__ (PEP 562) requires python 3.7, import eagerly otherwise
+if sys.version_info < (3, 7):
+    for _name in _submodules:
+        __getattr__(_name)
@@ -0,0 +1,31 @@
+import argparse
+
+from vortex.utils.parser import load_config
+
+description = 'Convert experiment file dataset to tar shards, to be read sequentially by ShardDataset'
+
+def main(args):
+    from vortex.utils.data.dataset.dataset import get_base_dataset
+    from vortex.utils.data.dataset.shard import write_shards
+
+    config = load_config(args.config)
+    dataset_config = config.dataset.train if args.stage == 'train' else config.dataset.eval
+    dataset = get_base_dataset(dataset_config.dataset, dataset_args=dataset_config.args)
+    shards = write_shards(dataset, args.output, samples_per_shard=args.samples_per_shard)
+    print('{} samples written to {} shard(s) at {}'.format(len(dataset), len(shards), args.output))
+
+def add_parser(parent_parser,subparsers = None):
+    if subparsers is None:
+        parser = parent_parser
+    else:
+        parser = subparsers.add_parser('convert_shards',description=description)
+    parser.add_argument("-c","--config", required=True, help='path to experiment config')
+    parser.add_argument("-o","--output", required=True, help='output directory of the shards')
+    parser.add_argument("-s","--stage", default='train', choices=['train','validate'], help='convert train or eval dataset')
+    parser.add_argument("-n","--samples-per-shard", default=1000, type=int, help='number of samples in each shard')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description)
+    add_parser(parser)
+    args = parser.parse_args()
+    main(args)
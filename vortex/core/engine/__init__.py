@@ -1,4 +1,3 @@
-import comet_ml
 ## forward create_trainer and create_validator to parent module
 from vortex.core.engine.validator import create_validator, register_validator, remove_validator, BaseValidator
 from vortex.core.engine.trainer import create_trainer, register_trainer, remove_trainer, BaseTrainer
\ No newline at end of file
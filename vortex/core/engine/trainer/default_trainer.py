@@ -21,6 +21,9 @@ class DefaultTrainer(BaseTrainer):
         epoch_loss, step_loss = 0., 0.
         ## TODO : consider to move device deduction to BaseTrainer
         device = list(self.model.parameters())[0].device
+        ## batch augmentation deferred to training device by the collater, see BatchAugmentCollate
+        collate_fn = getattr(dataloader, 'collate_fn', None)
+        batch_augment = getattr(collate_fn, 'on_device', False)
         for i, (inputs, targets) in tqdm(enumerate(dataloader), total=len(dataloader),
                                          desc=" train", leave=False):
             if self.scheduler is not None:
@@ -28,6 +31,11 @@ class DefaultTrainer(BaseTrainer):
             inputs = inputs.to(device)
             if isinstance(targets, torch.Tensor):
                 targets = targets.to(device)
+            elif isinstance(targets, tuple) and all(isinstance(t, torch.Tensor) for t in targets):
+                ## padded targets and its valid mask
+                targets = tuple(t.to(device) for t in targets)
+            if batch_augment:
+                inputs, targets = collate_fn.apply(inputs, targets)
             preds = self.model(inputs)
             batch_loss = self.criterion(preds, targets)
             batch_loss.backward()
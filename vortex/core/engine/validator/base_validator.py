@@ -1,5 +1,8 @@
 import torch
+import queue
+import pickle
 import logging
+import threading
 import warnings
 import matplotlib
 import numpy as np
@@ -24,8 +27,9 @@ from vortex.utils.profiler.speed import TimeData
 from vortex.utils.profiler.resource import CPUMonitor, GPUMonitor
 from vortex.core.factory import create_runtime_model
 from vortex.core.pipelines.prediction_pipeline import IRPredictionPipeline
+from .prediction_cache import PredictionCache
 
-from vortex_runtime.basic_runtime import BaseRuntime
+from vortex_runtime.basic_runtime import BaseRuntime, ColumnarResults
 
 ## set High DPI for matplotlib
 ## TODO: properly set image dpi
@@ -37,6 +41,26 @@ def no_collate(batch) :
     targets = list(map(lambda x: x[1], batch))
     return images, targets
 
+def single_collate(batch) :
+    ## batch_size of 1, same (image, targets) as iterating the dataset itself
+    return batch[0]
+
+def shard_range(n_data: int, index: int, count: int):
+    """
+    contiguous range of sample indices of shard `index` out of `count` shards,
+    shard sizes differ by at most one, same as `np.array_split`
+    """
+    size, remainder = divmod(n_data, count)
+    start = index * size + min(index, remainder)
+    stop = start + size + (1 if index < remainder else 0)
+    return range(start, stop)
+
+def _distributed_world_size() -> int:
+    import torch.distributed as dist
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_world_size()
+    return 1
+
 class Logger:
     """
     logger wrapper with callable fn and default log level
@@ -77,8 +101,15 @@ class BaseValidator:
     """
     base class for validation
     """
-    def __init__(self, predictor: Union[BasePredictor,BaseRuntime], dataset, experiment_name='validate', output_directory='.', batch_size:int=1):
-        if not isinstance(predictor, (BasePredictor,BaseRuntime)):
+    ## `update_results` receives `ColumnarResults` of the batch if True, otherwise list of dict per image
+    columnar_results = False
+
+    def __init__(self, predictor: Union[BasePredictor,BaseRuntime], dataset, experiment_name='validate', output_directory='.', batch_size:int=1,
+                 dataloader_args: Union[dict,None]=None, pipelined: bool=False, queue_size: int=4,
+                 prediction_cache: Union[PredictionCache,None]=None, cache_key: Union[str,None]=None,
+                 shard: Union[Sequence,None]=None, merge_info: Union[dict,None]=None):
+        ## `merge_info` of a shard validator replaces predictor and dataset, see `merge_target`
+        if merge_info is None and not isinstance(predictor, (BasePredictor,BaseRuntime)):
             raise RuntimeError("expects `predictor` to have type of BasePredictor or BaseRuntime, " \
                 "got %s" % type(predictor))
 
@@ -88,8 +119,31 @@ class BaseValidator:
         self.experiment_name = experiment_name
         self.output_directory = Path(output_directory)
         self.batch_size = batch_size
+        ## additional DataLoader arguments, e.g. num_workers, from `dataset.eval.dataloader.args`
+        self.dataloader_args = dict(dataloader_args) if dataloader_args is not None else {}
+        ## format output and update results on a separate thread, overlapped with prediction
+        self.pipelined = pipelined
+        if not isinstance(queue_size, int) or queue_size < 1:
+            raise RuntimeError("expects `queue_size` to be a positive int, got %s" % queue_size)
+        self.queue_size = queue_size
+        ## replay predictions of the same model, dataset and prediction args from cache, see `PredictionCache`
+        if (prediction_cache is None) != (cache_key is None):
+            raise RuntimeError("expects both `prediction_cache` and `cache_key`, or none of them")
+        self.prediction_cache = prediction_cache
+        self.cache_key = cache_key
+        self.cache_hit = False
+        ## (shard index, number of shards), only validate a contiguous shard of the dataset,
+        ## results of every shard are merged with `merge_shards`
+        if shard is not None:
+            if not (len(shard) == 2 and all(isinstance(x, int) for x in shard) and 0 <= shard[0] < shard[1]):
+                raise RuntimeError("expects `shard` to be (shard index, number of shards), got %s" % (shard,))
+            shard = tuple(shard)
+        self.shard = shard
+        self.shard_offset = 0
         
         self.predictor_name = '{}'.format(self.predictor.__class__.__name__)
+        if merge_info is not None:
+            self.predictor_name = merge_info['predictor_name']
         if isinstance(self.predictor, BasePredictor):
             self.predictor_name = '{}[{}]'.format(self.predictor_name, next(self.predictor.parameters()).device)
         if isinstance(predictor, BaseRuntime) :
@@ -100,12 +154,40 @@ class BaseValidator:
                 )
 
         self._init_logger()
-        self._init_dataset()
-        self._init_class_names()
+        if merge_info is None:
+            self._init_dataset()
+            self._init_class_names()
+        else:
+            self._init_merge_info(merge_info)
         self._init_profiler()
-        self._init_batch()
+        if merge_info is None:
+            self._init_shard()
+            self._init_batch()
         self._check_output_format()
+
+    @classmethod
+    def merge_target(cls, merge_info: dict, **kwargs) -> 'BaseValidator':
+        """
+        validator without predictor nor dataset, from `merge_info` of a shard validator,
+        only to `merge_shards` then compute and save metrics of the whole dataset
+        """
+        return cls(predictor=None, dataset=None, merge_info=merge_info, **kwargs)
+
+    def merge_info(self) -> dict:
+        """
+        picklable dataset and predictor info required by `merge_target`
+        """
+        return dict(predictor_name=self.predictor_name, class_names=self.class_names,
+            labels_fmt=self.labels_fmt, result_fmt=self.result_fmt)
     
+    def _init_merge_info(self, merge_info: dict):
+        """
+        dataset and predictor info of merge target, see `merge_target`
+        """
+        self.class_names = merge_info['class_names']
+        self.labels_fmt = EasyDict(merge_info['labels_fmt'])
+        self.result_fmt = EasyDict(merge_info['result_fmt'])
+
     def _init_logger(self):
         """
         default logger initialization
@@ -114,14 +196,34 @@ class BaseValidator:
         self.logger = Logger(logger)
         self.logger('predictor type : {}'.format(type(self.predictor)))
 
+    def _init_shard(self):
+        """
+        restrict dataset to the samples of `shard`, if any
+        """
+        if self.shard is None:
+            return
+        samples = shard_range(len(self.dataset), *self.shard)
+        self.shard_offset = samples.start
+        self.dataset = torch.utils.data.Subset(self.dataset, samples)
+
     def _init_batch(self):
         """
         default batch initialization, convert to dataloader if necessary
         """
         batch_size = self.batch_size
+        dataloader_args = dict(self.dataloader_args)
+        num_workers = dataloader_args.get('num_workers', 0)
+        if num_workers > 0:
+            ## workers are kept alive across validation rounds (e.g. every `val_epoch` in training)
+            dataloader_args.setdefault('persistent_workers', True)
+        else:
+            dataloader_args.pop('persistent_workers', None)
+            dataloader_args.pop('prefetch_factor', None)
         ## convert to DataLoader, if necessary
-        self.dataset = torch.utils.data.DataLoader(self.dataset, batch_size=batch_size, collate_fn=no_collate) \
-            if batch_size > 1 else self.dataset
+        if batch_size > 1 or num_workers > 0:
+            collate_fn = no_collate if batch_size > 1 else single_collate
+            self.dataset = torch.utils.data.DataLoader(self.dataset, batch_size=batch_size,
+                collate_fn=collate_fn, **dataloader_args)
     
     def _init_profiler(self):
         """
@@ -207,7 +309,7 @@ class BaseValidator:
         else :
             results = type(self).runtime_predict(
                 predictor=self.predictor,
-                image=image, *args, **kwargs,
+                image=image, columnar=True, *args, **kwargs,
             )
         return results
     
@@ -223,6 +325,37 @@ class BaseValidator:
         required for each subclass
         """
         raise NotImplementedError
+
+    def partial_results(self) -> Any :
+        """
+        required for sharded validation,
+        picklable results accumulated by `update_results`, merged by `merge_results`
+        """
+        raise NotImplementedError
+
+    def merge_results(self, partials : list) :
+        """
+        required for sharded validation,
+        replace accumulated results with `partials` of every shard merged in shard order
+        """
+        raise NotImplementedError
+
+    def shard_output(self) -> dict :
+        """
+        results and prediction time of this shard, to be merged by `merge_shards`
+        """
+        return dict(results=self.partial_results(), predict_time=list(self.predict_timedata.data))
+
+    def merge_shards(self, outputs : List[dict]) :
+        """
+        merge `shard_output` of every shard, in shard order,
+        metrics are then the same as validating the whole dataset in a single process
+        """
+        self.merge_results([output['results'] for output in outputs])
+        self.predict_timedata = TimeData(name=self.predict_timedata.name)
+        for output in outputs:
+            for dt in output['predict_time']:
+                self.predict_timedata.update(dt)
     
     def plot_resource_metrics(self, output_directory=None, filename=None) -> Dict[str,str] : 
         """
@@ -327,8 +460,10 @@ class BaseValidator:
     
     def format_output(self, results) :
         """
-        format output
+        format output, to `ColumnarResults` of the batch unless already formatted
         """
+        if isinstance(results, ColumnarResults) :
+            return results
         if isinstance(results, torch.Tensor) :
             results = results.cpu().numpy()
         if isinstance(results, (np.ndarray, (list, tuple))) \
@@ -336,34 +471,143 @@ class BaseValidator:
             ## first map to cpu/numpy
             results = list(map(lambda x: x.cpu().numpy() if isinstance(x,torch.Tensor) else x, results))
             ## actually perform output formatting
-            results = get_prediction_results(results, self.result_fmt)
+            return get_prediction_results(results, self.result_fmt, columnar=True)
         assert isinstance(results[0], (dict, OrderedDict)), "result type {} not understood".format(type(results))
         return results
 
-    def __call__(self, *args, **kwargs):
+    def _update(self, index, results, targets, last_index):
+        results = self.format_output(results)
+        if isinstance(results, ColumnarResults) and not self.columnar_results :
+            results = results.split()
+        self.update_results(
+            index=index,
+            results=results,
+            targets=targets,
+            last_index=last_index
+        )
+
+    def _update_worker(self, results_queue: queue.Queue, errors: list):
+        """
+        consumer of pipelined validation, update results in the order of prediction
+        """
+        while True:
+            item = results_queue.get()
+            if item is None:
+                break
+            ## keep draining after error so producer never blocks on full queue
+            if errors:
+                continue
+            try:
+                self._update(*item)
+            except BaseException as e:
+                errors.append(e)
+
+    def _predict_all(self):
         """
-        default validation pipeline
+        iterate dataset and predict, yield (index, results, targets, last_index)
+        """
+        n_batches = len(self.dataset)
+        for index, (image, targets) in tqdm(enumerate(self.dataset), total=n_batches,
+                                        desc=" eval", leave=False):
+            with self.predict_timedata :
+                results = self.predict(image=image)
+            yield index, results, targets, index == n_batches - 1
+
+    def _cached_items(self):
+        """
+        predictions of this run from `prediction_cache`, prediction time is restored
+        """
+        if self.prediction_cache is None:
+            return None
+        cached = self.prediction_cache.get(self.cache_key)
+        if cached is None:
+            return None
+        for dt in cached['predict_time']:
+            self.predict_timedata.update(dt)
+        return cached['items']
+
+    def _record(self, items, record: list):
+        """
+        format and keep predicted items to be written to `prediction_cache`,
+        recording stops and `record` is cleared once its size exceeds the cache `max_size`,
+        so memory stays bounded when the run can't be cached anyway
+        """
+        max_bytes, size = self.prediction_cache.max_size * 2 ** 20, 0
+        for index, results, targets, last_index in items:
+            item = (index, self.format_output(results), targets, last_index)
+            if size <= max_bytes:
+                size += len(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+                if size <= max_bytes:
+                    record.append(item)
+                else:
+                    record.clear()
+                    warnings.warn("predictions are larger than prediction cache `max_size` of %s MB, "
+                        "not cached" % self.prediction_cache.max_size)
+            yield item
+
+    def validation_loop(self):
+        """
+        predict and update results for every batch of the dataset,
+        when `pipelined`, prediction on the calling thread is overlapped with
+        output formatting and `update_results` on a consumer thread,
+        through a queue of at most `queue_size` batches
+        """
+        items = self._cached_items()
+        self.cache_hit, record = items is not None, None
+        if items is None:
+            items = self._predict_all()
+            if self.prediction_cache is not None:
+                record, n_times = [], len(self.predict_timedata.data)
+                items = self._record(items, record)
+        if not self.pipelined:
+            for item in items:
+                self._update(*item)
+        else:
+            results_queue, errors = queue.Queue(maxsize=self.queue_size), []
+            consumer = threading.Thread(target=self._update_worker,
+                args=(results_queue, errors), daemon=True)
+            consumer.start()
+            try:
+                for item in items:
+                    if errors:
+                        break
+                    results_queue.put(item)
+            finally:
+                results_queue.put(None)
+                consumer.join()
+            if errors:
+                raise errors[0]
+        if record:
+            self.prediction_cache.put(self.cache_key, dict(items=record,
+                predict_time=self.predict_timedata.data[n_times:]))
+
+    def evaluate(self, *args, **kwargs):
+        """
+        predict and update results for the dataset (or its shard), without computing metrics
         """
         if isinstance(self.predictor, BasePredictor) :
             is_training = self.predictor.training
             self.predictor.eval()
         self.eval_init(*args, **kwargs)
         with self.monitor as m:
-            for index, (image, targets) in tqdm(enumerate(self.dataset), total=len(self.dataset), 
-                                            desc=" eval", leave=False):
-                with self.predict_timedata :
-                    results = self.predict(image=image)
-                results = self.format_output(results)
-                last_index = False
-                if index == len(self.dataset) -1:
-                    last_index = True
-                self.update_results(
-                    index=index,
-                    results=results,
-                    targets=targets,
-                    last_index=last_index
-                )
-        self.metrics = self.compute_metrics()
+            self.validation_loop()
         if isinstance(self.predictor, BasePredictor) :
             self.predictor.train(is_training)
-        return self.metrics
\ No newline at end of file
+
+    def __call__(self, *args, **kwargs):
+        """
+        default validation pipeline,
+        results of every shard are gathered when validating a shard on each distributed rank
+        """
+        self.evaluate(*args, **kwargs)
+        world_size = _distributed_world_size()
+        if self.shard is not None and world_size > 1:
+            import torch.distributed as dist
+            if self.shard != (dist.get_rank(), world_size):
+                raise RuntimeError("expects `shard` of distributed validation to be (rank, world size), " \
+                    "got %s" % (self.shard,))
+            outputs = [None] * world_size
+            dist.all_gather_object(outputs, self.shard_output())
+            self.merge_shards(outputs)
+        self.metrics = self.compute_metrics()
+        return self.metrics
@@ -19,6 +19,7 @@ from typing import Union, List, Dict, Type, Any
 
 from vortex.predictor.base_module import BasePredictor, create_predictor
 from vortex.utils.metrics.evaluator import DetectionEvaluator as Evaluator
+from vortex.utils.metrics.evaluator import StreamingDetectionEvaluator
 from vortex.utils.prediction import BoundingBox
 
 from vortex.utils.profiler.speed import TimeData
@@ -33,22 +34,28 @@ class BoundingBoxValidator(BaseValidator):
     __output_format__ = ['bounding_box', 'class_label', 'class_confidence']
     ## model output format requirements
     def __init__(self, predictor: BasePredictor, dataset, score_threshold: float,
-                 iou_threshold: float, metric_type: str='voc', *args, **kwargs):
+                 iou_threshold: float, metric_type: str='voc', streaming: bool=False,
+                 curve_bins: Union[int,None]=None, *args, **kwargs):
         
         super(BoundingBoxValidator, self).__init__(predictor, dataset, *args, **kwargs)
 
-        img, lbl = dataset[0]
-        if not (isinstance(img, torch.Tensor) or isinstance(img, np.ndarray)):
-            raise RuntimeError("expects dataset to return `image` of type np.ndarray or " \
-                "torch.Tensor, got %s" % type(img))
-        if not (isinstance(lbl, torch.Tensor) or isinstance(lbl, np.ndarray)):
-            raise RuntimeError("expects dataset to return `label` of type np.ndarray or " \
-                "torch.Tensor, got %s" % type(lbl))
+        if dataset is not None:
+            img, lbl = dataset[0]
+            if not (isinstance(img, torch.Tensor) or isinstance(img, np.ndarray)):
+                raise RuntimeError("expects dataset to return `image` of type np.ndarray or " \
+                    "torch.Tensor, got %s" % type(img))
+            if not (isinstance(lbl, torch.Tensor) or isinstance(lbl, np.ndarray)):
+                raise RuntimeError("expects dataset to return `label` of type np.ndarray or " \
+                    "torch.Tensor, got %s" % type(lbl))
 
         self.score_threshold = np.array([score_threshold], dtype=np.float32)
         self.iou_threshold = np.array([iou_threshold], dtype=np.float32)
         self.metric_type = metric_type
         assert metric_type in ['voc'], "unsupported metric type : {}, available 'voc'".format(metric_type)
+        ## match detections per image as results arrive, instead of keeping every bounding box
+        ## `curve_bins` count detection scores into histogram, implies streaming
+        self.curve_bins = curve_bins
+        self.streaming = streaming or curve_bins is not None
 
         self.evaluator = None
     
@@ -64,10 +71,17 @@ class BoundingBoxValidator(BaseValidator):
             iou_threshold=self.iou_threshold.item(),
             score_threshold=self.score_threshold.item(),
         ))
+        if self.streaming:
+            args.update(dict(streaming=self.streaming))
+        if self.curve_bins is not None:
+            args.update(dict(curve_bins=self.curve_bins))
         return args
     
     def eval_init(self, *args, **kwargs):
-        self.evaluator = Evaluator()
+        if self.streaming:
+            self.evaluator = StreamingDetectionEvaluator(iou_threshold=0.5, score_bins=self.curve_bins)
+        else:
+            self.evaluator = Evaluator()
         
     
     def predict(self, image, *args, **kwargs):
@@ -91,9 +105,37 @@ class BoundingBoxValidator(BaseValidator):
         if not last_index:
             assert self.batch_size == len(results) == len(targets)
 
+        update_fn = self._update_results_streaming if self.streaming else self._update_results
         for i, (result, target) in enumerate(zip(results,targets)) :
-            i = index * self.batch_size + i
-            self._update_results(i, [result], target)
+            ## index in the whole dataset, the same for single process and sharded validation
+            i = self.shard_offset + index * self.batch_size + i
+            update_fn(i, [result], target)
+
+    def _update_results_streaming(self, index, results, targets):
+        results = results[0] # single batch
+
+        bboxes = np.take(targets, self.labels_fmt.bounding_box.indices,
+                            axis=self.labels_fmt.bounding_box.axis)
+        class_labels = np.zeros(len(bboxes), dtype=np.int64)
+        if not self.labels_fmt.class_label is None :
+            class_labels = np.take(targets, self.labels_fmt.class_label.indices, 
+                axis=self.labels_fmt.class_label.axis)
+            class_labels = np.asarray(class_labels).reshape(len(bboxes), -1)[:,0].astype(np.int64)
+        self.logger('labels : %s %s', bboxes, class_labels)
+
+        if results['bounding_box'] is not None :
+            ## (x1, y1, x2, y2) to (x, y, w, h), same as `BoundingBox` of non-streaming evaluator
+            detections = np.asarray(results['bounding_box']).reshape(-1, 4)
+            detections = np.concatenate([detections[:,:2], detections[:,2:] - detections[:,:2]], axis=1)
+            detection_classes = np.asarray(results['class_label']).reshape(-1).astype(np.int64)
+            detection_scores = np.asarray(results['class_confidence']).reshape(-1)
+        else :
+            detections = np.zeros((0, 4))
+            detection_classes = np.zeros((0,), dtype=np.int64)
+            detection_scores = np.zeros((0,))
+        self.logger('detections : %s %s %s', detections, detection_classes, detection_scores)
+
+        self.evaluator.update(detections, detection_classes, detection_scores, bboxes, class_labels)
 
     def _update_results(self, index, results, targets):
         results = results[0] # single batch
@@ -150,6 +192,10 @@ class BoundingBoxValidator(BaseValidator):
     
     def compute_metrics(self) :
         eval_results = self.evaluator.evaluate(iou_threshold=0.5)
+        if self.streaming:
+            for result in eval_results[0]:
+                result['class'] = self.class_names[result['class']] if self.class_names is not None \
+                    else 'class_{}'.format(result['class'])
         self.logger(eval_results)
         self.pr_curves = eval_results[0]
         return {
@@ -157,6 +203,15 @@ class BoundingBoxValidator(BaseValidator):
             'mean_ap': eval_results[1],
         }
     
+    def partial_results(self) -> Union[Evaluator,StreamingDetectionEvaluator]:
+        return self.evaluator
+
+    def merge_results(self, partials : List[Union[Evaluator,StreamingDetectionEvaluator]]):
+        evaluator = partials[0]
+        for partial in partials[1:]:
+            evaluator.merge(partial)
+        self.evaluator = evaluator
+    
     def save_metrics(self, output_directory) :
         if output_directory is not None:
             self.output_directory = output_directory
@@ -170,8 +225,7 @@ class BoundingBoxValidator(BaseValidator):
             precision = result['precision']
             recall = result['recall']
             l, = ax.plot(recall, precision)
-            label = '{} (ap :{:.3f})'.format(
-                list(self.evaluator.bboxes.class_map.values())[i], result['ap'])
+            label = '{} (ap :{:.3f})'.format(result['class'], result['ap'])
             lines.append(l)
             labels.append(label)
         ax.legend()
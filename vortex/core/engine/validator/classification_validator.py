@@ -13,67 +13,67 @@ from sklearn.metrics import roc_curve, roc_auc_score
 from sklearn.metrics import precision_recall_fscore_support
 
 from vortex.predictor.base_module import BasePredictor
+from vortex.utils.metrics.accumulator import ClassificationAccumulator
+from vortex_runtime.basic_runtime import ColumnarResults
 
 from .base_validator import BaseValidator
 
 class ClassificationValidator(BaseValidator):
     ## TODO : read from core task definition
     __output_format__ = ['class_label', 'class_confidence']
-    def __init__(self, predictor, dataset, device = torch.device('cpu'), *args, **kwargs):
+    ## one row per image, accumulated from columns directly
+    columnar_results = True
+    def __init__(self, predictor, dataset, device = torch.device('cpu'), curve_bins: Union[int,None] = None, *args, **kwargs):
         super(ClassificationValidator, self).__init__(
             predictor=predictor, dataset=dataset, *args, **kwargs
         )
-        self.results = None
+        ## number of score bins of bounded-memory pr and roc curve, exact curves if None
+        self.curve_bins = curve_bins
+        self.accumulator = None
         self.confusion_matrix = None
-    
+
+    def validation_args(self) -> Dict[str,Any] :
+        args = super(ClassificationValidator, self).validation_args()
+        if self.curve_bins is not None:
+            args.update(dict(curve_bins=self.curve_bins))
+        return args
+
+    def _n_data(self):
+        return len(self.dataset.dataset) if isinstance(self.dataset, torch.utils.data.DataLoader) \
+            else len(self.dataset)
+
     def eval_init(self, *args, **kwargs) :
-        self.correct = 0
-        self.results = {
-            'truths' : {}, 
-            'predictions' : {}, 
-            'scores' : {},
-        } ## {str : {int : []}}
-    
-    def update_results(self, index : int, results : List[Dict[str,np.ndarray]], targets : Union[np.ndarray,torch.Tensor], last_index : bool) :
-        label = targets.cpu().numpy() if isinstance(targets, torch.Tensor) else targets
+        n_classes = len(self.class_names) if self.class_names is not None else 0
+        self.accumulator = ClassificationAccumulator(self._n_data(), n_classes=n_classes,
+            curve_bins=self.curve_bins)
+
+    def update_results(self, index : int, results : Union[ColumnarResults,List[Dict[str,np.ndarray]]], targets : Union[np.ndarray,torch.Tensor], last_index : bool) :
+        if isinstance(targets, list):
+            targets = [t.cpu().numpy() if isinstance(t, torch.Tensor) else t for t in targets]
+        label = targets.cpu().numpy() if isinstance(targets, torch.Tensor) else np.asarray(targets)
         if self.labels_fmt.class_label is not None:
             idx = self.labels_fmt.class_label.indices
             axs = self.labels_fmt.class_label.axis
             label = np.take(label, idx, axis=axs)
-        result_class_label = list(map(lambda x: int(x['class_label']), results))
-        result_class_confidence = list(map(lambda x: float(x['class_confidence']), results))
-        if isinstance(label, np.ndarray) :
-            label = label.flatten().tolist()
-        self.logger('results : {}'.format(result_class_label))
-        self.logger('targets : {}'.format(label))
-        self.logger('scores  : {}'.format(result_class_confidence))
-        correct = np.sum(np.equal(result_class_label, label))
-        self.correct += correct
-        for batch_idx, (gt, result_class, result_confidence) in enumerate(zip(label, result_class_label, result_class_confidence)) :
-            gt = int(gt)
-            if gt in self.results['truths'] :
-                self.results['truths'][gt].append(gt)
-                self.results['predictions'][gt].append(result_class)
-                self.results['scores'][gt].append(result_confidence)
-            else :
-                self.results['truths'][gt] = [gt]
-                self.results['predictions'][gt] = [result_class]
-                self.results['scores'][gt] = [result_confidence]
+        if isinstance(results, ColumnarResults):
+            result_class_label = results['class_label'].reshape(-1).astype(np.int64)
+            result_class_confidence = results['class_confidence'].reshape(-1).astype(np.float64)
+        else:
+            result_class_label = np.fromiter((x['class_label'] for x in results), dtype=np.int64, count=len(results))
+            result_class_confidence = np.fromiter((x['class_confidence'] for x in results), dtype=np.float64, count=len(results))
+        label = np.asarray(label).reshape(-1)
+        self.logger('results : %s', result_class_label)
+        self.logger('targets : %s', label)
+        self.logger('scores  : %s', result_class_confidence)
+        self.accumulator.update(label, result_class_label, result_class_confidence)
 
     def compute_metrics(self):
-        n_data = len(self.dataset.dataset) if isinstance(self.dataset, torch.utils.data.DataLoader) \
-            else len(self.dataset)
-        metrics = {'accuracy': self.correct / n_data}
-
-        num_classes = len(self.results['truths'])
-        y_true, y_pred, score = [], [], []
-        for i in range(num_classes):
-            y_true.extend(self.results['truths'][i])
-            y_pred.extend(self.results['predictions'][i])
-            score.extend(self.results['scores'][i])
+        metrics = {'accuracy': self.accumulator.correct / self.accumulator.count}
 
+        ## confusion matrix cells weighted by count, same as per sample labels
+        y_true, y_pred, weights = self.accumulator.confusion_pairs()
         for avg in ('micro', 'macro', 'weighted'):
-            p, r, f1, _ = precision_recall_fscore_support(y_true, y_pred, average=avg)
+            p, r, f1, _ = precision_recall_fscore_support(y_true, y_pred, average=avg, sample_weight=weights)
             metrics.update({
                 "precision ({})".format(avg): p,
                 "recall ({})".format(avg): r,
@@ -81,54 +81,39 @@ class ClassificationValidator(BaseValidator):
             })
         return metrics
 
+    def partial_results(self) -> ClassificationAccumulator:
+        return self.accumulator
+
+    def merge_results(self, partials : List[ClassificationAccumulator]):
+        accumulator = partials[0]
+        for partial in partials[1:]:
+            accumulator.merge(partial)
+        self.accumulator = accumulator
+
     def save_metrics(self, output_directory) :
-        results = pd.DataFrame(self.results)
-        n_classes = len(results['truths'])
-
-        ## compute confusion matrix
-        y_true_flat, y_pred_flat = [], []
-        for i in range(n_classes) :
-            y_true_flat.extend(results['truths'][i])
-            y_pred_flat.extend(results['predictions'][i])
-        cm = confusion_matrix(
-            y_true=y_true_flat,
-            y_pred=y_pred_flat,
-        )
+        ## compute confusion matrix, from labels found in ground truth or prediction
+        class_labels = self.accumulator.classes
+        cm = self.accumulator.confusion[np.ix_(class_labels, class_labels)]
         cm = cm / cm.sum(axis=1, keepdims=True)
-        df_cm = pd.DataFrame(cm, range(cm.shape[0]), range(cm.shape[1]))
-
-        to_list = lambda mapping : list(mapping[i] for i in range(len(mapping)))
-        truths = np.array(to_list(results['truths']))
-        predictions = np.array(to_list(results['predictions']))
-        scores = np.array(to_list(results['scores']))
-
-        ## truths, predictions, scores are mappings 
-        ## truths : class_label -> class_label, 
-        ## predictions : class_label -> prediction, 
-        ## scores : class_label -> score,
-        ## each size is (n_classes, n_samples)
+        df_cm = pd.DataFrame(cm, class_labels, class_labels)
+
+        ## one-vs-rest curve of each ground truth class, among the samples of that class
         average_precisions, precisions, recalls = [], [], []
         roc_aucs, fprs, tprs = [], [], []
-        for class_truths, class_predictions, class_scores in zip(truths, predictions, scores):
-            n_samples = len(class_predictions)
-            scores_mat = np.zeros((n_samples, n_classes))
-            truths_mat = np.zeros_like(scores_mat)
-            ## one hot encoding, fill with scores and label
-            scores_mat[np.arange(n_samples), class_predictions] = class_scores
-            truths_mat[np.arange(n_samples), class_truths] = 1
-
+        curve_classes = []
+        for class_label, class_scores, class_truths, class_weights in self.accumulator.curve_inputs():
+            curve_classes.append(class_label)
             average_precisions.append(
-                average_precision_score(truths_mat.flatten(), scores_mat.flatten())
+                average_precision_score(class_truths, class_scores, sample_weight=class_weights)
             )
             precision, recall, _ = precision_recall_curve(
-                truths_mat.flatten(),
-                scores_mat.flatten(),
+                class_truths, class_scores, sample_weight=class_weights,
             )
             precisions.append(precision)
             recalls.append(recall)
 
-            roc_aucs.append(roc_auc_score(truths_mat.flatten(), scores_mat.flatten()))
-            fpr, tpr, _ = roc_curve(truths_mat.flatten(), scores_mat.flatten())
+            roc_aucs.append(roc_auc_score(class_truths, class_scores, sample_weight=class_weights))
+            fpr, tpr, _ = roc_curve(class_truths, class_scores, sample_weight=class_weights)
             fprs.append(fpr)
             tprs.append(tpr)
 
@@ -160,7 +145,7 @@ class ClassificationValidator(BaseValidator):
         plt.gcf().set_size_inches((6.4,4.8))
         lines, labels = [], []
         colors = cycle(['navy', 'turquoise', 'darkorange', 'cornflowerblue', 'teal'])
-        for i, (precision, recall, ap, color) in enumerate(zip(precisions, recalls, average_precisions, colors)) :
+        for i, precision, recall, ap, color in zip(curve_classes, precisions, recalls, average_precisions, colors) :
             l, = ax.plot(recall, precision, color=color)
             class_name = 'class_{}'.format(i) if self.class_names is None else self.class_names[i]
             label = '{} (ap :{:.2f}'.format(class_name, ap)
@@ -188,7 +173,7 @@ class ClassificationValidator(BaseValidator):
         ax = plt.gca()
         plt.gcf().set_size_inches((6.4,4.8))
         lines, labels = [], []
-        for i, (fpr, tpr, auc, color) in enumerate(zip(fprs, tprs, roc_aucs, colors)) :
+        for i, fpr, tpr, auc, color in zip(curve_classes, fprs, tprs, roc_aucs, colors) :
             l, = ax.plot(fpr, tpr, color=color)
             class_name = 'class_{}'.format(i) if self.class_names is None else self.class_names[i]
             label = '{} (auc :{:.2f})'.format(class_name, auc)
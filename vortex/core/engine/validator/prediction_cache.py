@@ -0,0 +1,134 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import warnings
+
+from pathlib import Path
+from typing import Union, Any
+
+__all__ = [
+    'PredictionCache',
+    'file_hash',
+]
+
+## bump when the format of cached entry changes
+CACHE_VERSION = 2
+ENTRY_SUFFIX = '.pkl'
+
+
+def file_hash(path: Union[str, Path], chunk_size: int = 2 ** 20) -> str:
+    """sha256 hex digest of file content, e.g. model weights or exported model"""
+    digest = hashlib.sha256()
+    with open(str(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Content-addressed cache of validation predictions on disk
+
+    Each entry holds the formatted predictions and targets of every batch of a validation run
+    with its prediction time, keyed by `make_key` from the model file hash, dataset identity,
+    preprocessing and prediction arguments. Validating the same model on the same dataset
+    again replays the entry instead of decoding and predicting.
+
+    Total size is capped by `max_size` (MB), least recently used entries are removed first.
+
+    Args:
+        cache_dir (Union[str,Path]): cache directory
+        max_size (float, optional): maximum total size of cached entries in MB. Defaults to 1024.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: float = 1024):
+        if max_size <= 0:
+            raise RuntimeError("expects prediction cache `max_size` to be positive, got %s" % max_size)
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(**identity) -> str:
+        """Key of the entry identified by json-serializable `identity`, e.g. model hash, dataset and
+        preprocessing configuration; non-serializable values are converted to string
+        """
+        identity = dict(identity, cache_version=CACHE_VERSION)
+        serialized = json.dumps(identity, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / (key + ENTRY_SUFFIX)
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def get(self, key: str) -> Union[Any, None]:
+        """Cached entry of `key`, None if not found or unreadable"""
+        path = self._path(key)
+        try:
+            with open(str(path), 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            warnings.warn("removing unreadable prediction cache entry '%s' : %s" % (path, e))
+            self.invalidate(key)
+            return None
+        ## mark as recently used
+        os.utime(str(path))
+        return value
+
+    def put(self, key: str, value: Any):
+        """Write entry of `key` atomically, then remove least recently used entries above `max_size`"""
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.cache_dir), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, str(self._path(key)))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=key)
+
+    def invalidate(self, key: Union[str, None] = None):
+        """Remove the entry of `key`, or every entry if `key` is None"""
+        paths = [self._path(key)] if key is not None else self.entries()
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def entries(self):
+        return sorted(self.cache_dir.glob('*' + ENTRY_SUFFIX))
+
+    def size(self) -> float:
+        """Total size of cached entries in MB"""
+        return sum(path.stat().st_size for path in self.entries()) / 2 ** 20
+
+    def _evict(self, keep: Union[str, None] = None):
+        entries = []
+        for path in self.entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        max_bytes = self.max_size * 2 ** 20
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if keep is not None and path == self._path(keep):
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        if total > max_bytes and keep is not None:
+            warnings.warn("prediction cache entry is larger than cache `max_size` of %s MB, not cached" % self.max_size)
+            self.invalidate(keep)
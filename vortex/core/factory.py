@@ -1,26 +1,23 @@
 import os
 import sys
 from pathlib import Path
-import torch
 from easydict import EasyDict
 from typing import Union,Callable,Type
 import logging
-from torch.utils.data.dataloader import DataLoader
 
-
-from vortex.networks.models import create_model_components
-from vortex.utils.data.dataset.wrapper import DatasetWrapper
-from vortex.utils.data.collater import create_collater
-from vortex.utils.logger.base_logger import ExperimentLogger
-from vortex.utils.logger import create_logger
 from vortex_runtime import model_runtime_map
 
+## heavy dependencies (torch, networks, dataset, logger) are imported inside
+## each factory function so a stage only pays for what it actually creates
+
 __all__ = ['create_model','create_runtime_model','create_dataset','create_dataloader','create_experiment_logger','create_exporter']
 
 def create_model(model_config : EasyDict,
                  state_dict : Union[str,None] = None,
                  stage : str = 'train',
                  debug : bool = False) -> EasyDict:
+    import torch
+    from vortex.networks.models import create_model_components
     if stage not in ['train','validate'] :
         raise TypeError('Unknown model "stage" argument, got {}, expected "train" or "validate"'%stage)
 
@@ -84,6 +81,8 @@ def create_runtime_model(model_path : Union[str, Path],
 def create_dataset(dataset_config : EasyDict,
                    preprocess_config : EasyDict,
                    stage : str):
+    from vortex.utils.data.dataset.wrapper import DatasetWrapper, IterableDatasetWrapper
+    from vortex.utils.data.dataset.dataset import is_iterable_dataset
     if stage == 'train' :
         dataset = dataset_config.train.dataset
         try:
@@ -91,42 +90,107 @@ def create_dataset(dataset_config : EasyDict,
         except:
             augmentations = []
         dataset_args = dataset_config.train.args
+        subset = dataset_config.train.get('subset', None)
+        aspect_ratio_bucket = dataset_config.train.get('aspect_ratio_bucket', None)
+        decode_threads = dataset_config.train.get('decode_threads', 0)
     elif stage == 'validate':
         dataset = dataset_config.eval.dataset
         augmentations = []
         dataset_args = dataset_config.eval.args
+        subset = dataset_config.eval.get('subset', None)
+        aspect_ratio_bucket = None
+        decode_threads = dataset_config.eval.get('decode_threads', 0)
     else:
         raise TypeError('Unknown dataset "stage" argument, got {}, expected "train" or "validate"'%stage)
 
-    return DatasetWrapper(dataset=dataset, stage=stage, preprocess_args=preprocess_config,
-                          augmentations=augmentations, dataset_args=dataset_args)
+    ## sequential read at training, random access at validation
+    wrapper = IterableDatasetWrapper if stage == 'train' and is_iterable_dataset(dataset) else DatasetWrapper
+    return wrapper(dataset=dataset, stage=stage, preprocess_args=preprocess_config,
+                   augmentations=augmentations, dataset_args=dataset_args, subset=subset,
+                   aspect_ratio_bucket=aspect_ratio_bucket, decode_threads=decode_threads)
 
 def create_dataloader(dataset_config : EasyDict, 
                       preprocess_config : EasyDict, 
                       stage : str,
                       collate_fn : Union[Callable,str,None] = None ):
+    from torch.utils.data import IterableDataset
+    from torch.utils.data.dataloader import DataLoader, default_collate
+    from torch.utils.data.sampler import BatchSampler, RandomSampler, SequentialSampler
+    from vortex.utils.data.collater import create_collater
 
     dataset = create_dataset(dataset_config=dataset_config, stage='train', preprocess_config=preprocess_config)
     if isinstance(collate_fn,str):
         collater_args = {}
-        try:
-            collater_args = config.dataset.dataloader.collater.args
-        except:
-            pass
+        if 'collater' in dataset_config.dataloader and 'args' in dataset_config.dataloader.collater:
+            collater_args = dict(dataset_config.dataloader.collater.args)
         collater_args['dataformat'] = dataset.data_format
         collate_fn = create_collater(collate_fn, **collater_args)
     elif hasattr(collate_fn,'__call__') or collate_fn is None:
         pass
     else :
         raise TypeError('Unknown type of "collate_fn", should be in the type of string, Callable, or None. Got {}'%type(collate_fn))
+    if dataset.bucket_ids is not None and collate_fn is not None and not getattr(collate_fn, 'rectangular', False):
+        ## targets (e.g. priors matching) of the model must follow the rectangular input shape
+        raise RuntimeError("'aspect_ratio_bucket' is not supported by collater %s (model without rectangular input "
+                           "support), supported collaters have `rectangular` attribute set" % type(collate_fn).__name__)
+    if dataset.batch_augments is not None:
+        ## batch augmentation and input normalization after collation, see BatchAugmentCollate
+        from vortex.utils.data.augment.batch import BatchAugmentCollate
+        collate_fn = BatchAugmentCollate(collate_fn, dataset.batch_augments, dataset.data_format,
+            preprocess_config.input_normalization)
     dataloader_module = dataset_config.dataloader
     dataloader_module_args = dataset_config.dataloader.args
     if not dataloader_module == 'DataLoader':
         RuntimeError("dataloader %s not supported, currently only support pytorch DataLoader")
-    dataloader = DataLoader(dataset, collate_fn=collate_fn, **dataloader_module_args)
+    if isinstance(dataset, IterableDataset):
+        ## samples order is given by the dataset itself (e.g. shuffle buffer)
+        dataloader_module_args = dict(dataloader_module_args)
+        dataloader_module_args.pop('shuffle', None)
+    batch_sampler = None
+    if dataset.bucket_ids is not None or dataset.batch_fetch:
+        dataloader_module_args = dict(dataloader_module_args)
+        batch_size = dataloader_module_args.pop('batch_size', 1)
+        shuffle = dataloader_module_args.pop('shuffle', False)
+        drop_last = dataloader_module_args.pop('drop_last', False)
+        if dataset.bucket_ids is not None:
+            ## aspect ratio bucketing, batches are built from a single bucket by the batch sampler
+            batch_sampler = dataset.batch_sampler(batch_size=batch_size, shuffle=shuffle, drop_last=drop_last)
+        else:
+            sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+            batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=drop_last)
+    if dataset.batch_fetch and collate_fn is None:
+        collate_fn = default_collate
+    def _create_dataloader(args):
+        if dataset.batch_fetch:
+            ## batch fetch, each worker gets the whole batch indices and decodes them in its thread pool
+            ## (or indexes them at once from in-memory dataset)
+            return DataLoader(dataset, collate_fn=collate_fn, batch_size=None, sampler=batch_sampler, **args)
+        elif batch_sampler is not None:
+            return DataLoader(dataset, collate_fn=collate_fn, batch_sampler=batch_sampler, **args)
+        return DataLoader(dataset, collate_fn=collate_fn, **args)
+    if dataset_config.dataloader.get('autotune', None):
+        ## measure candidate worker and transfer settings on the actual dataset and collater,
+        ## once per process for the same configuration (e.g. hypopt trials)
+        import json
+        from vortex.utils.data.autotune import autotune_dataloader
+        ## input normalization 'scaler' default is filled by the dataset on first access
+        preprocess = dict(preprocess_config)
+        if 'input_normalization' in preprocess:
+            preprocess['input_normalization'] = dict(preprocess['input_normalization'])
+            preprocess['input_normalization'].setdefault('scaler', 255)
+        cache_key = json.dumps(dict(dataset=dataset_config.train, preprocess=preprocess,
+            dataloader=dataset_config.dataloader, collate_fn=type(collate_fn).__name__), sort_keys=True, default=str)
+        dataloader_module_args = autotune_dataloader(_create_dataloader, dataset, dataloader_module_args,
+            dataset_config.dataloader.autotune, cache_key=cache_key)
+    if dataloader_module_args.get('persistent_workers', False) and hasattr(dataset.dataset, 'set_epoch'):
+        ## `set_epoch` only reaches the dataset of the main process, persistent workers would replay the first epoch
+        raise RuntimeError("dataloader 'persistent_workers' is not supported by epoch-dependent dataset %s"
+                           % type(dataset.dataset).__name__)
+    dataloader = _create_dataloader(dataloader_module_args)
     return dataloader
 
 def create_experiment_logger(config : EasyDict):
+    from vortex.utils.logger import create_logger
     logger = config.logging
     experiment_logger = create_logger(logger,config)
 
@@ -1,5 +1,31 @@
-from vortex.core.pipelines.training_pipeline import TrainingPipeline
-from vortex.core.pipelines.validation_pipeline import PytorchValidationPipeline,IRValidationPipeline
-from vortex.core.pipelines.export_pipeline import GraphExportPipeline
-from vortex.core.pipelines.prediction_pipeline import PytorchPredictionPipeline, IRPredictionPipeline
-from vortex.core.pipelines.hypopt_pipeline import HypOptPipeline
\ No newline at end of file
+import sys
+import importlib
+
+## pipeline name -> module, each pipeline module is only imported on first access
+## so that a stage doesn't pay for dependencies of the others (e.g. optuna, comet_ml)
+_pipeline_modules = {
+    'TrainingPipeline': 'training_pipeline',
+    'PytorchValidationPipeline': 'validation_pipeline',
+    'IRValidationPipeline': 'validation_pipeline',
+    'GraphExportPipeline': 'export_pipeline',
+    'PytorchPredictionPipeline': 'prediction_pipeline',
+    'IRPredictionPipeline': 'prediction_pipeline',
+    'HypOptPipeline': 'hypopt_pipeline',
+    'IRServingPipeline': 'serving_pipeline',
+}
+
+__all__ = list(_pipeline_modules.keys())
+
+def __getattr__(name : str):
+    if name in _pipeline_modules:
+        module = importlib.import_module('%s.%s' % (__name__, _pipeline_modules[name]))
+        return getattr(module, name)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
+
+## module-level __getattr__ (PEP 562) requires python 3.7, import eagerly otherwise
+if sys.version_info < (3, 7):
+    for _name in __all__:
+        globals()[_name] = __getattr__(_name)
@@ -14,6 +14,7 @@ from vortex.core.pipelines.training_pipeline import TrainingPipeline
 from vortex.core.pipelines.validation_pipeline import PytorchValidationPipeline
 from vortex.utils.parser.override import override_param
 from vortex.utils.common import check_and_create_output_dir
+from vortex.utils.data.dataset.subset import check_subset_args
 from vortex.core.pipelines.base_pipeline import BasePipeline
 
 logger = logging.getLogger(__name__)
@@ -219,7 +220,8 @@ class BaseObjective :
                  param_opt_config : EasyDict, 
                  reduction : str='latest', 
                  reduction_args : dict={}, 
-                 direction : str ='minimize'):
+                 direction : str ='minimize',
+                 dataset_subset : Union[dict,None] = None):
         """Base initialization
 
         Args:
@@ -238,6 +240,10 @@ class BaseObjective :
                                             - 'quantile' : see numpy.quantile
             reduction_args (dict, optional): the corresponding arguments for selected `reduction`. Defaults to {}.
             direction (str, optional): either 'maximize' or 'minimize' the objective value. Defaults to 'minimize'.
+            dataset_subset (Union[dict,None], optional): deterministic subset applied to every dataset in the experiment
+                                                         file (`train` and `eval`), containing either `fraction` or `count`
+                                                         and optional `seed`. The subset size can also be searched as
+                                                         a parameter, e.g. `dataset.train.subset.fraction`. Defaults to None.
 
         Raises:
             KeyError: raise error if overrided parameters not exist in experiment config
@@ -245,6 +251,12 @@ class BaseObjective :
 
         self.config = EasyDict(config)
         self.param_opt_config = EasyDict(param_opt_config)
+        if dataset_subset is not None:
+            dataset_subset = check_subset_args(dataset_subset)
+            for stage in ['train', 'eval']:
+                if stage in self.config.dataset:
+                    logger.info('config.dataset.%s.subset = %s' %(stage, dict(dataset_subset)))
+                    self.config.dataset[stage].subset = EasyDict(dataset_subset)
         self.best_metric = None
         self.original_param = {}
         for key, value in self.param_opt_config.override.items() :
@@ -1,21 +1,106 @@
 from pathlib import Path
 
-from typing import Union,List, Type
+from typing import Union,List, Type, Iterable, Iterator
+import os
 import numpy as np
 import warnings
+import queue
+import threading
+import collections
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 from easydict import EasyDict
-import torch
 
 from vortex.core.factory import create_model,create_dataset , create_runtime_model
 from vortex_runtime import model_runtime_map
+from vortex_runtime.letterbox import letterbox_batch, letterbox_to_original
+from vortex_runtime.basic_runtime import ColumnarResults, IMAGE_INDEX
+from vortex.utils.data.decode import read_image, read_video, video_fps
+from vortex.utils.prediction.writer import list_images, prediction_record, create_writer, BulkCheckpoint
 from vortex.utils.visual import visualize_result
-from vortex.predictor import create_predictor, get_prediction_results
 from vortex.utils.common import check_and_create_output_dir
 from vortex.core.pipelines.base_pipeline import BasePipeline
 
 __all__ = ['PytorchPredictionPipeline','IRPredictionPipeline']
 
+def _prefetch(iterable : Iterable, size : int) -> Iterator:
+    """Iterate `iterable` on a background thread, at most `size` items ahead of the consumer,
+    e.g. decode the next video frames while the current ones are predicted
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+    def put(item) -> bool:
+        ## never block once the consumer stopped
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    def producer():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        ## consumer stopped early, e.g. generator closed
+        stop.set()
+
+
+def _head(results : Union[ColumnarResults,List], n : int) -> Union[ColumnarResults,List]:
+    """results of the first `n` images, e.g. to drop padded batch slot(s)"""
+    return results.head(n) if isinstance(results, ColumnarResults) else results[:n]
+
+
+def _split(results : Union[ColumnarResults,List]) -> List:
+    """per-image results"""
+    return results.split() if isinstance(results, ColumnarResults) else list(results)
+
+
+def _parallel_map(fn, iterable : Iterable, num_workers : int, size : int) -> Iterator:
+    """Ordered `map(fn, iterable)` on a pool of `num_workers` threads, at most `size` items in flight,
+    e.g. decode the next images while the current ones are predicted
+    """
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = collections.deque()
+        try:
+            for item in iterable:
+                pending.append(executor.submit(fn, item))
+                if len(pending) >= size:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _batched(iterable : Iterable, batch_size : int) -> Iterator[list]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 class BasePredictionPipeline(BasePipeline):
     """Vortex Base Prediction Pipeline
 
@@ -47,6 +132,7 @@ class BasePredictionPipeline(BasePipeline):
             visualize : bool = False,
             dump_visual : bool = False,
             output_dir : Union[str,Path] = '.',
+            columnar : bool = False,
             **kwargs) -> EasyDict:
         """Function to execute the prediction pipeline
 
@@ -55,6 +141,9 @@ class BasePredictionPipeline(BasePipeline):
             visualize (bool, optional): option to return prediction visualization. Defaults to False.
             dump_visual (bool, optional): option to dump prediction visualization. Defaults to False.
             output_dir (Union[str,Path], optional): directory path to dump visualization. Defaults to '.' .
+            columnar (bool, optional): option to return prediction of the batch as `ColumnarResults`, one array \
+                                       per output field with `image_index` column, instead of list of result \
+                                       per image. Defaults to False.
             kwargs (optional) : this kwargs is placement for additional input parameters specific to \
                                 models'task
 
@@ -113,9 +202,13 @@ class BasePredictionPipeline(BasePipeline):
             image_paths = [Path(image) for image in images]
             for image_path in image_paths :
                 assert image_path.exists(), "image {} doesn't exist".format(str(image_path))
-            batch_mat = [cv2.imread(image) for image in images]
+            # Visualization is drawn on full resolution image, otherwise JPEG may be decoded at reduced resolution
+            decode_size = None if visualize else getattr(self, 'decode_size', None)
+            batch_mat, original_shapes = zip(*[read_image(image, size=decode_size) for image in images])
+            batch_mat = list(batch_mat)
         elif isinstance(images[0],np.ndarray):
             batch_mat = images
+            original_shapes = None
             for image in batch_mat:
                 assert len(image.shape) == 3, "Provided 'images' list member in numpy ndarray must be of dim 3, [h , w , c]"
         else:
@@ -123,13 +216,14 @@ class BasePredictionPipeline(BasePipeline):
 
         # Resize input images
         
-        batch_vis = [mat.copy() for mat in batch_mat]
+        batch_vis = [mat.copy() for mat in batch_mat] if visualize else batch_mat
         batch_imgs = batch_mat
-        results = self._run_inference(batch_imgs,**kwargs)
+        results = _head(self._run_inference(batch_imgs,**kwargs), len(batch_imgs))
 
         # Transform coordinate-based result from relative coordinates to absolute value
         results = self._check_and_transform(batch_vis = batch_vis,
-                                            batch_results = results)
+                                            batch_results = results,
+                                            original_shapes = original_shapes)
 
         # Visualize prediction
         if visualize:
@@ -152,26 +246,228 @@ class BasePredictionPipeline(BasePipeline):
                     filenames.append(str(filename))
                 print('prediction saved to {}'.format(str(', '.join(filenames))))
 
-            return EasyDict({'prediction' : results , 'visualization' : result_vis})
+        prediction = results if columnar else _split(results)
+        if visualize:
+            return EasyDict({'prediction' : prediction , 'visualization' : result_vis})
+        else:
+            return EasyDict({'prediction' : prediction , 'visualization' : None})
+
+
+    def run_stream(self,
+                   source : Union[str,Path,Iterable[np.ndarray]],
+                   batch_size : Union[int,None] = None,
+                   visualize : bool = False,
+                   output_video : Union[str,Path,None] = None,
+                   fps : Union[float,None] = None,
+                   **kwargs) -> Iterator[EasyDict]:
+        """Function to execute the prediction pipeline on a stream of frames, e.g. video file
+
+        Frames are decoded on a background thread ahead of the inference, batched up to `batch_size`
+        and the result of each frame is yielded as soon as its batch is predicted; only a few batches
+        of frames are kept in memory regardless of the stream length.
+
+        Args:
+            source (Union[str,Path,Iterable[np.ndarray]]): path to video file (or any `cv2.VideoCapture` source), \
+                                                          or iterable of BGR frames [h, w, c]
+            batch_size (Union[int,None], optional): number of frames predicted together. Defaults to None, \
+                                                    model batch size for IR model and 1 otherwise.
+            visualize (bool, optional): option to return prediction visualization of each frame. Defaults to False.
+            output_video (Union[str,Path,None], optional): path to write annotated video. Defaults to None.
+            fps (Union[float,None], optional): frame rate of `output_video`. Defaults to None, frame rate of \
+                                               video `source` or 30.
+            kwargs (optional) : this kwargs is placement for additional input parameters specific to \
+                                models'task
+
+        Yields:
+            EasyDict: 'index' of the frame, its 'prediction' and 'visualization' (None if not `visualize`)
+
+        Example:
+            ```python
+            vortex_predictor=IRPredictionPipeline(model = model_file,
+                                                  runtime = runtime)
+
+            for result in vortex_predictor.run_stream('video.mp4',
+                                                      output_video = 'video_prediction.mp4',
+                                                      score_threshold=0.9,
+                                                      iou_threshold=0.2):
+                print(result.index, result.prediction)
+            ```
+        """
+        assert self.class_names , "'self.class_names' must be implemented in the sub class"
+        max_batch_size = getattr(self, 'max_batch_size', None)
+        if batch_size is None:
+            batch_size = max_batch_size or 1
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise RuntimeError("expects `batch_size` to be a positive int, got %s" % batch_size)
+        if max_batch_size is not None and batch_size > max_batch_size:
+            raise RuntimeError("expects `batch_size` at most the model batch size {}, got {}".format(
+                max_batch_size, batch_size))
+
+        ## decoded frames are owned by the pipeline and can be drawn on directly
+        is_video = isinstance(source, (str, Path))
+        if is_video:
+            if fps is None:
+                fps = video_fps(source)
+            frames = read_video(source)
         else:
-            return EasyDict({'prediction' : results , 'visualization' : None})
+            frames = iter(source)
+        annotate = visualize or output_video is not None
+
+        writer = None
+        index = 0
+        try:
+            for batch_mat in _batched(_prefetch(frames, 2 * batch_size), batch_size):
+                for frame in batch_mat:
+                    assert len(frame.shape) == 3, "expects frame of dim 3, [h , w , c], found {}".format(frame.shape)
+                results = _head(self._run_inference(batch_mat, **kwargs), len(batch_mat))
+                results = self._check_and_transform(batch_vis=batch_mat, batch_results=results)
+                batch_vis = [None] * len(batch_mat)
+                if annotate:
+                    batch_vis = self._visualize(
+                        batch_vis=batch_mat if is_video and not visualize else [mat.copy() for mat in batch_mat],
+                        batch_results=results)
+                if output_video is not None:
+                    for vis in batch_vis:
+                        if writer is None:
+                            Path(output_video).parent.mkdir(parents=True, exist_ok=True)
+                            writer = cv2.VideoWriter(str(output_video), cv2.VideoWriter_fourcc(*'mp4v'),
+                                fps or 30., (vis.shape[1], vis.shape[0]))
+                        writer.write(vis)
+                for result, vis in zip(_split(results), batch_vis):
+                    yield EasyDict({'index' : index, 'prediction' : result,
+                                    'visualization' : vis if visualize else None})
+                    index += 1
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def run_bulk(self,
+                 images : List[Union[str,Path]],
+                 output : Union[str,Path],
+                 batch_size : Union[int,None] = None,
+                 output_format : Union[str,None] = None,
+                 num_workers : int = 4,
+                 resume : bool = True,
+                 checkpoint_interval : int = 1024,
+                 **kwargs) -> EasyDict:
+        """Function to execute the prediction pipeline offline on a large number of images
+
+        Images are decoded by `num_workers` threads ahead of the inference and predicted in batches of
+        `batch_size`; records are appended to `output` as they are predicted, nothing is visualized and
+        only a few batches are kept in memory. Every `checkpoint_interval` images, written records are
+        made durable and the progress is saved to `{output}.checkpoint.json`, so an interrupted run
+        with the same model, images and arguments resumes after the last checkpoint.
+
+        Each record holds the image 'path', decode 'error' (None if predicted) and the prediction
+        fields (e.g. 'class_label', 'class_confidence', 'bounding_box') as (nested) list.
+
+        Args:
+            images (List[Union[str,Path]]): image file(s), directory(s) walked recursively and/or \
+                                            `.txt` file(s) listing one image path per line
+            output (Union[str,Path]): output JSON Lines file, or Parquet directory
+            batch_size (Union[int,None], optional): number of images predicted together. Defaults to None, \
+                                                    model batch size for IR model and 1 otherwise.
+            output_format (Union[str,None], optional): 'jsonl' or 'parquet'. Defaults to None, 'parquet' if \
+                                                       `output` has '.parquet' suffix, 'jsonl' otherwise.
+            num_workers (int, optional): number of image decoding threads. Defaults to 4.
+            resume (bool, optional): resume from checkpoint of previous run if any, otherwise overwrite \
+                                     `output`. Defaults to True.
+            checkpoint_interval (int, optional): number of images between checkpoints. Defaults to 1024.
+            kwargs (optional) : this kwargs is placement for additional input parameters specific to \
+                                models'task
+
+        Returns:
+            EasyDict: 'output' path, number of 'images', number of 'predicted' and 'errors' images in this run, \
+                      and number of images 'resumed' from checkpoint
 
+        Example:
+            ```python
+            vortex_predictor=IRPredictionPipeline(model = model_file,
+                                                  runtime = runtime)
+
+            summary = vortex_predictor.run_bulk(images = ['images/'],
+                                                output = 'predictions.jsonl',
+                                                score_threshold=0.9,
+                                                iou_threshold=0.2)
+            ```
+        """
+        max_batch_size = getattr(self, 'max_batch_size', None)
+        if batch_size is None:
+            batch_size = max_batch_size or 1
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise RuntimeError("expects `batch_size` to be a positive int, got %s" % batch_size)
+        if max_batch_size is not None and batch_size > max_batch_size:
+            raise RuntimeError("expects `batch_size` at most the model batch size {}, got {}".format(
+                max_batch_size, batch_size))
+        if checkpoint_interval < 1:
+            raise RuntimeError("expects `checkpoint_interval` to be positive, got %s" % checkpoint_interval)
+
+        paths = list_images(images)
+        model_file = getattr(self, 'model_file', None)
+        model_stat = os.stat(model_file) if model_file is not None else None
+        checkpoint = BulkCheckpoint(output, identity=dict(
+            pipeline=type(self).__name__, model=model_file,
+            model_stat=(model_stat.st_size, model_stat.st_mtime) if model_stat else None,
+            images=BulkCheckpoint.hash_paths(paths), batch_size=batch_size,
+            output_format=output_format, kwargs=kwargs))
+        if not resume:
+            checkpoint.remove()
+        resumed = checkpoint.load()
+        writer = create_writer(output, output_format, state=checkpoint.state if resumed else None,
+                               prediction_format=self.prediction_format)
+
+        decode_size = getattr(self, 'decode_size', None)
+        def decode(path):
+            try:
+                image, original_shape = read_image(path, size=decode_size)
+            except Exception as e:
+                return path, None, None, str(e)
+            if image is None:
+                return path, None, None, "can't decode image"
+            return path, image, original_shape, None
+
+        start = done = checkpoint.done
+        n_errors = 0
+        try:
+            decoded = _parallel_map(decode, paths[start:], num_workers, size=2 * batch_size + num_workers)
+            for batch in _batched(decoded, batch_size):
+                predicted = [item for item in batch if item[3] is None]
+                batch_results = []
+                if predicted:
+                    batch_imgs = [image for _, image, _, _ in predicted]
+                    batch_results = _head(self._run_inference(batch_imgs, **kwargs), len(batch_imgs))
+                    batch_results = self._check_and_transform(batch_vis=batch_imgs, batch_results=batch_results,
+                        original_shapes=[shape for _, _, shape, _ in predicted])
+                ## decode errors are recorded in place, in the order of `paths`
+                batch_results = iter(_split(batch_results))
+                writer.write([prediction_record(path, next(batch_results) if error is None else None, error)
+                              for path, _, _, error in batch])
+                n_errors += len(batch) - len(predicted)
+                done += len(batch)
+                if done - checkpoint.done >= checkpoint_interval:
+                    checkpoint.save(done, writer.commit())
+            checkpoint.save(done, writer.commit(final=True))
+        finally:
+            writer.close()
+
+        return EasyDict({'output' : str(output), 'images' : len(paths), 'predicted' : done - start - n_errors,
+                         'errors' : n_errors, 'resumed' : start})
 
     def _visualize(self,
                    batch_vis : List,
-                   batch_results : List) -> List:
+                   batch_results : Union[ColumnarResults,List]) -> List:
         """Function to visualize prediction result
 
         Args:
             batch_vis (List): list of image(s) to be visualized
-            batch_results (List): list of prediction result(s) correspond to batch_vis
+            batch_results (Union[ColumnarResults,List]): prediction result(s) correspond to batch_vis
 
         Returns:
             List: list of visualized image(s)
         """
 
         result_vis = []
-        for vis, results in zip(batch_vis,  batch_results) :
+        for vis, results in zip(batch_vis,  _split(batch_results)) :
             result_vis.append(visualize_result(
                 vis=vis, results=[results],
                 class_names=self.class_names
@@ -180,34 +476,71 @@ class BasePredictionPipeline(BasePipeline):
 
     def _check_and_transform(self,
                              batch_vis : List,
-                             batch_results : List) -> List:
+                             batch_results : Union[ColumnarResults,List],
+                             original_shapes : Union[List,None] = None) -> Union[ColumnarResults,List]:
         """Function to transform relative coords to absolute coords
 
         Args:
             batch_vis (List): list of image(s) to be visualized
-            batch_results (List): list of prediction result(s) correspond to batch_vis
+            batch_results (Union[ColumnarResults,List]): prediction result(s) correspond to batch_vis
+            original_shapes (Union[List,None], optional): (height, width) of full resolution image(s) when
+                batch_vis is decoded at reduced resolution. Defaults to None, same as batch_vis.
 
         Returns:
-            List: list of transformed prediction result(s) correspond to batch_vis
+            Union[ColumnarResults,List]: transformed prediction result(s) correspond to batch_vis
         """
 
-        for vis, results in zip(batch_vis, batch_results) :
+        ## letterbox (scale, offset) of each image, set by `_run_inference`
+        letterbox_params = getattr(self, 'letterbox_params', None)
+        if isinstance(batch_results, ColumnarResults) :
+            return self._transform_columns(batch_vis, batch_results, letterbox_params, original_shapes)
+        for i, (vis, results) in enumerate(zip(batch_vis, batch_results)) :
             im_h, im_w, im_c = vis.shape
             for result in [results] :
-                if 'bounding_box' in result :
-                    bounding_box = result['bounding_box']
-                    if bounding_box is None :
-                        continue
-                    bounding_box[...,0::2] *= im_w
-                    bounding_box[...,1::2] *= im_h
-                    result['bounding_box'] = bounding_box
-                if 'landmarks' in result :
-                    landmarks = result['landmarks']
-                    if landmarks is None :
+                for key in ['bounding_box', 'landmarks'] :
+                    if not key in result or result[key] is None :
                         continue
-                    landmarks[...,0::2] *= im_w
-                    landmarks[...,1::2] *= im_h
-                    result['landmarks'] = landmarks
+                    coordinates = result[key]
+                    if letterbox_params is not None :
+                        input_size, scales, offsets = letterbox_params
+                        coordinates = letterbox_to_original(coordinates, input_size, scales[i], offsets[i])
+                    else :
+                        coordinates[...,0::2] *= im_w
+                        coordinates[...,1::2] *= im_h
+                    if original_shapes is not None and tuple(original_shapes[i]) != (im_h, im_w) :
+                        coordinates[...,0::2] *= original_shapes[i][1] / im_w
+                        coordinates[...,1::2] *= original_shapes[i][0] / im_h
+                    result[key] = coordinates
+        return batch_results
+
+    @staticmethod
+    def _transform_columns(batch_vis : List,
+                           batch_results : ColumnarResults,
+                           letterbox_params : Union[tuple,None],
+                           original_shapes : Union[List,None]) -> ColumnarResults:
+        """`_check_and_transform` of columnar results, every row is transformed at once
+        with parameters of its image gathered by `image_index`
+        """
+        image_index = batch_results[IMAGE_INDEX]
+        shapes = np.array([vis.shape[:2] for vis in batch_vis], dtype=np.float64)
+        for key in ['bounding_box', 'landmarks'] :
+            if not key in batch_results or not len(batch_results[key]) :
+                continue
+            coordinates = batch_results[key]
+            ## per row parameter, broadcast to coordinates
+            per_row = lambda values : values[image_index].reshape((-1,) + (1,) * (coordinates.ndim - 1))
+            if letterbox_params is not None :
+                input_size, scales, offsets = letterbox_params
+                coordinates = letterbox_to_original(coordinates, input_size, per_row(scales),
+                    (per_row(offsets[:,0]), per_row(offsets[:,1])))
+            else :
+                coordinates[...,0::2] *= per_row(shapes[:,1])
+                coordinates[...,1::2] *= per_row(shapes[:,0])
+            if original_shapes is not None :
+                ratios = np.array(original_shapes, dtype=np.float64) / shapes
+                coordinates[...,0::2] *= per_row(ratios[:,1])
+                coordinates[...,1::2] *= per_row(ratios[:,0])
+            batch_results[key] = coordinates
         return batch_results
 
 class PytorchPredictionPipeline(BasePredictionPipeline):
@@ -249,6 +582,9 @@ class PytorchPredictionPipeline(BasePredictionPipeline):
             ```
         """
 
+        import torch
+        from vortex.predictor import create_predictor
+
         self.config = config
         self.output_file_prefix = 'prediction'
 
@@ -278,26 +614,32 @@ class PytorchPredictionPipeline(BasePredictionPipeline):
         model_components.network = model_components.network.to(device)
         self.predictor = create_predictor(model_components)
         self.predictor.to(device)
+        self.prediction_format = self.predictor.output_format
+        self.model_file = str(filename)
 
         # Configure input size for image
         self.input_size = config.model.preprocess_args.input_size
+        self.decode_size = (self.input_size, self.input_size)
 
     def _run_inference(self,
                        batch_imgs : List[np.ndarray],
-                       **kwargs) -> List:
+                       **kwargs) -> ColumnarResults:
         """Function to run model's inference
 
         Args:
             batch_imgs (List[np.ndarray]): list of numpy array representation of batched input image(s)
 
         Returns:
-            List: list of batched prediction result(s)
+            ColumnarResults: batched prediction result(s) in columnar layout
         """
 
-        # TODO enable padding to keep aspect ratio
-        # Resize input
-        batch_imgs = [cv2.resize(img, (self.input_size,self.input_size)) for img in batch_imgs]
-        batch_imgs = np.stack(batch_imgs)
+        import torch
+        from vortex.predictor import get_prediction_results
+
+        # Resize input keeping aspect ratio, letterboxed directly into batch array
+        batch_imgs, scales, offsets = letterbox_batch(batch_imgs,
+            (len(batch_imgs), self.input_size, self.input_size, batch_imgs[0].shape[-1]))
+        self.letterbox_params = ((self.input_size, self.input_size), scales, offsets)
 
         # Do model inference
         device = list(self.predictor.parameters())[0].device
@@ -327,7 +669,8 @@ class PytorchPredictionPipeline(BasePredictionPipeline):
         output_format = self.predictor.output_format
         results = get_prediction_results(
             results=results,
-            output_format=output_format
+            output_format=output_format,
+            columnar=True
         )
         return results
 
@@ -336,12 +679,17 @@ class IRPredictionPipeline(BasePredictionPipeline):
     """
     def __init__(self,
                  model : Union[str,Path],
-                 runtime : str = 'cpu'):
+                 runtime : str = 'cpu',
+                 reuse_buffers : bool = False):
         """Class initialization
 
         Args:
             model (Union[str,Path]): path to Vortex IR model, file with extension '.onnx' or '.pt'
             runtime (str, optional): backend runtime to be selected for model's computation. Defaults to 'cpu'.
+            reuse_buffers (bool, optional): resize input images straight into the input buffer owned by the runtime, \
+                                            reused by every inference instead of allocating a new batch array; \
+                                            inference of the pipeline must not be called concurrently; ignored if \
+                                            model input is not uint8. Defaults to False.
         
         Example:
             ```python
@@ -374,21 +722,31 @@ class IRPredictionPipeline(BasePredictionPipeline):
 
         # Obtain input size
         self.input_shape = self.model.input_specs['input']['shape']
+        _, h, w, _ = self.input_shape if self.input_shape[-1] == 3 \
+            else tuple(self.input_shape[i] for i in [0,2,3,1])
+        self.decode_size = (h, w)
+        self.max_batch_size = self.input_shape[0]
+        self.prediction_format = self.model.output_format
+        self.model_file = str(model)
+        self.reuse_buffers = reuse_buffers
     
     @staticmethod
     def runtime_predict(predictor, 
                         image: np.ndarray, 
-                        **kwargs) -> List:
+                        columnar: bool = False,
+                        **kwargs) -> Union[List,ColumnarResults]:
         """Function to wrap Vortex runtime inference process
 
         Args:
             predictor : Vortex runtime object
             image (np.ndarray): array of batched input image(s) with dimension of 4 (n,h,w,c)
+            columnar (bool, optional): option to return `ColumnarResults` of the batch instead of list \
+                                       of dict per image. Defaults to False.
             kwargs (optional) : this kwargs is placement for additional input parameters specific to \
                                 models'task
 
         Returns:
-            List: list of prediction results
+            Union[List,ColumnarResults]: prediction results
 
         Example:
             ```python
@@ -420,32 +778,31 @@ class IRPredictionPipeline(BasePredictionPipeline):
             dtype = predictor.input_specs[name]['type'].replace('tensor(','').replace(')','')
             predict_args[name] = np.array([value], dtype=dtype) if isinstance(value, (float,int)) \
                 else np.asarray(value, dtype=dtype)
-        results = predictor(image, **predict_args)
-        ## convert to dict for visualization
-        results = [result._asdict() for result in results]
-        return results
+        results = predictor(image, columnar=True, **predict_args)
+        return results if columnar else results.split()
 
     def _run_inference(self,
                        batch_imgs : List[np.ndarray],
-                       **kwargs) -> List:
+                       **kwargs) -> ColumnarResults:
         """Function to run model's inference
 
         Args:
             batch_imgs (List[np.ndarray]): list of numpy array representation of batched input image(s)
 
         Returns:
-            List: list of batched prediction result(s)
+            ColumnarResults: batched prediction result(s) in columnar layout
         """
 
         # Check input batch size to match with IR model input specs
         n, h, w, c = self.input_shape if self.input_shape[-1] == 3 \
-        else tuple(self.input_shape[i] for i in [0,3,1,2])
+        else tuple(self.input_shape[i] for i in [0,2,3,1])
         assert len(batch_imgs) <= n, "expects 'images' <= n batch ({}) got {}".format(n, len(batch_imgs))
 
-        # TODO add resize with pad in runtime
-        # Resize input
-        batch_imgs = type(self.model).resize_batch([mat.copy() for mat in batch_imgs], self.input_shape)
+        # Resize input keeping aspect ratio, letterboxed directly into batch array
+        batch_imgs, scales, offsets = type(self.model).resize_batch(list(batch_imgs), self.input_shape,
+            resize_kind='pad', return_params=True, dst=self.model.input_buffer() if self.reuse_buffers else None)
+        self.letterbox_params = ((h, w), scales, offsets)
 
-        results = type(self).runtime_predict(self.model, batch_imgs, **kwargs)
+        results = type(self).runtime_predict(self.model, batch_imgs, columnar=True, **kwargs)
 
         return results
\ No newline at end of file
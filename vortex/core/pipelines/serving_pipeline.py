@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+
+from pathlib import Path
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Union, List, Callable, Any
+
+from vortex.core.pipelines.base_pipeline import BasePipeline
+
+__all__ = [
+    'IRServingPipeline',
+    'MicroBatcher',
+    'ServingMetrics',
+    'QueueFullError',
+    'create_server',
+]
+
+
+class QueueFullError(RuntimeError):
+    """Raised by `MicroBatcher.submit` when the request queue is full"""
+    pass
+
+
+class ServingMetrics:
+    """Thread-safe serving counters, and queue time, latency and inference time
+    of the most recent `window` requests (batches) for percentiles
+
+    Args:
+        window (int, optional): number of most recent measurements kept. Defaults to 10000.
+    """
+
+    PERCENTILES = [50, 90, 95, 99]
+
+    def __init__(self, window: int = 10000):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.counters = dict(requests=0, rejected=0, errors=0, batches=0, batched_requests=0)
+        self.queue_time = deque(maxlen=window)
+        self.latency = deque(maxlen=window)
+        self.inference_time = deque(maxlen=window)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] += n
+
+    def record_batch(self, queue_times: List[float], inference_time: float):
+        with self.lock:
+            self.counters['batches'] += 1
+            self.counters['batched_requests'] += len(queue_times)
+            self.queue_time.extend(queue_times)
+            self.inference_time.append(inference_time)
+
+    def record_latency(self, latency: float):
+        with self.lock:
+            self.latency.append(latency)
+
+    @classmethod
+    def _summary(cls, data) -> dict:
+        """mean and percentiles in milliseconds"""
+        if not len(data):
+            return dict(count=0)
+        data = np.asarray(data) * 1e3
+        summary = dict(count=len(data), mean=float(data.mean()))
+        summary.update({'p{}'.format(q): float(value) for q, value in
+            zip(cls.PERCENTILES, np.percentile(data, cls.PERCENTILES))})
+        return summary
+
+    def report(self, queue_size: int = 0) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            queue_time, latency = list(self.queue_time), list(self.latency)
+            inference_time = list(self.inference_time)
+        batches = counters['batches']
+        return dict(
+            uptime=time.time() - self.start_time,
+            queue_size=queue_size,
+            mean_batch_size=counters['batched_requests'] / batches if batches else 0.,
+            queue_time_ms=self._summary(queue_time),
+            latency_ms=self._summary(latency),
+            inference_time_ms=self._summary(inference_time),
+            **counters
+        )
+
+
+class MicroBatcher:
+    """Group concurrent requests into batches for a single `predict_fn` call
+
+    Requests are queued in a bounded queue, `submit` raises `QueueFullError` when it is full
+    (backpressure). A single inference thread waits for the first request, then collects up to
+    `max_batch_size` requests for at most `max_wait` seconds, calls `predict_fn` with the list
+    of inputs and sets the result of each request's future.
+
+    Args:
+        predict_fn (Callable): list of inputs -> list of results, one per input
+        max_batch_size (int): maximum number of requests in a batch
+        max_wait (float, optional): maximum time (second) to wait for a batch to fill. Defaults to 0.005.
+        queue_size (int, optional): maximum number of queued requests. Defaults to 64.
+        metrics (ServingMetrics, optional): metrics to record to. Defaults to None, a new one is created.
+    """
+
+    def __init__(self, predict_fn: Callable, max_batch_size: int, max_wait: float = 0.005,
+                 queue_size: int = 64, metrics: Union[ServingMetrics,None] = None):
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise RuntimeError("expects `max_batch_size` to be a positive int, got %s" % max_batch_size)
+        if not isinstance(queue_size, int) or queue_size < 1:
+            raise RuntimeError("expects `queue_size` to be a positive int, got %s" % queue_size)
+        if max_wait < 0:
+            raise RuntimeError("expects `max_wait` to be non-negative, got %s" % max_wait)
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = metrics if metrics is not None else ServingMetrics()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name='vortex-serve-inference', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout: Union[float,None] = None):
+        """Stop the inference thread, requests still queued are failed"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("server is shutting down"))
+
+    def is_alive(self) -> bool:
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+    def submit(self, data: Any) -> Future:
+        """Queue a single input, returns future of its result
+
+        Raises:
+            QueueFullError: the request queue is full
+        """
+        if not self.is_alive():
+            raise RuntimeError("inference thread is not running")
+        future = Future()
+        try:
+            self.queue.put_nowait((data, future, time.perf_counter()))
+        except queue.Full:
+            self.metrics.count('rejected')
+            raise QueueFullError("request queue is full ({} requests)".format(self.queue.maxsize))
+        self.metrics.count('requests')
+        return future
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                ## stop requested, process collected batch first
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while self.running:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = self._collect(item)
+            start = time.perf_counter()
+            try:
+                results = self.predict_fn([data for data, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError("expects {} results from `predict_fn`, got {}".format(len(batch), len(results)))
+            except Exception as e:
+                self.metrics.count('errors', len(batch))
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            self.metrics.record_batch([start - enqueue_time for _, _, enqueue_time in batch], end - start)
+            for (_, future, enqueue_time), result in zip(batch, results):
+                self.metrics.record_latency(end - enqueue_time)
+                future.set_result(result)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """`POST /predict` with encoded image as body, `GET /health` and `GET /metrics`"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        ## unix socket client has no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict, headers: Union[dict,None] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        batcher = self.server.batcher
+        if self.path == '/health':
+            alive = batcher.is_alive()
+            self._send_json(200 if alive else 503, dict(
+                status='ok' if alive else 'unavailable', queue_size=batcher.qsize(),
+                max_batch_size=batcher.max_batch_size, **self.server.info
+            ))
+        elif self.path == '/metrics':
+            self._send_json(200, batcher.metrics.report(queue_size=batcher.qsize()))
+        else:
+            self._send_json(404, dict(error='unknown endpoint {}'.format(self.path)))
+
+    def do_POST(self):
+        import cv2
+        if self.path != '/predict':
+            self._send_json(404, dict(error='unknown endpoint {}'.format(self.path)))
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0:
+            self._send_json(411, dict(error='expects request body with Content-Length'))
+            return
+        if length > self.server.max_request_size:
+            self.close_connection = True
+            self._send_json(413, dict(error='request body larger than {} bytes'.format(self.server.max_request_size)))
+            return
+        body = self.rfile.read(length)
+        ## decode on the request thread, concurrently with inference of the previous batch
+        image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._send_json(400, dict(error='request body is not a decodable image'))
+            return
+        start = time.perf_counter()
+        try:
+            future = self.server.batcher.submit(image)
+        except QueueFullError as e:
+            self._send_json(503, dict(error=str(e)), headers={'Retry-After': '1'})
+            return
+        except RuntimeError as e:
+            self._send_json(503, dict(error=str(e)))
+            return
+        try:
+            result = future.result(timeout=self.server.request_timeout)
+        except FutureTimeoutError:
+            self._send_json(504, dict(error='prediction timed out'))
+            return
+        except Exception as e:
+            self._send_json(500, dict(error=str(e)))
+            return
+        self._send_json(200, dict(results=result, latency_ms=(time.perf_counter() - start) * 1e3))
+
+
+class _ServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def setup_serving(self, batcher: MicroBatcher, info: dict, request_timeout: float,
+                      max_request_size: int, verbose: bool):
+        self.batcher = batcher
+        self.info = info
+        self.request_timeout = request_timeout
+        self.max_request_size = max_request_size
+        self.verbose = verbose
+
+
+class _TCPServer(_ServerMixin, ThreadingMixIn, HTTPServer):
+    pass
+
+
+class _UnixServer(_ServerMixin, ThreadingMixIn, UnixStreamServer):
+    pass
+
+
+def create_server(batcher: MicroBatcher, host: str = '127.0.0.1', port: int = 8000,
+                  unix_socket: Union[str,Path,None] = None, info: Union[dict,None] = None,
+                  request_timeout: float = 30., max_request_size: int = 32 * 2 ** 20,
+                  verbose: bool = False):
+    """Create HTTP server of `batcher` on `host`:`port`, or on `unix_socket` path if given;
+    `port` 0 picks a free port, see `server.server_address`
+    """
+    if unix_socket is not None:
+        unix_socket = str(unix_socket)
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = _UnixServer(unix_socket, _RequestHandler)
+    else:
+        server = _TCPServer((host, port), _RequestHandler)
+    server.setup_serving(batcher, info or {}, request_timeout, max_request_size, verbose)
+    return server
+
+
+def _to_json(result: dict, class_names: Union[List[str],None] = None) -> dict:
+    output = {key: value.tolist() if isinstance(value, np.ndarray) else value
+        for key, value in result.items()}
+    if class_names is not None and output.get('class_label') is not None:
+        output['class_name'] = [class_names[int(label)] for label in np.asarray(result['class_label']).reshape(-1)]
+    return output
+
+
+class IRServingPipeline(BasePipeline):
+    """Vortex IR model serving pipeline, concurrent requests are batched dynamically
+    into a single runtime call, see `MicroBatcher`
+    """
+
+    def __init__(self,
+                 model : Union[str,Path],
+                 runtime : str = 'cpu',
+                 max_batch_size : Union[int,None] = None,
+                 max_wait : float = 0.005,
+                 queue_size : int = 64,
+                 **kwargs):
+        """Class initialization
+
+        Args:
+            model (Union[str,Path]): path to Vortex IR model, file with extension '.onnx' or '.pt'
+            runtime (str, optional): backend runtime to be selected for model's computation. Defaults to 'cpu'.
+            max_batch_size (Union[int,None], optional): maximum number of requests in a batch, at most the \
+                                                        exported batch size. Defaults to None, exported batch size.
+            max_wait (float, optional): maximum time (second) to wait for a batch to fill. Defaults to 0.005.
+            queue_size (int, optional): maximum number of queued requests, further requests are rejected \
+                                        with status 503. Defaults to 64.
+            kwargs (optional) : additional input parameters specific to models' task, used for every request, \
+                                e.g. score_threshold and iou_threshold for detection
+
+        Example:
+            ```python
+            from vortex.core.pipelines import IRServingPipeline
+
+            serving = IRServingPipeline(model = 'experiments/outputs/example/example_bs4.pt',
+                                        runtime = 'cpu',
+                                        max_wait = 0.01,
+                                        score_threshold = 0.9,
+                                        iou_threshold = 0.2)
+            serving.run(host = '127.0.0.1', port = 8000)
+            ```
+        """
+        from vortex.core.pipelines.prediction_pipeline import IRPredictionPipeline
+        ## inference only runs on the batcher thread, input buffer can be reused
+        self.predictor = IRPredictionPipeline(model=model, runtime=runtime, reuse_buffers=True)
+        self.predict_args = kwargs
+        self.class_names = self.predictor.class_names
+        batch_size = self.predictor.input_shape[0]
+        if max_batch_size is None:
+            max_batch_size = batch_size
+        if max_batch_size > batch_size:
+            raise RuntimeError("expects `max_batch_size` at most the model batch size {}, got {}".format(
+                batch_size, max_batch_size))
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size=max_batch_size,
+            max_wait=max_wait, queue_size=queue_size)
+        self.info = dict(model=Path(model).name, runtime=runtime, class_names=self.class_names)
+
+    def _predict_batch(self, images : List[np.ndarray]) -> List[dict]:
+        ## unused batch slot(s) are zero-padded by letterbox, their results are dropped
+        results = self.predictor._run_inference(images, **self.predict_args).head(len(images))
+        results = self.predictor._check_and_transform(batch_vis=images, batch_results=results)
+        return [_to_json(result, self.class_names) for result in results.split()]
+
+    def create_server(self, **kwargs):
+        """Start the inference thread and create the HTTP server, see `create_server` for arguments"""
+        self.batcher.start()
+        return create_server(self.batcher, info=self.info, **kwargs)
+
+    def run(self,
+            host : str = '127.0.0.1',
+            port : int = 8000,
+            unix_socket : Union[str,Path,None] = None,
+            **kwargs):
+        """Serve until interrupted
+
+        Args:
+            host (str, optional): address to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): port to listen on. Defaults to 8000.
+            unix_socket (Union[str,Path,None], optional): listen on unix socket path instead of `host`:`port`. Defaults to None.
+            kwargs (optional) : `request_timeout`, `max_request_size` and `verbose` of `create_server`
+        """
+        server = self.create_server(host=host, port=port, unix_socket=unix_socket, **kwargs)
+        address = unix_socket if unix_socket is not None else 'http://{}:{}'.format(*server.server_address[:2])
+        print('serving {} on {} (max batch size {}, max wait {} ms)'.format(
+            self.info['model'], address, self.batcher.max_batch_size, self.batcher.max_wait * 1e3))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.batcher.stop()
+            if unix_socket is not None and os.path.exists(str(unix_socket)):
+                os.remove(str(unix_socket))
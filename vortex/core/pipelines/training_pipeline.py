@@ -132,8 +132,24 @@ class TrainingPipeline(BasePipeline):
         try:
             val_dataset = create_dataset(config.dataset, config.model.preprocess_args, stage='validate')
             ## use same batch-size as training by default
-            validation_args = EasyDict({'batch_size' : self.dataloader.batch_size})
+            batch_size = self.dataloader.batch_size
+            if batch_size is None:
+                ## batch size is owned by batch sampler, e.g. aspect ratio bucketing,
+                ## or batch sampler is used as sampler for batch fetch
+                batch_sampler = self.dataloader.batch_sampler
+                if batch_sampler is None:
+                    batch_sampler = self.dataloader.sampler
+                batch_size = batch_sampler.batch_size
+            validation_args = EasyDict({'batch_size' : batch_size})
             validation_args.update(config.trainer.validation.args)
+            ## validation has its own DataLoader (e.g. persistent workers), kept by the validator
+            if 'dataloader' in config.dataset.eval and 'args' in config.dataset.eval.dataloader:
+                validation_args.update({'dataloader_args' : dict(config.dataset.eval.dataloader.args)})
+            ## multi-process training, each rank validates its shard of the dataset,
+            ## results of every rank are gathered and merged by the validator
+            if torch.distributed.is_available() and torch.distributed.is_initialized() \
+                    and torch.distributed.get_world_size() > 1:
+                validation_args.update({'shard' : (torch.distributed.get_rank(), torch.distributed.get_world_size())})
             self.validator = engine.create_validator(
                 self.model_components, 
                 val_dataset, validation_args, 
@@ -174,6 +190,9 @@ class TrainingPipeline(BasePipeline):
         epoch_losses = []
         learning_rates = []
         for epoch in tqdm(range(self.config.trainer.epoch), desc="epoch"):
+            # Epoch-dependent dataset, e.g. replaying materialized augmented epoch
+            if hasattr(self.dataloader.dataset, 'set_epoch'):
+                self.dataloader.dataset.set_epoch(epoch)
             loss, lr = self.trainer(self.dataloader, epoch)
             epoch_losses.append(loss)
             learning_rates.append(lr)
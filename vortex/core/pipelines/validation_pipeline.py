@@ -1,4 +1,9 @@
 import os
+import queue
+import shutil
+import tempfile
+import traceback
+import numpy as np
 from pathlib import Path
 
 from easydict import EasyDict
@@ -13,9 +18,149 @@ from vortex.utils.reporting.report import generate_reports
 from vortex_runtime import model_runtime_map
 from vortex.core.pipelines.base_pipeline import BasePipeline
 from vortex.core import engine as engine
+from vortex.core.engine.validator.prediction_cache import PredictionCache, file_hash
+from vortex.core.engine.validator.base_validator import ResourceMonitorWrapper
+from vortex.utils.profiler.resource import CPUMonitor, GPUMonitor
 
 __all__ = ['PytorchValidationPipeline','IRValidationPipeline']
 
+## validation arguments which don't change the predictions, excluded from prediction cache key
+NON_PREDICTION_ARGS = ['output_directory', 'experiment_name', 'dataloader_args', 'pipelined',
+    'queue_size', 'curve_bins', 'streaming', 'prediction_cache', 'cache_key']
+
+
+class _DecodedDataset:
+    """Validation dataset decoded once by `decode_dataset`, images are read from a memory-mapped
+    array shared by the validation processes of every backend
+    """
+
+    def __init__(self, images_file: str, targets: list, data_format: dict, class_names: list):
+        self.images_file = images_file
+        self.targets = targets
+        self.data_format = data_format
+        self.class_names = class_names
+        self._images = None
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, index: int):
+        import torch
+        if self._images is None:
+            self._images = np.load(self.images_file, mmap_mode='r')
+        return np.array(self._images[index]), torch.from_numpy(self.targets[index])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+
+def decode_dataset(dataset, output_dir: Union[str,Path]) -> _DecodedDataset:
+    """Decode and letterbox every sample of validation `dataset` once into `output_dir`"""
+    image, _ = dataset[0]
+    images = np.lib.format.open_memmap(str(Path(output_dir) / 'images.npy'), mode='w+',
+        dtype=image.dtype, shape=(len(dataset),) + tuple(image.shape))
+    targets = []
+    for index in range(len(dataset)):
+        image, target = dataset[index]
+        if tuple(image.shape) != images.shape[1:]:
+            raise RuntimeError("parallel validation expects images of the same shape, " \
+                "got %s and %s" % (tuple(image.shape), images.shape[1:]))
+        images[index] = image
+        targets.append(target.numpy() if hasattr(target, 'numpy') else np.asarray(target))
+    images.flush()
+    del images
+    return _DecodedDataset(str(Path(output_dir) / 'images.npy'), targets,
+        dict(dataset.data_format), list(dataset.dataset.class_names))
+
+
+def split_cpus(n_processes: int) -> list:
+    """Split the cpus available to this process into `n_processes` disjoint sets, e.g. one per backend or shard"""
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    if len(cpus) < n_processes:
+        warnings.warn("number of cpus (%s) is less than number of validation processes (%s), " \
+            "some processes will share cpus" % (len(cpus), n_processes))
+        return [[cpus[i % len(cpus)]] for i in range(n_processes)]
+    return [chunk.tolist() for chunk in np.array_split(np.asarray(cpus), n_processes)]
+
+
+def _create_backend_validator(model, dataset, validation_args: dict, backend: str):
+    # Computing device assignment
+    if isinstance(model,EasyDict):
+        model.network = model.network.to(backend)
+    return engine.create_validator(model, dataset, validation_args, device=backend)
+
+
+def validate_backend(model, dataset, validation_args: dict, backend: str, hypopt: bool = False,
+                     assets_dir: Union[Path,None] = None) -> dict:
+    """Validate `model` on a single `backend`, returns the metrics, assets and resource usage"""
+    validator = _create_backend_validator(model, dataset, validation_args, backend)
+
+    # Validation process
+    validator()
+    return _validator_output(validator, hypopt, assets_dir)
+
+
+def _validator_output(validator, hypopt: bool = False, assets_dir: Union[Path,None] = None) -> dict:
+    output = dict(eval_result=validator.metrics)
+
+    # Disable several validation features for hyperparameter optimization
+    if not hypopt:
+        output.update(
+            metric_asset=validator.save_metrics(output_directory=assets_dir),
+            resource_filename=validator.plot_resource_metrics(output_directory=str(assets_dir)),
+            resource_usage=validator.resource_usage(),
+        )
+    output.update(validation_args=validator.validation_args(),
+                  cache_hit=getattr(validator, 'cache_hit', False))
+    return output
+
+
+def _get_process_result(process, result_queue):
+    """Wait for the result of backend validation process, also if it exits without result"""
+    while True:
+        try:
+            return result_queue.get(timeout=1.)
+        except queue.Empty:
+            if not process.is_alive():
+                ## result may be sent right before the process exits
+                try:
+                    return result_queue.get(timeout=1.)
+                except queue.Empty:
+                    return 'error', 'process exited with code {}'.format(process.exitcode)
+
+
+def _validate_backend_process(result_queue, cpus: list, *args):
+    """Entry point of backend validation process, pinned to `cpus`"""
+    import torch
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(len(cpus))
+        result_queue.put(('ok', validate_backend(*args)))
+    except BaseException:
+        result_queue.put(('error', traceback.format_exc()))
+
+
+def _validate_shard_process(result_queue, cpus: list, model, dataset, validation_args: dict, backend: str):
+    """Entry point of shard validation process, pinned to `cpus`"""
+    import torch
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(len(cpus))
+        validator = _create_backend_validator(model, dataset, validation_args, backend)
+        validator.evaluate()
+        result_queue.put(('ok', dict(validator.shard_output(), cache_hit=validator.cache_hit,
+            validator_type=type(validator), merge_info=validator.merge_info())))
+    except BaseException:
+        result_queue.put(('error', traceback.format_exc()))
+
+
 class BaseValidationPipeline(BasePipeline):
     """Vortex Base Validation Pipeline
 
@@ -27,7 +172,8 @@ class BaseValidationPipeline(BasePipeline):
                  config : EasyDict,
                  backends : Union[list,str]=[],
                  generate_report : bool = True,
-                 hypopt : bool =False
+                 hypopt : bool =False,
+                 prediction_cache : Union[str,Path,PredictionCache,None] = None
                  ) :
         """Class initialization
 
@@ -36,6 +182,8 @@ class BaseValidationPipeline(BasePipeline):
             backends (Union[list,str], optional): devices or runtime to be used for model's computation. Defaults to [].
             generate_report (bool, optional): if enabled will generate validation report in markdown format. Defaults to True.
             hypopt (bool, optional): flag for hypopt, disable several pipeline process. Defaults to False.
+            prediction_cache (Union[str,Path,PredictionCache,None], optional): cache (or its directory) of predictions, \
+                                       reused when the same model file is validated again on the same dataset. Defaults to None.
 
         Raises:
             RuntimeError: raise error if experiment config is not valid for validation
@@ -76,14 +224,134 @@ class BaseValidationPipeline(BasePipeline):
 
         # Validator arguments
         self.validation_args = config.trainer.validation.args
+        if 'dataloader' in config.dataset.eval and 'args' in config.dataset.eval.dataloader:
+            self.validation_args.update({'dataloader_args' : dict(config.dataset.eval.dataloader.args)})
         self.val_experiment_name = self.experiment_name
 
+        # Prediction cache, model file used for cache key must be set in sub-class,
+        # model config (without initial weights, covered by model file) for e.g. postprocess args
+        if prediction_cache is not None and not isinstance(prediction_cache, PredictionCache):
+            prediction_cache = PredictionCache(prediction_cache)
+        self.prediction_cache = prediction_cache
+        self.model_file = None
+        self.cache_identity = dict(
+            dataset={key : value for key, value in config.dataset.eval.items() if key != 'dataloader'},
+            model={key : value for key, value in config.model.items() if key != 'init_state_dict'},
+        )
+
+    def cache_key(self, backend: str, validation_args: dict) -> str:
+        """Prediction cache key from model file content, dataset, model config and prediction arguments"""
+        assert self.model_file, "'self.model_file' must be initialized in the sub-class!!"
+        if getattr(self, '_model_file_hash', None) is None:
+            self._model_file_hash = file_hash(self.model_file)
+        return PredictionCache.make_key(
+            model=self._model_file_hash, backend=backend,
+            validation_args={key : value for key, value in validation_args.items() if key not in NON_PREDICTION_ARGS},
+            **self.cache_identity
+        )
+
+    def _process_model(self):
+        """Model sent to validation process, only the components used by predictor"""
+        model = self.model
+        if isinstance(model, EasyDict):
+            model = EasyDict({key : model[key] for key in ['network', 'preprocess', 'postprocess'] if key in model})
+        return model
+
+    def _run_sharded(self, validation_args: dict, shards: int) -> dict:
+        """Validate each backend on `shards` contiguous shards of the dataset, each shard in its own
+        process pinned to a disjoint set of cpus, then merge the accumulated results of every shard
+        in shard order, so the metrics are the same as validating in a single process
+        """
+        import torch.multiprocessing as mp
+        ctx = mp.get_context('spawn')
+        model = self._process_model()
+        outputs = {}
+        for backend in self.backends:
+            backend_args = dict(validation_args[backend])
+            processes = []
+            for index, cpus in enumerate(split_cpus(shards)):
+                shard_args = dict(backend_args, shard=(index, shards))
+                if self.prediction_cache is not None:
+                    shard_args.update(cache_key=self.cache_key(backend, shard_args))
+                process_queue = ctx.Queue()
+                process = ctx.Process(target=_validate_shard_process, args=(process_queue, cpus,
+                    model, self.dataset, shard_args, backend))
+                process.start()
+                processes.append((process, process_queue))
+            shard_outputs, errors = [], []
+            ## resource usage while waiting for the shards, reported by the merge target
+            monitor = ResourceMonitorWrapper([CPUMonitor(name='cpu_resource'), GPUMonitor(name='gpu_resource')])
+            with monitor:
+                for index, (process, process_queue) in enumerate(processes):
+                    status, output = _get_process_result(process, process_queue)
+                    process.join()
+                    if status == 'ok':
+                        shard_outputs.append(output)
+                    else:
+                        errors.append("backend '{}' shard {} :\n{}".format(backend, index, output))
+            if errors:
+                raise RuntimeError("sharded validation failed, " + "\n".join(errors))
+            ## validator of the whole dataset without predictor nor dataset, only used to merge the results of the shards
+            backend_args.pop('prediction_cache', None)
+            backend_args.pop('cache_key', None)
+            validator = shard_outputs[0]['validator_type'].merge_target(shard_outputs[0]['merge_info'], **backend_args)
+            cpu_monitor, gpu_monitor = monitor.monitors
+            cpu_monitor.name, gpu_monitor.name = validator.cpu_monitor.name, validator.gpu_monitor.name
+            validator.cpu_monitor, validator.gpu_monitor = cpu_monitor, gpu_monitor
+            validator.merge_shards(shard_outputs)
+            validator.metrics = validator.compute_metrics()
+            outputs[backend] = _validator_output(validator, self.hypopt, self.assets_dir)
+            outputs[backend].update(cache_hit=all(output['cache_hit'] for output in shard_outputs))
+        return outputs
+
+    def _run_parallel(self, validation_args: dict) -> dict:
+        """Validate every backend in its own process, the dataset is decoded once and shared
+        through a memory-mapped file, each process is pinned to a disjoint set of cpus
+        so the prediction time of a backend is not affected by the others
+        """
+        import torch.multiprocessing as mp
+        ctx = mp.get_context('spawn')
+        decode_dir = tempfile.mkdtemp(prefix='vortex_validate_')
+        try:
+            dataset = decode_dataset(self.dataset, decode_dir)
+            model = self._process_model()
+            processes = {}
+            for backend, cpus in zip(self.backends, split_cpus(len(self.backends))):
+                ## decoded dataset is cheap to read, no dataloader workers competing for the pinned cpus
+                backend_args = dict(validation_args[backend])
+                backend_args.pop('dataloader_args', None)
+                process_queue = ctx.Queue()
+                process = ctx.Process(target=_validate_backend_process, args=(process_queue, cpus,
+                    model, dataset, backend_args, backend, self.hypopt, self.assets_dir))
+                process.start()
+                processes[backend] = (process, process_queue)
+            outputs, errors = {}, []
+            for backend, (process, process_queue) in processes.items():
+                status, output = _get_process_result(process, process_queue)
+                process.join()
+                if status == 'ok':
+                    outputs[backend] = output
+                else:
+                    errors.append("backend '{}' :\n{}".format(backend, output))
+            if errors:
+                raise RuntimeError("parallel validation failed, " + "\n".join(errors))
+        finally:
+            shutil.rmtree(decode_dir, ignore_errors=True)
+        return outputs
+
     def run(self,
-            batch_size : int = 1) -> EasyDict:
+            batch_size : int = 1,
+            parallel : bool = False,
+            shards : int = 1) -> EasyDict:
         """Function to execute the validation pipeline
 
         Args:
             batch_size (int, optional): size of validation input batch. Defaults to 1.
+            parallel (bool, optional): validate the backends concurrently, each in its own process pinned to \
+                                       a disjoint set of cpus, on the dataset decoded once. Defaults to False.
+            shards (int, optional): split the dataset into `shards` contiguous shards validated concurrently, \
+                                    each in its own process with its own predictor or runtime, results of \
+                                    every shard are merged exactly. Can't be combined with `parallel`. Defaults to 1.
 
         Returns:
             EasyDict: dictionary containing validation metrics result
@@ -116,6 +384,10 @@ class BaseValidationPipeline(BasePipeline):
 
         assert self.model, "'self.model' must be initialized in the sub-class!!"
         assert self.filename_suffix, "'self.filename_suffix' must be initialized in the sub-class!!"
+        if not isinstance(shards, int) or shards < 1:
+            raise RuntimeError("expects `shards` to be a positive int, got %s" % shards)
+        if parallel and shards > 1:
+            raise RuntimeError("parallel backends validation can't be combined with sharded validation")
 
         # Initial validation process
         eval_results = {}
@@ -123,46 +395,39 @@ class BaseValidationPipeline(BasePipeline):
         resource_filenames = {}
         resource_usages = {}
 
+        validation_args = {}
         for backend in self.backends :
-
-            # Computing device assignment
-            if isinstance(self.model,EasyDict):
-                self.model.network = self.model.network.to(backend)
-            
             # Validator initialization
-            
             if isinstance(self.model,EasyDict) :
                 val_experiment_name = self.val_experiment_name + '_{}'.format(backend)
             else:
                 val_experiment_name = self.model.name.rsplit('.', 1)[0] + '_{}'.format(backend)
-
+            backend_args = dict(self.validation_args, experiment_name=val_experiment_name,
+                                batch_size=batch_size)
             if self.assets_dir:
-                self.validation_args.update(dict(output_directory=self.assets_dir,
-                                                experiment_name=val_experiment_name,
-                                                batch_size=batch_size,
-                                                ))
-            else:
-                self.validation_args.update(dict(experiment_name=val_experiment_name,
-                                                batch_size=batch_size,
-                                                ))
-            validator = engine.create_validator(self.model, self.dataset, self.validation_args, device=backend)
-
-            # Validation process
-            eval_result = validator()
-            eval_results.update({backend : eval_result})
+                backend_args.update(output_directory=self.assets_dir)
+            if self.prediction_cache is not None:
+                backend_args.update(prediction_cache=self.prediction_cache,
+                                    cache_key=self.cache_key(backend, backend_args))
+            validation_args[backend] = backend_args
+
+        if shards > 1:
+            outputs = self._run_sharded(validation_args, shards)
+        elif parallel and len(self.backends) > 1:
+            outputs = self._run_parallel(validation_args)
+        else:
+            outputs = {backend : validate_backend(self.model, self.dataset, validation_args[backend],
+                backend, hypopt=self.hypopt, assets_dir=self.assets_dir) for backend in self.backends}
 
-                # Disable several validation features for hyperparameter optimization
+        for backend, output in outputs.items():
+            if output['cache_hit']:
+                print("'{}' predictions loaded from prediction cache '{}'".format(backend, self.prediction_cache.cache_dir))
+            eval_results.update({backend : output['eval_result']})
             if not self.hypopt:
-                metric_asset = validator.save_metrics(output_directory=self.assets_dir)
-
-                resource_filename = validator.plot_resource_metrics(
-                    output_directory=str(self.assets_dir)
-                )
-                resource_usage = validator.resource_usage()
-                metric_assets.update({backend : metric_asset})
-                resource_filenames.update({backend : resource_filename})
-                resource_usages.update({backend : resource_usage})
-        validation_args = validator.validation_args()
+                metric_assets.update({backend : output['metric_asset']})
+                resource_filenames.update({backend : output['resource_filename']})
+                resource_usages.update({backend : output['resource_usage']})
+        validation_args = output['validation_args']
     
         if self.generate_report :
             generate_reports(
@@ -191,7 +456,8 @@ class PytorchValidationPipeline(BaseValidationPipeline):
                  weights : Union[str,Path,None] = None,
                  backends : Union[list,str]=[],
                  generate_report : bool = True,
-                 hypopt : bool =False):
+                 hypopt : bool =False,
+                 prediction_cache : Union[str,Path,PredictionCache,None] = None):
         """Class initialization
 
         Args:
@@ -203,6 +469,8 @@ class PytorchValidationPipeline(BaseValidationPipeline):
                                                   it will use the device described in **experiment file**. Defaults to [].
             generate_report (bool, optional): if enabled will generate validation report in markdown format. Defaults to True.
             hypopt (bool, optional): flag for hypopt, disable several pipeline process. Defaults to False.
+            prediction_cache (Union[str,Path,PredictionCache,None], optional): cache (or its directory) of predictions, \
+                                       keyed by weights file content. Defaults to None.
         
         Example:
             ```python
@@ -220,7 +488,8 @@ class PytorchValidationPipeline(BaseValidationPipeline):
                                                             generate_report = True)
             ```
         """
-        super().__init__(config = config, backends = backends, generate_report = generate_report, hypopt = hypopt)
+        super().__init__(config = config, backends = backends, generate_report = generate_report, hypopt = hypopt,
+                         prediction_cache = prediction_cache)
         
         # Model initialization
 
@@ -230,6 +499,7 @@ class PytorchValidationPipeline(BaseValidationPipeline):
             filename = weights
         warnings.warn('loading state dict from : %s' % str(filename))
         self.model = create_model(config.model,state_dict=filename)
+        self.model_file = filename
         self.filename_suffix = '_validation_{}'.format('_'.join(self.backends))
 
 class IRValidationPipeline(BaseValidationPipeline):
@@ -240,7 +510,8 @@ class IRValidationPipeline(BaseValidationPipeline):
                  model : Union[str,Path,None],
                  backends : Union[list,str]=['cpu'],
                  generate_report : bool = True,
-                 hypopt : bool =False):
+                 hypopt : bool =False,
+                 prediction_cache : Union[str,Path,PredictionCache,None] = None):
         """Class initialization
 
         Args:
@@ -249,6 +520,8 @@ class IRValidationPipeline(BaseValidationPipeline):
             backends (Union[list,str], optional): runtime(s) to be used for validation process. Defaults to ['cpu'].
             generate_report (bool, optional): if enabled will generate validation report in markdown format. Defaults to True.
             hypopt (bool, optional): flag for hypopt, disable several pipeline process. Defaults to False.
+            prediction_cache (Union[str,Path,PredictionCache,None], optional): cache (or its directory) of predictions, \
+                                       keyed by model file content. Defaults to None.
 
         Raises:
             RuntimeError: raise error if the provided model file's extension is not '*.onnx' or '*.pt'
@@ -270,7 +543,8 @@ class IRValidationPipeline(BaseValidationPipeline):
             ```
         """
 
-        super().__init__(config = config, backends = backends, generate_report = generate_report, hypopt = hypopt)
+        super().__init__(config = config, backends = backends, generate_report = generate_report, hypopt = hypopt,
+                         prediction_cache = prediction_cache)
         
          # Model IR runtime check and selection
         runtime = backends
@@ -293,6 +567,7 @@ class IRValidationPipeline(BaseValidationPipeline):
             self.backends = ['cpu'] # Fallback if configured device is empty and device in experiment file is unavailable
             warnings.warn('IR validation is running on CPU due to unavailability of selected device')
         self.model = model
+        self.model_file = model
 
         if model_type == 'pt':
             model_type = 'torchscript'
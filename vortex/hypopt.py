@@ -3,13 +3,13 @@ import logging
 import argparse
 from easydict import EasyDict
 
-from vortex.core.pipelines import HypOptPipeline
 
 logger = logging.getLogger(__name__)
 description = "Vortex hyperparameter optimization experiment"
 
 
 def main(args):
+    from vortex.core.pipelines import HypOptPipeline
     config_path=args.config
     optconfig_path=args.optconfig
     weights=args.weights
@@ -1,5 +1,5 @@
+from pathlib import Path
 from typing import Union, Type, List
-from vortex.core.pipelines import IRPredictionPipeline
 
 from vortex_runtime import model_runtime_map
 import argparse
@@ -8,16 +8,25 @@ description = 'Vortex IR model prediction pipeline; may receive multiple image(s
 
 
 def main(args):
+    from vortex.core.pipelines import IRPredictionPipeline
 
     model_path=args.model
     test_images=args.image
+    test_video=args.video
     output_directory=args.output_dir
+    output_file_prefix=args.output_file_prefix
     runtime=args.runtime
+    bulk_output=args.bulk_output
+    bulk_args=dict(output_format=args.output_format,num_workers=args.num_workers,resume=not args.no_resume)
 
     kwargs = vars(args)
-    for key in ['model','image','runtime','output_dir']:
+    for key in ['model','image','video','runtime','output_dir','output_file_prefix',
+                'bulk_output','output_format','num_workers','no_resume']:
         kwargs.pop(key)
 
+    if (test_images is None) == (test_video is None):
+        raise RuntimeError("expects exactly one of '--image' or '--video' to be specified")
+
     available_runtime = []
     for runtime_map in model_runtime_map.values():
         available_runtime.extend(list(runtime_map.keys()))
@@ -26,7 +35,29 @@ def main(args):
         raise RuntimeError('Runtime "{}" is not available, available runtime = {}'.format(runtime,list(available_runtime)))
 
     # Initialize Vortex IR Predictor
-    vortex_ir_predictor=IRPredictionPipeline(model=model_path,runtime=runtime)
+    vortex_ir_predictor=IRPredictionPipeline(model=model_path,runtime=runtime,reuse_buffers=True)
+
+    if test_video is not None:
+        # Predict video frames in batches of model batch size as they are decoded, dump annotated video
+        output_video = Path(output_directory) / '{}_{}.mp4'.format(output_file_prefix, Path(test_video).stem)
+        for result in vortex_ir_predictor.run_stream(source = test_video,
+                                                     output_video = output_video,
+                                                     **kwargs):
+            ## no class label on frame without detection
+            class_labels = result.prediction['class_label']
+            class_names = [vortex_ir_predictor.class_names[int(class_index)] for class_index in (class_labels if class_labels is not None else [])]
+            print(result.index, result.prediction, class_names)
+        print('annotated video saved to {}'.format(output_video))
+        return
+
+    if bulk_output is not None:
+        # Predict every image of directory(s) or list file(s) in batches of model batch size, resuming previous run
+        summary = vortex_ir_predictor.run_bulk(images = test_images,
+                                               output = bulk_output,
+                                               **bulk_args,
+                                               **kwargs)
+        print(summary)
+        return
 
     # Make prediction
     results = vortex_ir_predictor.run(images = test_images,
@@ -49,9 +80,17 @@ def add_parser(parent_parser,subparsers = None):
     else:
         parser = subparsers.add_parser('ir_runtime_predict',description=description)
     parser.add_argument('-m','--model', type=str, required=True, help='path to IR model')
-    parser.add_argument('-i', '--image', type=str, nargs='+', required=True, \
-        help='path to test image(s); at least 1 path should be provided, supports up to model batch_size')
+    parser.add_argument('-i', '--image', type=str, nargs='+', \
+        help='path to test image(s); at least 1 path should be provided, supports up to model batch_size; '
+             'with `--bulk-output`, any number of image(s), directory(s) or `.txt` file(s) listing image paths')
+    parser.add_argument('--video', type=str, \
+        help='path to test video; frames are predicted in batches of model batch_size and dumped as annotated video')
+    parser.add_argument("--output-file-prefix", default='prediction', help='filename prefix of annotated video, only used with `--video`')
     parser.add_argument("-o","--output-dir",default='.',help='directory to dump prediction visualization')
+    parser.add_argument("--bulk-output", type=str, help='path to output file, predict every image of `--image` in bulk to JSON Lines file or Parquet directory (`*.parquet`) without visualization; resumes interrupted run')
+    parser.add_argument("--output-format", choices=['jsonl','parquet'], help='bulk output format, inferred from `--bulk-output` suffix if not specified')
+    parser.add_argument("-j","--num-workers", default=4, type=int, help='number of image decoding threads, only used with `--bulk-output`')
+    parser.add_argument("--no-resume", action='store_true', help='overwrite `--bulk-output` instead of resuming from its checkpoint')
     parser.add_argument("--score_threshold", default=0.9, type=float,
                         help='score threshold for detection, only used if model is detection, ignored otherwise')
     parser.add_argument("--iou_threshold", default=0.2, type=float,
@@ -0,0 +1,31 @@
+import argparse
+from pprint import PrettyPrinter
+
+from vortex.utils.data.dataset.dataset import list_datasets, lazy_datasets
+
+description = 'List registered dataset(s) without importing external dataset module(s)'
+
+def main(args):
+    datasets = list_datasets()
+    if args.verbose:
+        for name in datasets['external']:
+            if name in lazy_datasets:
+                module, path = lazy_datasets[name]
+                print('{} : {}'.format(name, '/'.join([path, module, 'utils', 'dataset.py'])))
+            else:
+                print('{} : (imported)'.format(name))
+    else:
+        PrettyPrinter(indent=4).pprint(datasets)
+
+def add_parser(parent_parser,subparsers = None):
+    if subparsers is None:
+        parser = parent_parser
+    else:
+        parser = subparsers.add_parser('list_datasets',description=description)
+    parser.add_argument('-v','--verbose', action='store_true', help='show module path of each external dataset')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description)
+    add_parser(parser)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,34 @@
+import argparse
+
+from vortex.utils.parser import load_config
+
+description = 'Run training dataset augmentation offline for several epochs and store the augmented samples, to be replayed by MaterializedDataset'
+
+def main(args):
+    from vortex.core.factory import create_dataset
+    from vortex.utils.data.dataset.materialize import materialize_epochs
+
+    config = load_config(args.config)
+    dataset = create_dataset(config.dataset, config.model.preprocess_args, stage='train')
+    num_workers = args.num_workers
+    if num_workers is None:
+        num_workers = config.dataset.dataloader.args.get('num_workers', 0)
+    materialize_epochs(dataset, args.output, epochs=args.epochs, seed=args.seed, num_workers=num_workers)
+    print('{} augmented epoch(s) of {} samples written to {}'.format(args.epochs, len(dataset), args.output))
+
+def add_parser(parent_parser,subparsers = None):
+    if subparsers is None:
+        parser = parent_parser
+    else:
+        parser = subparsers.add_parser('materialize',description=description)
+    parser.add_argument("-c","--config", required=True, help='path to experiment config')
+    parser.add_argument("-o","--output", required=True, help='output directory of the materialized epochs')
+    parser.add_argument("-e","--epochs", default=1, type=int, help='number of augmented epochs to materialize')
+    parser.add_argument("-s","--seed", default=0, type=int, help='random seed of the augmentation')
+    parser.add_argument("-j","--num-workers", default=None, type=int, help='number of worker processes, defaults to experiment file dataloader num_workers')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description)
+    add_parser(parser)
+    args = parser.parse_args()
+    main(args)
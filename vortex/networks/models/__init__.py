@@ -1,8 +1,12 @@
+import sys
+import importlib
 from easydict import EasyDict
-import torch
 
-supported_models = {}
-all_models = []
+## registered task(s), each task module is only imported on first lookup,
+## `supported_models` and `all_models` are filled as tasks get imported
+_registered_tasks = []
+_supported_models = {}
+_all_models = []
 
 _REQUIRED_ATTRIBUTES = [
     'supported_models',
@@ -11,31 +15,62 @@ _REQUIRED_ATTRIBUTES = [
 
 
 def _register_task(task: str):
-    global supported_models, all_models
-    exec('from . import %s' % task)
+    if not task in _registered_tasks:
+        _registered_tasks.append(task)
 
-    module = eval('%s' % task)
+
+def _import_task(task: str):
+    ## not using `from . import` here, it would re-enter `__getattr__` below
+    module = importlib.import_module('.%s' % task, __name__)
+    if module in _supported_models:
+        return module
     module_attributes = module.__dict__.keys()
     for attribute in _REQUIRED_ATTRIBUTES:
         if not attribute in module_attributes:
             raise RuntimeError("dear maintainer, your module(s) is supposed to have the following "\
                 "attribute(s): %s; got %s, please check!" % (_REQUIRED_ATTRIBUTES, module_attributes))
 
-    supported_models[module] = module.all_models
-    all_models.extend(module.all_models)
+    _supported_models[module] = module.all_models
+    _all_models.extend(module.all_models)
+    return module
+
+
+def _load_tasks(model_name: str = None):
+    """import registered tasks in order, stop at the task providing `model_name`;
+    import all registered tasks if `model_name` is None
+    """
+    for task in _registered_tasks:
+        module = sys.modules.get('%s.%s' % (__name__, task), None)
+        if module is None or not module in _supported_models:
+            module = _import_task(task)
+        if model_name is not None and model_name in module.all_models:
+            return module
+    return None
+
+
+def __getattr__(name: str):
+    ## PEP 562, resolve registry and task module access lazily
+    if name in ['supported_models', 'all_models']:
+        _load_tasks()
+        return _supported_models if name == 'supported_models' else _all_models
+    if name in _registered_tasks:
+        return _import_task(name)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
 
 def create_model_components(model_name: str, preprocess_args: EasyDict, network_args: EasyDict, 
         loss_args: EasyDict, postprocess_args: EasyDict, stage: str='train') -> EasyDict:
 
-    if not model_name in all_models:
-        raise KeyError("model '%s' not supported, available: %s" %(model_name, all_models))
-
-    for module, m in supported_models.items():
-        if model_name in m:
-            return module.create_model_components(model_name, preprocess_args, network_args, loss_args, postprocess_args, stage)
-    raise RuntimeError("unexpected error! please report this as bug")
+    module = _load_tasks(model_name)
+    if module is None:
+        raise KeyError("model '%s' not supported, available: %s" %(model_name, _all_models))
+    return module.create_model_components(model_name, preprocess_args, network_args, loss_args, postprocess_args, stage)
 
 
 _register_task('detection')
 _register_task('classification')
+
+## module-level __getattr__ (PEP 562) requires python 3.7, import eagerly otherwise
+if sys.version_info < (3, 7):
+    _load_tasks()
+    supported_models, all_models = _supported_models, _all_models
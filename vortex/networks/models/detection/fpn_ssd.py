@@ -11,7 +11,7 @@ from ...modules.heads.detection.retinanet import RetinaHead
 
 import warnings
 
-from math import sqrt
+from math import sqrt, ceil
 from itertools import product
 from typing import List, Tuple, Union, Sequence
 
@@ -193,6 +193,28 @@ class DefaultBox(nn.Module):
             output.clamp_(max=1, min=0)
         return output
 
+    def rectangular(self, height: int, width: int) -> torch.Tensor:
+        """
+        compute default boxes for rectangular input of (height, width), e.g. aspect ratio bucketing;
+        anchors keep their absolute size relative to `image_size`, the longest side of the input
+        """
+        image_size = self.image_size.item()
+        steps = self.steps.tolist()
+        anchors = self.anchors.tolist()
+        mean = []
+        for k, step in enumerate(steps):
+            fy, fx = int(ceil(height / step)), int(ceil(width / step))
+            for i, j in product(range(fy), range(fx)):
+                # unit center x,y
+                cx = (j + 0.5) * step / width
+                cy = (i + 0.5) * step / height
+                for w, h in anchors[k]:
+                    mean.append([cx, cy, w * image_size / width, h * image_size / height])
+        output = torch.Tensor(mean).view(-1, 4)
+        if self.clip.item():
+            output.clamp_(max=1, min=0)
+        return output
+
 
 class FPNSSD(FPNBackbone):
     __constants__ = [
@@ -221,6 +243,7 @@ class FPNSSD(FPNBackbone):
         )
         self.anchor_gen = anchor_gen
         self.register_buffer('default_boxes', self.anchor_gen())
+        self._rect_default_boxes = {}
 
         n_anchors: int = len(self.anchor_gen.anchors[0])
 
@@ -254,9 +277,22 @@ class FPNSSD(FPNBackbone):
 
         self.task = "detection"
 
-    def forward(self, x: Tensor) -> Union[Tensor, Tuple[Tensor, Tensor]]:
+    def default_boxes_for(self, height: int, width: int) -> Tensor:
+        """
+        default boxes for rectangular input, cached per input shape
+        """
+        key = (int(height), int(width))
+        if not key in self._rect_default_boxes:
+            self._rect_default_boxes[key] = self.anchor_gen.rectangular(*key)
+        return self._rect_default_boxes[key].to(self.default_boxes.device)
+
+    def forward(self, x: Tensor) -> Union[Tensor, Tuple[Tensor, Tensor], Tuple[Tensor, Tensor, Tensor]]:
         p3, p4, p5, extra = super(FPNSSD, self).forward(x)
         predictions = self.head(p3, p4, p5, extra)
+        height, width = x.shape[2:]
+        if self.training and height != width:
+            ## rectangular batch (aspect ratio bucketing), priors must follow the input shape
+            predictions = (*predictions, self.default_boxes_for(height, width))
         return predictions
 
 
@@ -1,7 +1,12 @@
+import sys
+import importlib
 from .base_backbone import supported_feature_type
 
-supported_models = {}
-all_models = []
+## registered module name(s), each module is only imported on first lookup,
+## `supported_models` and `all_models` are filled as modules get imported
+_registered_modules = []
+_supported_models = {}
+_all_models = []
 
 _REQUIRED_ATTRIBUTES = [
     'get_backbone',
@@ -9,31 +14,57 @@ _REQUIRED_ATTRIBUTES = [
 ]
 
 def register_module(module : str) :
-    global supported_models, all_models
+    """register backbone module, the module itself is imported on demand
+    """
+    if not module in _registered_modules :
+        _registered_modules.append(module)
+
+def _import_module(module : str) :
     ## TODO : consider to check module existence before importing
-    exec('from . import %s' %module)
-    module = eval('%s' %module)
+    ## not using `from . import` here, it would re-enter `__getattr__` below
+    module = importlib.import_module('.%s' %module, __name__)
+    if module in _supported_models :
+        return module
     module_attributes = module.__dict__.keys()
     for attribute in _REQUIRED_ATTRIBUTES :
         if not attribute in module_attributes :
             raise RuntimeError("dear maintainer, your module(s) is supposed to have the following "\
                 "attribute(s): %s; got %s, please check!" % (_REQUIRED_ATTRIBUTES, module_attributes))
-    supported_models[module] = module.supported_models
-    all_models.extend(module.supported_models)
+    _supported_models[module] = module.supported_models
+    _all_models.extend(module.supported_models)
+    return module
+
+def _load_modules(model_name : str = None) :
+    """import registered modules in order, stop at the module providing `model_name`;
+    import all registered modules if `model_name` is None
+    """
+    for name in _registered_modules :
+        module = sys.modules.get('%s.%s' % (__name__, name), None)
+        if module is None or not module in _supported_models :
+            module = _import_module(name)
+        if model_name is not None and model_name in module.supported_models :
+            return module
+    return None
+
+def __getattr__(name : str) :
+    ## PEP 562, resolve registry and submodule access lazily
+    if name in ['supported_models', 'all_models'] :
+        _load_modules()
+        return _supported_models if name == 'supported_models' else _all_models
+    if name in _registered_modules :
+        return _import_module(name)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
 def get_backbone(model_name: str, pretrained: bool = False, feature_type: str = "tri_stage_fpn", 
                  n_classes: int = 1000, **kwargs):
     if feature_type not in supported_feature_type:
         raise RuntimeError("invalid 'feature_type' value of {}, available [{}]".format(
             feature_type, ", ".join(supported_feature_type)))
-    if not model_name in all_models :
-        raise KeyError("backbones '%s' is not supported, available: %s" %(model_name, all_models))
-
-    for module, models in supported_models.items():
-        if model_name in models:
-            return module.get_backbone(model_name, pretrained=pretrained, feature_type=feature_type, 
-                 n_classes=n_classes, **kwargs)
-    raise RuntimeError("unexpected error! please report this as bug")
+    module = _load_modules(model_name)
+    if module is None :
+        raise KeyError("backbones '%s' is not supported, available: %s" %(model_name, _all_models))
+    return module.get_backbone(model_name, pretrained=pretrained, feature_type=feature_type, 
+        n_classes=n_classes, **kwargs)
 
 ## for maintainer, register your module here :
 register_module('darknet53')
@@ -43,3 +74,8 @@ register_module('mobilenetv3')
 register_module('resnet')
 register_module('shufflenetv2')
 register_module('vgg')
+
+## module-level __getattr__ (PEP 562) requires python 3.7, import eagerly otherwise
+if sys.version_info < (3, 7):
+    _load_modules()
+    supported_models, all_models = _supported_models, _all_models
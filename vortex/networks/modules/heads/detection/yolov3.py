@@ -254,9 +254,10 @@ class YoloV3Layer(nn.Module):
 
     def forward(self, prediction: torch.Tensor):
         assert(len(prediction.shape) == 4)
-        batch_size, ch, nx, ny = prediction.shape
+        batch_size, ch, ny, nx = prediction.shape
 
-        if self.training and nx != self.nx:
+        ## grid may be rectangular (e.g. aspect ratio bucketing), stride is unchanged
+        if nx != self.nx or ny != self.ny:
             grid_xy = self.recompute_grids(
                 torch.tensor([nx, ny]).to(prediction.device)
             )
@@ -273,7 +274,7 @@ class YoloV3Layer(nn.Module):
         xy = torch.sigmoid(prediction[..., 0:2])
         wh = prediction[..., 2:4]
         pred_conf = torch.sigmoid(prediction[..., 4]) \
-            .view(batch_size, self.n_anchors, self.nx, self.ny, 1)
+            .view(batch_size, self.n_anchors, self.ny, self.nx, 1)
         pred_cls = torch.sigmoid(prediction[..., 5:])
 
         if self.training:
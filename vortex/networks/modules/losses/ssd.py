@@ -16,6 +16,16 @@ from torch.autograd import Variable
 from .utils.ssd import match, match_landm, log_sum_exp
 
 
+def _per_image_targets(targets : Union[List[Tensor],Tuple[Tensor,Tensor]]) -> List[Tensor]:
+    """convert padded targets (padded [B,max_boxes,D], valid mask [B,max_boxes])
+    to per-image targets, list of targets is returned as is
+    """
+    if isinstance(targets, tuple) and len(targets) == 2 and targets[1].dtype == torch.bool:
+        padded, mask = targets
+        return [target[valid] for target, valid in zip(padded, mask)]
+    return targets
+
+
 class MultiBoxLoss(nn.Module):
     """SSD Weighted Loss Function
     Compute Targets:
@@ -51,18 +61,24 @@ class MultiBoxLoss(nn.Module):
         """Multibox Loss
         Args:
             predictions (tuple): A tuple containing loc preds, conf preds,
-            and prior boxes from SSD net.
+            and optionally prior boxes from SSD net (rectangular input).
                 conf shape: torch.size(batch_size,num_priors,num_classes)
                 loc shape: torch.size(batch_size,num_priors,4)
                 priors shape: torch.size(num_priors,4)
             targets (tensor): Ground truth boxes and labels for a batch,
-                shape: [batch_size,num_objs,5] (last idx is the label).
+                shape: [batch_size,num_objs,5] (last idx is the label),
+                or padded targets with its valid mask.
         """
+        targets = _per_image_targets(targets)
         predictions = input
         device = predictions[0].device
         self.to(device)
         priors = self.priors
-        loc_data, conf_data = predictions
+        if len(predictions) == 3:
+            ## rectangular input, priors are provided by the network
+            loc_data, conf_data, priors = predictions
+        else:
+            loc_data, conf_data = predictions
         num = loc_data.size(0)
         priors = priors[:loc_data.size(1), :]
         num_priors = (priors.size(0))
@@ -175,9 +191,10 @@ class MultiBoxLandmarkLoss(nn.Module):
                 loc shape: torch.size(batch_size,num_priors,4)
                 priors shape: torch.size(num_priors,4)
             ground_truth (tensor): Ground truth boxes and labels for a batch,
-                shape: [batch_size,num_objs,5] (last idx is the label).
+                shape: [batch_size,num_objs,5] (last idx is the label),
+                or padded targets with its valid mask.
         """
-
+        targets = _per_image_targets(targets)
         predictions = input
         loc_data, conf_data, landm_data = predictions
         device = loc_data.device
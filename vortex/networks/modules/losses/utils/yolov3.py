@@ -66,16 +66,31 @@ def wh_iou(box1, box2):
     return inter_area / union_area  # iou
 
 
+def _grid_shape(det_shape):
+    """
+    unpack detection shape of (nB, nA, nG) for square grid
+    or (nB, nA, nGy, nGx) for rectangular grid
+    """
+    if len(det_shape) == 3:
+        nB, nA, nG = det_shape
+        return nB, nA, nG, nG
+    elif len(det_shape) == 4:
+        return tuple(det_shape)
+    raise RuntimeError(
+        "expect det_shape to have len of 3 or 4! got %s" % (len(det_shape)))
+
+
 def encode_grid_labels(det_shape, targets, anchors, ignore_thresh, device: Union[str, torch.device] = 'cuda'):
     """
     encode label in relative image format to grid format
     """
-    nB, nA, nG = det_shape
-    is_obj_mask = torch.zeros(nB, nA, nG, nG, device=device, dtype=torch.bool)
-    no_obj_mask = torch.ones(nB, nA, nG, nG, device=device, dtype=torch.bool)
+    nB, nA, nGy, nGx = _grid_shape(det_shape)
+    is_obj_mask = torch.zeros(nB, nA, nGy, nGx, device=device, dtype=torch.bool)
+    no_obj_mask = torch.ones(nB, nA, nGy, nGx, device=device, dtype=torch.bool)
 
     # TODO : consider using named Tensor on pytorch 1.3
-    target_boxes = targets[:, 2:6] * nG
+    grid_scale = torch.tensor([nGx, nGy, nGx, nGy], dtype=targets.dtype, device=targets.device)
+    target_boxes = targets[:, 2:6] * grid_scale
     target_boxes[:, :2] += target_boxes[:, 2:] / 2.
     gxy = target_boxes[:, :2]
     gwh = target_boxes[:, 2:]
@@ -102,14 +117,14 @@ def encode_yolo_bbox_labels(det_shape, n_classes, targets, anchors, ignore_thres
     Reference :
     [1] J. Redmon and A. Farhadi, “YOLOv3: An Incremental Improvement,” Apr. 2018.
     """
-    nB, nA, nG = det_shape
+    nB, nA, nGy, nGx = _grid_shape(det_shape)
     # nC = det_shape[-1]
     nC = n_classes
-    tx = torch.zeros(nB, nA, nG, nG, device=device)
-    ty = torch.zeros(nB, nA, nG, nG, device=device)
-    tw = torch.zeros(nB, nA, nG, nG, device=device)
-    th = torch.zeros(nB, nA, nG, nG, device=device)
-    tc = torch.zeros(nB, nA, nG, nG, nC, device=device)
+    tx = torch.zeros(nB, nA, nGy, nGx, device=device)
+    ty = torch.zeros(nB, nA, nGy, nGx, device=device)
+    tw = torch.zeros(nB, nA, nGy, nGx, device=device)
+    th = torch.zeros(nB, nA, nGy, nGx, device=device)
+    tc = torch.zeros(nB, nA, nGy, nGx, nC, device=device)
 
     b, best_n, gx, gy, gw, gh, gi, gj, is_obj_mask, no_obj_mask, target_labels, target_boxes = encode_grid_labels(
         det_shape, targets, anchors, ignore_thresh, device)
@@ -132,11 +147,11 @@ def build_targets(pred_shape, pred_cls, targets, anchors, ignore_thresh, device:
     adapted from :
         https://github.com/eriklindernoren/PyTorch-YOLOv3/blob/47b7c912877ca69db35b8af3a38d6522681b3bb3/utils/utils.py#L267
     """
-    if not len(pred_shape) == 3:
+    if not len(pred_shape) in [3, 4]:
         raise RuntimeError(
-            "expect pred_shape to have len of 3! got %s" % (len(pred_shape)))
-    nB, nA, nG = pred_shape
-    class_mask = torch.zeros(nB, nA, nG, nG, device=device)
+            "expect pred_shape to have len of 3 or 4! got %s" % (len(pred_shape)))
+    nB, nA, nGy, nGx = _grid_shape(pred_shape)
+    class_mask = torch.zeros(nB, nA, nGy, nGx, device=device)
 
     encoded_labels = encode_yolo_bbox_labels(
         pred_shape, pred_cls.shape[-1], targets, anchors, ignore_thresh, device)
@@ -6,6 +6,7 @@ import warnings
 from typing import Union, List, Dict, Tuple
 
 from .utils.yolov3 import build_targets
+from vortex.utils.data.collater.utils import unpad_targets
 
 SUPPORTED_METHODS = [
     'YoloV3Loss'
@@ -63,7 +64,7 @@ class YoloV3Loss(_DetectorWeightedLoss):
             else:
                 warnings.warn("YOLO Loss assume xy center is [0.,1.]")
         targets = build_targets(
-            pred_shape=det.shape[0:3],
+            pred_shape=det.shape[0:4],
             pred_cls=pred_cls,
             targets=targets,
             anchors=anchors,
@@ -89,9 +90,14 @@ class YoloV3Loss(_DetectorWeightedLoss):
 
     def forward(self, input: Tuple[torch.Tensor, torch.Tensor, torch.Tensor], targets: torch.Tensor) -> torch.Tensor:
         """
-        compute yolo loss
+        compute yolo loss, targets is either [N,6] of (image index, class label, x, y, w, h)
+        or padded targets [B,max_boxes,5] with its valid mask [B,max_boxes]
         """
         device = self.weight_fg.device
+        if isinstance(targets, tuple):
+            padded, mask = targets
+            values, image_index = unpad_targets(padded, mask)
+            targets = torch.cat((image_index.unsqueeze(1).to(values.dtype), values), dim=1)
         anchors = self.anchors
         if anchors is None:
             raise RuntimeError("please assign anchors before computing loss")
@@ -1,22 +1,32 @@
 import argparse
+from pathlib import Path
 from typing import Union, List
 
 from vortex.utils.parser import load_config
-from vortex.core.pipelines import PytorchPredictionPipeline
 
 description = 'Vortex Pytorch model prediction pipeline; may receive multiple image(s) for batched prediction'
 
 def main(args):
+    from vortex.core.pipelines import PytorchPredictionPipeline
     config_path=args.config
     weights_file=args.weights
     test_images=args.image
+    test_video=args.video
+    batch_size=args.batch_size
     device=args.device
     output_dir=args.output_dir
-    
+    output_file_prefix=args.output_file_prefix
+    bulk_output=args.bulk_output
+    bulk_args=dict(output_format=args.output_format,num_workers=args.num_workers,resume=not args.no_resume)
+
     kwargs = vars(args)
-    for key in ['config','weights','image','device','output_dir']:
+    for key in ['config','weights','image','video','batch_size','device','output_dir','output_file_prefix',
+                'bulk_output','output_format','num_workers','no_resume']:
         kwargs.pop(key)
 
+    if (test_images is None) == (test_video is None):
+        raise RuntimeError("expects exactly one of '--image' or '--video' to be specified")
+
     # Load experiment file
     config = load_config(config_path)
     
@@ -24,7 +34,31 @@ def main(args):
     vortex_predictor=PytorchPredictionPipeline(config = config,
                                      weights = weights_file,
                                      device = device)
-    
+
+    if test_video is not None:
+        # Predict video frames as they are decoded, dump annotated video
+        output_video = Path(output_dir) / '{}_{}.mp4'.format(output_file_prefix, Path(test_video).stem)
+        for result in vortex_predictor.run_stream(source = test_video,
+                                                  batch_size = batch_size,
+                                                  output_video = output_video,
+                                                  **kwargs):
+            ## no class label on frame without detection
+            class_labels = result.prediction['class_label']
+            class_names = [vortex_predictor.class_names[int(class_index)] for class_index in (class_labels if class_labels is not None else [])]
+            print(result.index, result.prediction, class_names)
+        print('annotated video saved to {}'.format(output_video))
+        return
+
+    if bulk_output is not None:
+        # Predict every image of directory(s) or list file(s) to output file, resuming previous run
+        summary = vortex_predictor.run_bulk(images = test_images,
+                                            output = bulk_output,
+                                            batch_size = batch_size,
+                                            **bulk_args,
+                                            **kwargs)
+        print(summary)
+        return
+
     # Make prediction
     results = vortex_predictor.run(images = test_images,
                                visualize = True,
@@ -49,7 +83,14 @@ def add_parser(parent_parser,subparsers = None):
     parser.add_argument("-c","--config", required=True, help='path to experiment config')
     parser.add_argument("-w","--weights", help='path to selected weights(optional, will be inferred from `output_directory` and `experiment_name` field from config) if not specified')
     parser.add_argument("-o","--output-dir",default='.',help='directory to dump prediction visualization')
-    parser.add_argument("-i","--image", required=True, nargs='+', type=str, help='path to test image(s)')
+    parser.add_argument("-i","--image", nargs='+', type=str, help='path to test image(s); with `--bulk-output`, also directory(s) or `.txt` file(s) listing image paths')
+    parser.add_argument("--video", type=str, help='path to test video, predicted frame by frame and dumped as annotated video')
+    parser.add_argument("-b","--batch-size", default=1, type=int, help='number of video frames or images predicted together, only used with `--video` or `--bulk-output`')
+    parser.add_argument("--output-file-prefix", default='prediction', help='filename prefix of annotated video, only used with `--video`')
+    parser.add_argument("--bulk-output", type=str, help='path to output file, predict every image of `--image` in bulk to JSON Lines file or Parquet directory (`*.parquet`) without visualization; resumes interrupted run')
+    parser.add_argument("--output-format", choices=['jsonl','parquet'], help='bulk output format, inferred from `--bulk-output` suffix if not specified')
+    parser.add_argument("-j","--num-workers", default=4, type=int, help='number of image decoding threads, only used with `--bulk-output`')
+    parser.add_argument("--no-resume", action='store_true', help='overwrite `--bulk-output` instead of resuming from its checkpoint')
     parser.add_argument('-d',"--device", help="the device in which the inference will be performed")
 
     # Additional arguments for detection model
@@ -0,0 +1,50 @@
+import argparse
+
+description = 'Vortex IR model serving; concurrent requests are batched dynamically into a single runtime call'
+
+def main(args):
+    from vortex.core.pipelines import IRServingPipeline
+
+    predict_args = {}
+    for key in ['score_threshold', 'iou_threshold']:
+        value = getattr(args, key)
+        if value is not None:
+            predict_args[key] = value
+
+    serving = IRServingPipeline(model=args.model,
+                                runtime=args.runtime,
+                                max_batch_size=args.max_batch_size,
+                                max_wait=args.max_wait / 1e3,
+                                queue_size=args.queue_size,
+                                **predict_args)
+    serving.run(host=args.host,
+                port=args.port,
+                unix_socket=args.unix_socket,
+                request_timeout=args.timeout,
+                verbose=args.verbose)
+
+def add_parser(parent_parser,subparsers = None):
+    if subparsers is None:
+        parser = parent_parser
+    else:
+        parser = subparsers.add_parser('serve',description=description)
+    parser.add_argument('-m','--model', type=str, required=True, help='path to IR model')
+    parser.add_argument('-r','--runtime', type=str, default='cpu', help='runtime device')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='address to listen on')
+    parser.add_argument('-p','--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--unix-socket', type=str, default=None, help='listen on unix socket path instead of host and port')
+    parser.add_argument('-b','--max-batch-size', type=int, default=None, help='maximum number of requests in a batch, defaults to model batch size')
+    parser.add_argument('--max-wait', type=float, default=5., help='maximum time (ms) to wait for a batch to fill')
+    parser.add_argument('--queue-size', type=int, default=64, help='maximum number of queued requests, further requests are rejected with status 503')
+    parser.add_argument('--timeout', type=float, default=30., help='request timeout (second)')
+    parser.add_argument("--score_threshold", default=None, type=float,
+                        help='score threshold for detection, only used if model is detection, ignored otherwise')
+    parser.add_argument("--iou_threshold", default=None, type=float,
+                        help='iou threshold for nms, only used if model is detection, ignored otherwise')
+    parser.add_argument('-v','--verbose', action='store_true', help='log every request')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description)
+    add_parser(parser)
+    args = parser.parse_args()
+    main(args)
@@ -1,11 +1,11 @@
 import argparse
 
 from vortex.utils.parser import load_config, check_config
-from vortex.core.pipelines import TrainingPipeline
 
 description='Vortex training pipeline; will generate a Pytorch model file'
 
 def main(args):
+    from vortex.core.pipelines import TrainingPipeline
     config_path = args.config
     log_metric = not args.no_log
 
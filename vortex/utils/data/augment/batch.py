@@ -0,0 +1,433 @@
+import math
+import torch
+import torch.nn.functional as F
+
+from easydict import EasyDict
+from typing import List, Dict, Tuple, Union, Callable
+
+from torch.utils.data.dataloader import default_collate
+from vortex.networks.modules.preprocess.normalizer import normalize
+from ..collater.utils import concat_targets
+
+supported_transforms = [
+    'batch_augment'
+]
+
+ACCEPTED_BBOX_PARAMS = ['min_visibility', 'min_area']
+
+## batch targets, concatenated targets in dataset data format [N,K] and its image index [N],
+## both are None for classification dataset
+BatchTargets = Tuple[Union[torch.Tensor, None], Union[torch.Tensor, None]]
+
+
+def _uniform(low: float, high: float, n: int, device) -> torch.Tensor:
+    return torch.rand(n, device=device) * (high - low) + low
+
+
+def _range_arg(value: Union[float, List[float]], center: float = 0.) -> Tuple[float, float]:
+    """float `value` is converted to (center - value, center + value) range"""
+    if isinstance(value, (list, tuple)):
+        return float(value[0]), float(value[1])
+    return center - float(value), center + float(value)
+
+
+class _BatchTransform:
+    """base class for batch transform, operates on uint8 images [B,C,H,W] and concatenated targets
+    [N,K] in dataset data format with its image index [N]
+    """
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5):
+        self.data_format = data_format
+        self.p = p
+        self.box_indices = None
+        self.landmark_indices = None
+        if 'bounding_box' in data_format:
+            self.box_indices = list(data_format.bounding_box.indices)
+        if 'landmarks' in data_format:
+            self.landmark_indices = list(data_format.landmarks.indices)
+
+    def _select(self, images: torch.Tensor) -> torch.Tensor:
+        return torch.rand(images.shape[0], device=images.device) < self.p
+
+    def __call__(self, images: torch.Tensor, targets: BatchTargets) -> Tuple[torch.Tensor, BatchTargets]:
+        raise NotImplementedError
+
+
+class _FlipTransform(_BatchTransform):
+    dim = None
+    coord = None
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5):
+        super(_FlipTransform, self).__init__(data_format=data_format, p=p)
+        self.keypoint_order = None
+        if self.landmark_indices is not None:
+            # swap asymmetric keypoints pair, e.g. left and right eye, on flip
+            keypoint_order = list(range(len(self.landmark_indices) // 2))
+            for left, right in data_format.landmarks.get('asymm_pairs', []):
+                keypoint_order[left], keypoint_order[right] = keypoint_order[right], keypoint_order[left]
+            self.keypoint_order = keypoint_order
+
+    def __call__(self, images, targets):
+        flip = self._select(images)
+        images = torch.where(flip[:, None, None, None], images.flip(self.dim), images)
+        values, image_index = targets
+        if values is None or not len(values):
+            return images, targets
+        rows = flip[image_index]
+        flipped = values[rows]
+        if self.box_indices is not None:
+            start, size = self.box_indices[self.coord], self.box_indices[self.coord + 2]
+            flipped[:, start] = 1. - flipped[:, start] - flipped[:, size]
+        if self.landmark_indices is not None:
+            landmarks = flipped[:, self.landmark_indices].view(len(flipped), -1, 2)
+            landmarks[..., self.coord] = 1. - landmarks[..., self.coord]
+            landmarks = landmarks[:, self.keypoint_order]
+            flipped[:, self.landmark_indices] = landmarks.reshape(len(flipped), -1)
+        values = values.clone()
+        values[rows] = flipped
+        return images, (values, image_index)
+
+
+class HorizontalFlip(_FlipTransform):
+    """flip images horizontally with probability `p`"""
+    dim = -1
+    coord = 0
+
+
+class VerticalFlip(_FlipTransform):
+    """flip images vertically with probability `p`"""
+    dim = -2
+    coord = 1
+
+
+class _GeometricTransform(_BatchTransform):
+    """transform moving bounding boxes, boxes below `min_visibility` or `min_area` (pixel)
+    are removed; image whose boxes are all removed is restored to its original
+    """
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5, min_visibility: float = 0.,
+                 min_area: float = 0.):
+        super(_GeometricTransform, self).__init__(data_format=data_format, p=p)
+        self.min_visibility = min_visibility
+        self.min_area = min_area
+
+    def _filter_boxes(self, values: torch.Tensor, boxes: torch.Tensor, shape: Tuple[int, int]) -> torch.Tensor:
+        """clip transformed boxes xyxy [N,4] to image, write it back as xywh and return kept rows"""
+        height, width = shape
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        boxes = boxes.clamp(0., 1.)
+        wh = boxes[:, 2:4] - boxes[:, 0:2]
+        clipped_area = wh[:, 0] * wh[:, 1]
+        keep = (wh[:, 0] > 0) & (wh[:, 1] > 0)
+        keep &= clipped_area >= self.min_visibility * area
+        keep &= clipped_area * height * width >= self.min_area
+        values[:, self.box_indices[0:2]] = boxes[:, 0:2]
+        values[:, self.box_indices[2:4]] = wh
+        return keep
+
+    @staticmethod
+    def _restore_empty(images: torch.Tensor, targets: BatchTargets,
+                       original_images: torch.Tensor, original_targets: BatchTargets):
+        values, image_index = targets
+        original_values, original_index = original_targets
+        n = images.shape[0]
+        counts = torch.bincount(image_index, minlength=n)
+        original_counts = torch.bincount(original_index, minlength=n)
+        empty = (counts == 0) & (original_counts > 0)
+        if not bool(empty.any()):
+            return images, targets
+        images = torch.where(empty[:, None, None, None], original_images, images)
+        keep, restore = ~empty[image_index], empty[original_index]
+        values = torch.cat((values[keep], original_values[restore]))
+        image_index = torch.cat((image_index[keep], original_index[restore]))
+        return images, (values, image_index)
+
+
+class RandomAffine(_GeometricTransform):
+    """random rotation (`degrees`), scale and translation (fraction of image size)
+    applied with probability `p` using a single `grid_sample` for the whole batch
+    """
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5, degrees: Union[float, List[float]] = 0.,
+                 scale: Union[float, List[float]] = 0.5, translate: Union[float, List[float]] = 0.1,
+                 min_visibility: float = 0., min_area: float = 0.):
+        super(RandomAffine, self).__init__(data_format=data_format, p=p,
+            min_visibility=min_visibility, min_area=min_area)
+        self.degrees = _range_arg(degrees)
+        self.scale = _range_arg(scale, center=1.)
+        self.translate = _range_arg(translate)
+
+    def __call__(self, images, targets):
+        n, _, height, width = images.shape
+        device = images.device
+        apply = self._select(images).float()
+        angle = _uniform(*self.degrees, n, device) * math.pi / 180. * apply
+        scale = 1. + (_uniform(*self.scale, n, device) - 1.) * apply
+        translate = torch.stack((_uniform(*self.translate, n, device),
+            _uniform(*self.translate, n, device)), dim=1) * apply[:, None]
+        cos, sin = torch.cos(angle) * scale, torch.sin(angle) * scale
+        ## rotation in pixel space expressed in relative coordinates :
+        ## (xy_out - 0.5) = matrix @ (xy_in - 0.5) + translate
+        aspect = height / width
+        matrix = torch.stack((
+            torch.stack((cos, -sin * aspect), dim=1),
+            torch.stack((sin / aspect, cos), dim=1)), dim=1)
+        inverse = torch.inverse(matrix)
+        theta = torch.cat((inverse, -torch.bmm(inverse, 2. * translate[:, :, None])), dim=2)
+        grid = F.affine_grid(theta, list(images.shape), align_corners=False)
+        output = F.grid_sample(images.float(), grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+        output = output.round_().clamp_(0, 255).to(images.dtype)
+
+        values, image_index = targets
+        if values is None or not len(values):
+            return output, targets
+        original_targets = (values, image_index)
+        values = values.clone()
+        row_matrix, row_translate = matrix[image_index], translate[image_index]
+
+        def transform_points(points):
+            ## points : [N,P,2] relative coordinates
+            points = torch.matmul(points - 0.5, row_matrix.transpose(1, 2)) + row_translate[:, None] + 0.5
+            return points
+
+        keep = torch.ones(len(values), dtype=torch.bool, device=device)
+        if self.box_indices is not None:
+            x, y, w, h = values[:, self.box_indices].unbind(1)
+            corners = torch.stack((torch.stack((x, y), 1), torch.stack((x + w, y), 1),
+                torch.stack((x, y + h), 1), torch.stack((x + w, y + h), 1)), dim=1)
+            corners = transform_points(corners)
+            boxes = torch.cat((corners.min(dim=1)[0], corners.max(dim=1)[0]), dim=1)
+            keep = self._filter_boxes(values, boxes, (height, width))
+        if self.landmark_indices is not None:
+            landmarks = values[:, self.landmark_indices].view(len(values), -1, 2)
+            values[:, self.landmark_indices] = transform_points(landmarks).reshape(len(values), -1)
+        targets = (values[keep], image_index[keep])
+        return self._restore_empty(output, targets, images, original_targets)
+
+
+class Mosaic(_GeometricTransform):
+    """combine four images of the batch with probability `p`, each image contributes
+    one quadrant split at random `center` (fraction of image size); image size is unchanged
+    and landmarks are kept as is
+    """
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5, center: Union[float, List[float]] = [0.25, 0.75],
+                 min_visibility: float = 0.25, min_area: float = 0.):
+        super(Mosaic, self).__init__(data_format=data_format, p=p,
+            min_visibility=min_visibility, min_area=min_area)
+        if self.box_indices is None:
+            raise RuntimeError("batch augmentation 'Mosaic' requires 'bounding_box' in dataset data_format")
+        self.center = _range_arg(center, center=0.5)
+
+    def __call__(self, images, targets):
+        n, _, height, width = images.shape
+        device = images.device
+        apply = self._select(images)
+        ## quadrant split, (1,1) for image without mosaic so top-left quadrant is the whole image
+        cx = torch.where(apply, _uniform(*self.center, n, device), torch.ones(n, device=device))
+        cy = torch.where(apply, _uniform(*self.center, n, device), torch.ones(n, device=device))
+        ## source image of each quadrant, top-left quadrant is the image itself
+        sources = [torch.arange(n, device=device)] + [torch.randperm(n, device=device) for _ in range(3)]
+        quadrants = [(0., 0., cx, cy), (cx, 0., 1., cy), (0., cy, cx, 1.), (cx, cy, 1., 1.)]
+
+        xs = (torch.arange(width, device=device).float() + 0.5) / width
+        ys = (torch.arange(height, device=device).float() + 0.5) / height
+        right = xs[None, :] >= cx[:, None]
+        bottom = ys[None, :] >= cy[:, None]
+        output = images
+        for quadrant, source in enumerate(sources[1:], 1):
+            is_right, is_bottom = quadrant in (1, 3), quadrant in (2, 3)
+            mask = (right == is_right)[:, None, :] & (bottom == is_bottom)[:, :, None]
+            output = torch.where(mask[:, None], images[source], output)
+
+        values, image_index = targets
+        if values is None or not len(values):
+            return output, targets
+        original_targets = (values, image_index)
+        mosaic_values, mosaic_index, mosaic_keep = [], [], []
+        for source, (x1, y1, x2, y2) in zip(sources, quadrants):
+            ## image `source[b]` is placed at output image `b`, so target of image `j` moves to `inverse[j]`
+            inverse = torch.empty_like(source)
+            inverse[source] = torch.arange(n, device=device)
+            index = inverse[image_index]
+            quadrant_values = values.clone()
+            x, y, w, h = quadrant_values[:, self.box_indices].unbind(1)
+            bounds = [torch.as_tensor(bound, device=device).float().expand(n)[index] for bound in (x1, y1, x2, y2)]
+            boxes = torch.stack((torch.max(x, bounds[0]), torch.max(y, bounds[1]),
+                torch.min(x + w, bounds[2]), torch.min(y + h, bounds[3])), dim=1)
+            area = w * h
+            wh = boxes[:, 2:4] - boxes[:, 0:2]
+            clipped_area = wh[:, 0].clamp(min=0) * wh[:, 1].clamp(min=0)
+            keep = (wh[:, 0] > 0) & (wh[:, 1] > 0)
+            keep &= clipped_area >= self.min_visibility * area
+            keep &= clipped_area * height * width >= self.min_area
+            quadrant_values[:, self.box_indices[0:2]] = boxes[:, 0:2]
+            quadrant_values[:, self.box_indices[2:4]] = wh
+            mosaic_values.append(quadrant_values)
+            mosaic_index.append(index)
+            mosaic_keep.append(keep)
+        keep = torch.cat(mosaic_keep)
+        targets = (torch.cat(mosaic_values)[keep], torch.cat(mosaic_index)[keep])
+        return self._restore_empty(output, targets, images, original_targets)
+
+
+class HSVJitter(_BatchTransform):
+    """random hue (fraction of full turn), saturation and value gain with probability `p`,
+    computed as a single per-image 3x3 color matrix (hue rotation in YIQ space)
+    """
+
+    _RGB_TO_YIQ = [[0.299, 0.587, 0.114],
+                   [0.596, -0.274, -0.322],
+                   [0.211, -0.523, 0.312]]
+
+    def __init__(self, data_format: EasyDict, p: float = 0.5, hue: float = 0.015,
+                 saturation: float = 0.7, value: float = 0.4, channel_order: str = 'bgr'):
+        super(HSVJitter, self).__init__(data_format=data_format, p=p)
+        if not channel_order in ['bgr', 'rgb']:
+            raise RuntimeError("HSVJitter 'channel_order' expects 'bgr' or 'rgb', got %s" % channel_order)
+        self.hue = _range_arg(hue)
+        self.saturation = _range_arg(saturation, center=1.)
+        self.value = _range_arg(value, center=1.)
+        self.channel_order = channel_order
+
+    def __call__(self, images, targets):
+        n, channels = images.shape[0:2]
+        if channels != 3:
+            return images, targets
+        device = images.device
+        apply = self._select(images).float()
+        angle = _uniform(*self.hue, n, device) * 2. * math.pi * apply
+        saturation = 1. + (_uniform(*self.saturation, n, device) - 1.) * apply
+        value = 1. + (_uniform(*self.value, n, device) - 1.) * apply
+        yiq = torch.tensor(self._RGB_TO_YIQ, device=device)
+        if self.channel_order == 'bgr':
+            yiq = yiq.flip(1)
+        cos, sin = torch.cos(angle) * saturation, torch.sin(angle) * saturation
+        zeros, ones = torch.zeros_like(cos), torch.ones_like(cos)
+        rotation = torch.stack((
+            torch.stack((ones, zeros, zeros), dim=1),
+            torch.stack((zeros, cos, -sin), dim=1),
+            torch.stack((zeros, sin, cos), dim=1)), dim=1)
+        matrix = torch.matmul(torch.inverse(yiq), torch.matmul(rotation, yiq)) * value[:, None, None]
+        output = torch.einsum('bij,bjhw->bihw', matrix, images.float())
+        output = output.round_().clamp_(0, 255).to(images.dtype)
+        return output, targets
+
+
+BATCH_TRANSFORMS = {
+    'HorizontalFlip': HorizontalFlip,
+    'VerticalFlip': VerticalFlip,
+    'RandomAffine': RandomAffine,
+    'Mosaic': Mosaic,
+    'HSVJitter': HSVJitter,
+}
+
+
+class BatchAugment:
+    """Augmentation applied to the whole uint8 image batch as tensor after collation,
+    transforms are executed sequentially
+
+    Args:
+        transforms (List[EasyDict]): list of `transform` name and its `args`, see `BATCH_TRANSFORMS`
+        data_format (EasyDict): dataset data format
+        bbox_params (EasyDict, optional): `min_visibility` and `min_area` for geometric transforms. Defaults to None.
+        on_device (bool, optional): apply the augmentation on training device by the trainer,
+            otherwise it is applied by the collater in dataloader worker. Defaults to True.
+    """
+
+    batch_transform = True
+
+    def __init__(self, transforms: List[EasyDict], data_format: EasyDict, bbox_params: EasyDict = None,
+                 on_device: bool = True):
+        self.data_format = data_format
+        self.on_device = on_device
+        bbox_params = EasyDict(bbox_params) if bbox_params is not None else EasyDict()
+        if any([key not in ACCEPTED_BBOX_PARAMS for key in bbox_params.keys()]):
+            raise RuntimeError("In batch augmentation, 'bbox_params' allowed to be modified are %s !! Found %s" % (
+                ACCEPTED_BBOX_PARAMS, list(bbox_params.keys())))
+        self.transforms = []
+        for transform in transforms:
+            transform = EasyDict(transform)
+            if not transform.transform in BATCH_TRANSFORMS:
+                raise KeyError("batch augmentation transform %s not supported, available : %s" % (
+                    transform.transform, list(BATCH_TRANSFORMS.keys())))
+            transform_class = BATCH_TRANSFORMS[transform.transform]
+            args = dict(transform.get('args', {}))
+            if issubclass(transform_class, _GeometricTransform):
+                for key, value in bbox_params.items():
+                    args.setdefault(key, value)
+            self.transforms.append(transform_class(data_format=data_format, **args))
+
+    def __call__(self, images: torch.Tensor, targets: BatchTargets) -> Tuple[torch.Tensor, BatchTargets]:
+        for transform in self.transforms:
+            images, targets = transform(images, targets)
+        return images, targets
+
+
+class BatchAugmentCollate:
+    """Collater for dataset with batch augmentation, stacks uint8 images [B,H,W,C] and concatenates
+    targets in dataset data format; batch augmentation, input normalization and the model collater
+    are applied by `apply`, either directly in the collater or on training device by the trainer
+
+    Args:
+        collater (Callable, optional): model collater, None for pytorch default collate
+        batch_augments (List[BatchAugment]): batch augmentations
+        data_format (EasyDict): dataset data format
+        input_normalization (EasyDict): `mean`, `std` and optional `scaler` from preprocess config
+    """
+
+    def __init__(self, collater: Union[Callable, None], batch_augments: List[BatchAugment],
+                 data_format: EasyDict, input_normalization: EasyDict):
+        self.collater = collater
+        self.batch_augments = batch_augments
+        self.data_format = data_format
+        self.input_normalization = input_normalization
+        self.on_device = all([augment.on_device for augment in batch_augments])
+
+    def __call__(self, batch):
+        images, targets = list(zip(*batch))
+        images = torch.stack(images)
+        if 'bounding_box' in self.data_format:
+            targets = concat_targets(targets)
+        else:
+            targets = default_collate(targets)
+        if self.on_device:
+            return images, targets
+        return self.apply(images, targets)
+
+    def apply(self, images: torch.Tensor, targets):
+        n = images.shape[0]
+        images = images.permute(0, 3, 1, 2)
+        if 'bounding_box' in self.data_format:
+            values, counts = targets
+            image_index = torch.repeat_interleave(torch.arange(n, device=counts.device), counts)
+            batch_targets = (values, image_index)
+        else:
+            batch_targets = (None, None)
+        for augment in self.batch_augments:
+            images, batch_targets = augment(images, batch_targets)
+
+        scaler = self.input_normalization.get('scaler', 255)
+        mean = torch.as_tensor(self.input_normalization.mean, dtype=torch.float, device=images.device)
+        std = torch.as_tensor(self.input_normalization.std, dtype=torch.float, device=images.device)
+        images = normalize(images.float().div(scaler), mean, std)
+
+        if 'bounding_box' in self.data_format:
+            values, image_index = batch_targets
+            order = torch.argsort(image_index)
+            counts = torch.bincount(image_index, minlength=n)
+            targets = torch.split(values[order], counts.tolist())
+        if self.collater is None:
+            return images, targets
+        return self.collater(list(zip(images, targets)))
+
+
+def create_transform(transforms: List = None, *args, **kwargs):
+    if transforms is None:
+        raise KeyError(
+            "Batch augmentation module args expecting 'transforms' as one of the config args!")
+    else:
+        if not isinstance(transforms, list):
+            raise TypeError(
+                "Batch augmentation 'transforms' args expecting list as the input type, got %s" % type(transforms))
+    return BatchAugment(transforms=transforms, *args, **kwargs)
@@ -0,0 +1,202 @@
+import os
+import time
+import pickle
+import logging
+import warnings
+import itertools
+
+from typing import Callable, Dict, List, Union
+
+__all__ = [
+    'AUTOTUNE_DEFAULTS',
+    'check_autotune_args',
+    'candidate_worker_counts',
+    'measure_throughput',
+    'autotune_dataloader',
+]
+
+logger = logging.getLogger(__name__)
+
+AUTOTUNE_DEFAULTS = {
+    'warmup_batches': 10,
+    'max_workers': None,
+    'prefetch_factors': [2, 4],
+    'memory_budget': 4096,
+    'time_budget': 120.,
+}
+TUNED_ARGS = ['num_workers', 'prefetch_factor', 'persistent_workers', 'pin_memory']
+
+## selected DataLoader arguments by `cache_key`, e.g. reused by every hypopt trial of the same dataset
+_autotune_cache = {}
+
+
+def check_autotune_args(autotune: Union[dict, bool, None]) -> dict:
+    """Check `dataloader.autotune` configuration and fill the defaults, `True` for all defaults"""
+    if autotune is True or autotune is None:
+        autotune = {}
+    if not isinstance(autotune, dict):
+        raise TypeError("expects dataloader 'autotune' to be a dict or true, got %s" % type(autotune))
+    unknown = [key for key in autotune if key not in AUTOTUNE_DEFAULTS]
+    if unknown:
+        raise RuntimeError("unknown dataloader 'autotune' argument(s) %s, available %s" % (
+            unknown, list(AUTOTUNE_DEFAULTS.keys())))
+    args = dict(AUTOTUNE_DEFAULTS)
+    args.update(autotune)
+    if not isinstance(args['warmup_batches'], int) or args['warmup_batches'] < 1:
+        raise RuntimeError("dataloader autotune 'warmup_batches' must be a positive int, found %s" % args['warmup_batches'])
+    if args['max_workers'] is None:
+        args['max_workers'] = os.cpu_count() or 1
+    return args
+
+
+def candidate_worker_counts(max_workers: int) -> List[int]:
+    """0 (main process) then powers of 2 up to `max_workers`, `max_workers` included"""
+    counts = [0]
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    if max_workers > 0:
+        counts.append(max_workers)
+    return counts
+
+
+def _nbytes(data) -> int:
+    if hasattr(data, 'element_size') and hasattr(data, 'nelement'):
+        return data.element_size() * data.nelement()
+    if hasattr(data, 'nbytes'):
+        return int(data.nbytes)
+    if isinstance(data, dict):
+        return sum(_nbytes(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return sum(_nbytes(value) for value in data)
+    return 0
+
+
+def _estimate_memory(batch_bytes: int, dataset_bytes: int, num_workers: int, prefetch_factor: int) -> float:
+    """Estimated additional memory (MB) of the loader : batches in flight and a dataset copy for each worker"""
+    if num_workers == 0:
+        return batch_bytes / 2 ** 20
+    return (num_workers * (prefetch_factor * batch_bytes + dataset_bytes)) / 2 ** 20
+
+
+def measure_throughput(dataloader, warmup_batches: int, deadline: Union[float, None] = None) -> float:
+    """Batches per second of `dataloader`, the first batch (worker startup) is excluded"""
+    iterator = iter(dataloader)
+    try:
+        next(iterator)
+        start, n_batches = time.perf_counter(), 0
+        for _ in itertools.islice(iterator, warmup_batches):
+            n_batches += 1
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        elapsed = time.perf_counter() - start
+    except StopIteration:
+        return 0.
+    finally:
+        # Shutdown the workers of this candidate
+        del iterator
+    return n_batches / elapsed if n_batches and elapsed > 0 else 0.
+
+
+def autotune_dataloader(create_fn: Callable, dataset, loader_args: dict, autotune: Union[dict, bool],
+                        cache_key: Union[str, None] = None) -> Dict:
+    """Choose `num_workers`, `prefetch_factor`, `persistent_workers` and `pin_memory` by measuring the throughput
+    of the loader built by `create_fn(args)` with each candidate setting on the actual dataset, augmentations and
+    collater, within the memory and time budget of `autotune`
+
+    Worker counts are tried in increasing order until throughput stops improving, then the prefetch
+    factors for the fastest worker count. `pin_memory` is only enabled when CUDA is available, and
+    `persistent_workers` when the base dataset doesn't depend on the epoch. Any of these given in
+    `loader_args` is kept as is, only the others are tuned.
+
+    The measurement takes up to `time_budget`, the selected arguments are cached in the process by
+    `cache_key` so the same dataloader configuration (e.g. every hypopt trial) is only measured once.
+
+    Args:
+        create_fn (Callable): create the dataloader given DataLoader keyword arguments
+        dataset: dataset of the dataloader, used for memory estimation
+        loader_args (dict): base DataLoader keyword arguments from experiment file
+        autotune (Union[dict,bool]): `dataloader.autotune` configuration
+        cache_key (str, optional): identity of the dataset, collater and `loader_args`. Defaults to None, not cached.
+
+    Returns:
+        Dict: DataLoader keyword arguments of the fastest setting
+    """
+    import torch
+    autotune = check_autotune_args(autotune)
+    if cache_key is not None and cache_key in _autotune_cache:
+        args = dict(_autotune_cache[cache_key])
+        print('dataloader autotune reused {}'.format(_format_args(args)))
+        return args
+    fixed = {key: loader_args[key] for key in TUNED_ARGS if key in loader_args}
+    if len(fixed) == len(TUNED_ARGS):
+        return dict(loader_args)
+    deadline = time.perf_counter() + autotune['time_budget']
+    base_args = dict(loader_args)
+    base_args.setdefault('pin_memory', torch.cuda.is_available())
+    # Persistent workers would keep the epoch-dependent dataset state (see `set_epoch`) of the first epoch
+    persistent_workers = fixed.get('persistent_workers', not hasattr(getattr(dataset, 'dataset', None), 'set_epoch'))
+    try:
+        dataset_bytes = len(pickle.dumps(dataset))
+    except Exception:
+        dataset_bytes = 0
+
+    results = []
+    def _candidate(num_workers: int, prefetch_factor: int):
+        args = dict(base_args, num_workers=num_workers)
+        if num_workers > 0:
+            args.update(prefetch_factor=prefetch_factor, persistent_workers=persistent_workers)
+        else:
+            args.pop('prefetch_factor', None)
+            args.pop('persistent_workers', None)
+        return args
+
+    def _measure(num_workers: int, prefetch_factor: int):
+        args = _candidate(num_workers, prefetch_factor)
+        throughput = measure_throughput(create_fn(args), autotune['warmup_batches'], deadline)
+        results.append((throughput, args))
+        logger.info('dataloader autotune : %s -> %.2f batch/s' % (args, throughput))
+        return throughput
+
+    batch_bytes = _nbytes(next(iter(create_fn(_candidate(0, None)))))
+    prefetch_factors = [fixed['prefetch_factor']] if 'prefetch_factor' in fixed else autotune['prefetch_factors']
+    default_prefetch = prefetch_factors[0]
+    if 'num_workers' in fixed:
+        worker_counts = [fixed['num_workers']]
+    else:
+        worker_counts = candidate_worker_counts(autotune['max_workers'])
+        if 'prefetch_factor' in fixed or fixed.get('persistent_workers', False):
+            ## only valid with worker processes
+            worker_counts = [count for count in worker_counts if count > 0] or [1]
+    best_throughput, best_workers = -1., 0
+    for num_workers in worker_counts:
+        if time.perf_counter() > deadline:
+            break
+        if _estimate_memory(batch_bytes, dataset_bytes, num_workers, default_prefetch) > autotune['memory_budget']:
+            break
+        throughput = _measure(num_workers, default_prefetch)
+        if throughput <= best_throughput * 1.05:
+            break
+        best_throughput, best_workers = throughput, num_workers
+    if best_workers > 0:
+        for prefetch_factor in prefetch_factors[1:]:
+            if time.perf_counter() > deadline:
+                break
+            if _estimate_memory(batch_bytes, dataset_bytes, best_workers, prefetch_factor) > autotune['memory_budget']:
+                continue
+            _measure(best_workers, prefetch_factor)
+    if not results:
+        warnings.warn('dataloader autotune time budget exceeded before any measurement, using num_workers=%s'
+                      % worker_counts[0])
+        return _candidate(worker_counts[0], default_prefetch)
+    throughput, args = max(results, key=lambda result: result[0])
+    print('dataloader autotune selected {} ({:.2f} batch/s, {} setting(s) measured)'.format(
+        _format_args(args), throughput, len(results)))
+    if cache_key is not None:
+        _autotune_cache[cache_key] = dict(args)
+    return args
+
+
+def _format_args(args: dict) -> str:
+    return ', '.join('{}={}'.format(key, args[key]) for key in TUNED_ARGS if key in args)
@@ -11,14 +11,35 @@ from easydict import EasyDict
 from typing import List, Union, Tuple, Callable
 
 
+def _darknet_targets(targets, dataformat: EasyDict, padded: bool = False):
+    """
+    build darknet targets with a single preallocated tensor,
+    [N, 6] of (image index, class label, x, y, w, h), or padded
+    ([B, max_boxes, 5] of (class label, x, y, w, h), valid mask [B, max_boxes])
+    """
+    import torch
+    from .utils import concat_targets, gather_fields, pad_targets
+    values, counts = concat_targets(targets)
+    if padded:
+        targets = gather_fields(values, dataformat, ['class_label', 'bounding_box'])
+        return pad_targets(targets, counts)
+    targets = gather_fields(values, dataformat, ['class_label', 'bounding_box'], n_prefix=1)
+    targets[:, 0] = torch.repeat_interleave(
+        torch.arange(len(counts), dtype=targets.dtype, device=counts.device), counts)
+    return targets
+
+
 class DarknetCollate:
     """
     A collater returning darknet format
     """
+    ## supports rectangular batch (aspect ratio bucketing), yolo grid follows the input shape
+    rectangular = True
 
-    def __init__(self, dataformat: dict):
+    def __init__(self, dataformat: dict, padded: bool = False):
         # TODO : check all necessary fields
         self.dataformat = EasyDict(dataformat)
+        self.padded = padded
 
     def __call__(self, batch):
         try:
@@ -27,50 +48,26 @@ class DarknetCollate:
             raise RuntimeError("current implementation needs torch")
         images, targets = list(zip(*batch))
         images = torch.stack(images)
-        collate_targets = []
-
-        df = self.dataformat
-        for batch_idx, target in enumerate(targets):
-            if not len(target.shape) == 2:
-                raise RuntimeError(
-                    "expects dimensionality of target is 2 got %s" % len(target.shape))
-            if self.dataformat.class_label is None:
-                class_label_tensor = torch.from_numpy(
-                    np.array([[0]]*target.shape[0])).float()
-            else:
-                class_label_tensor = torch.index_select(
-                    input=target,
-                    dim=df.class_label.axis,
-                    index=torch.tensor(
-                        df.class_label.indices, dtype=torch.long)
-                )
-            img_idx_tensor = torch.from_numpy(
-                np.array([[batch_idx]]*target.shape[0])).float()
-            bounding_box_tensor = torch.index_select(
-                input=target,
-                dim=df.bounding_box.axis,
-                index=torch.tensor(df.bounding_box.indices, dtype=torch.long)
-            ).float()
-            target = torch.cat(
-                (class_label_tensor, bounding_box_tensor), axis=1)
-            target = torch.cat((img_idx_tensor, target), axis=1)
-            collate_targets.append(target)
-
-        targets = torch.cat(collate_targets)
+        targets = _darknet_targets(targets, self.dataformat, self.padded)
         return (images, targets)
 
 
 class MultiScaleDarknetCollate:
     """
-    Darknet collater with support for multiscale training
+    Darknet collater with support for multiscale training;
+    for rectangular batch (e.g. aspect ratio bucketing) the longest side is scaled
+    to the selected scale and the shortest side is rounded to a multiple of `stride`
     """
+    rectangular = True
 
-    def __init__(self, scales: Union[List[int], int], dataformat: dict):
+    def __init__(self, scales: Union[List[int], int], dataformat: dict, stride: int = 32, padded: bool = False):
         if isinstance(scales, int):
             scales = [scales]
         self.scales = scales
+        self.stride = stride
         # TODO : check all necessary fields
         self.dataformat = EasyDict(dataformat)
+        self.padded = padded
 
     def __call__(self, batch):
         try:
@@ -81,36 +78,13 @@ class MultiScaleDarknetCollate:
         img_size = self.scales[random.randrange(0, len(self.scales))]
         images, targets = list(zip(*batch))
         images = torch.stack(images)
+        height, width = images.shape[2:]
+        if height != width:
+            scale = img_size / max(height, width)
+            img_size = tuple(max(self.stride, int(round(dim * scale / self.stride)) * self.stride)
+                for dim in (height, width))
         images = F.interpolate(images, size=img_size)
-        collate_targets = []
-
-        df = self.dataformat
-        for batch_idx, target in enumerate(targets):
-            if not len(target.shape) == 2:
-                raise RuntimeError(
-                    "expects dimensionality of target is 2 got %s" % len(target.shape))
-            if self.dataformat.class_label is None:
-                class_label = torch.from_numpy(
-                    np.array([[0]]*target.shape[0])).float()
-            else:
-                class_label = torch.index_select(
-                    input=target,
-                    dim=df.class_label.axis,
-                    index=torch.tensor(
-                        df.class_label.indices, dtype=torch.long)
-                )
-            idx_tensor = torch.from_numpy(
-                np.array([[batch_idx]]*target.shape[0])).float()
-            target = torch.index_select(
-                input=target,
-                dim=df.bounding_box.axis,
-                index=torch.tensor(df.bounding_box.indices, dtype=torch.long)
-            )
-            target = torch.cat((class_label, target), axis=1)
-            target = torch.cat((idx_tensor, target), axis=1)
-            collate_targets.append(target)
-
-        targets = torch.cat(collate_targets)
+        targets = _darknet_targets(targets, self.dataformat, self.padded)
         return (images, targets)
 
 
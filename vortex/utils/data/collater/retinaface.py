@@ -2,53 +2,32 @@ import torch
 import numpy as np
 
 from easydict import EasyDict
+from .utils import concat_targets, gather_fields, pad_targets
 
 class RetinaFaceCollate:
     """
-    collater for retinaface
+    collater for retinaface, targets are built with a single preallocated tensor;
+    returns per-image list of [n_i, 4 + n_landmarks + 1] of (x1, y1, x2, y2, landmarks, class label),
+    or padded ([B, max_boxes, D], valid mask [B, max_boxes]) when `padded` is True
     """
+    ## priors of `MultiBoxLandmarkLoss` are computed for square input only
+    rectangular = False
 
-    def __init__(self, dataformat: dict) :
+    def __init__(self, dataformat: dict, padded: bool = False) :
         ## TODO : check all necessary fields
         self.dataformat = EasyDict(dataformat)
+        self.padded = padded
         assert 'landmarks' in self.dataformat, "RetinaFace requires landmarks informations!!!"
     
     def __call__(self, batch) :
         imgs, targets = list(zip(*batch))
-        df = self.dataformat
-
-        list_targets = []
-
-        for batch_idx, target in enumerate(targets):
-            if not len(target.shape) == 2:
-                raise RuntimeError(
-                    "expects dimensionality of target is 2 got %s" % len(target.shape))
-            if self.dataformat.class_label is None:
-                class_label_tensor = torch.from_numpy(
-                    np.array([[0]]*target.shape[0])).float()
-            else:
-                class_label_tensor = torch.index_select(
-                    input=target,
-                    dim=df.class_label.axis,
-                    index=torch.tensor(
-                        df.class_label.indices, dtype=torch.long)
-                )
-            bounding_box_tensor = torch.index_select(
-                input=target,
-                dim=df.bounding_box.axis,
-                index=torch.tensor(df.bounding_box.indices, dtype=torch.long)
-            )
-            landmarks_tensor = torch.index_select(
-                input=target,
-                dim=df.landmarks.axis,
-                index=torch.tensor(df.landmarks.indices, dtype=torch.long)
-            )
-            bounding_box_tensor[:,2:] = bounding_box_tensor[:,:2] + bounding_box_tensor[:,2:]
-            target = torch.cat(
-                (bounding_box_tensor, landmarks_tensor, class_label_tensor), axis=1)            
-            list_targets.append(target)
-
-        return (torch.stack(imgs, 0), list_targets)
+        values, counts = concat_targets(targets)
+        targets = gather_fields(values, self.dataformat, ['bounding_box', 'landmarks', 'class_label'])
+        ## xywh to xyxy
+        targets[:,2:4] += targets[:,0:2]
+        if self.padded :
+            return (torch.stack(imgs, 0), pad_targets(targets, counts))
+        return (torch.stack(imgs, 0), list(torch.split(targets, counts.tolist())))
 
 supported_collater = [
     'RetinaFaceCollate'
@@ -0,0 +1,85 @@
+import torch
+
+from easydict import EasyDict
+from typing import List, Tuple, Sequence
+
+__all__ = [
+    'concat_targets',
+    'gather_fields',
+    'pad_targets',
+    'unpad_targets',
+]
+
+
+def concat_targets(targets: Sequence[torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Copy per-image targets into a single preallocated tensor
+
+    Args:
+        targets (Sequence[torch.Tensor]): per-image target with shape [n_i, K]
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: concatenated float targets [sum(n_i), K] and per-image count [B]
+    """
+    for target in targets:
+        if not len(target.shape) == 2:
+            raise RuntimeError(
+                "expects dimensionality of target is 2 got %s" % len(target.shape))
+    device = targets[0].device if len(targets) and isinstance(targets[0], torch.Tensor) else None
+    counts = torch.tensor([target.shape[0] for target in targets], dtype=torch.long, device=device)
+    n_columns = max(target.shape[1] for target in targets) if len(targets) else 0
+    values = torch.empty(int(counts.sum()), n_columns, dtype=torch.float32, device=device)
+    offset = 0
+    for target, count in zip(targets, counts.tolist()):
+        if count:
+            values[offset:offset+count].copy_(torch.as_tensor(target))
+        offset += count
+    return values, counts
+
+
+def gather_fields(values: torch.Tensor, dataformat: EasyDict, fields: List[str], n_prefix: int = 0) -> torch.Tensor:
+    """Gather `fields` columns (e.g. class_label, bounding_box, landmarks) of concatenated targets
+    into a single tensor, `class_label` of None is filled with 0
+
+    Args:
+        values (torch.Tensor): concatenated targets [N, K]
+        dataformat (EasyDict): dataset data format
+        fields (List[str]): data format fields to be gathered, in order
+        n_prefix (int, optional): number of leading columns left for the caller to fill, e.g. image index. Defaults to 0.
+
+    Returns:
+        torch.Tensor: gathered targets [N, n_prefix + D]
+    """
+    indices = []
+    for field in fields:
+        if field == 'class_label' and dataformat.class_label is None:
+            indices.append(None)
+        else:
+            indices.append(list(dataformat[field].indices))
+    n_columns = sum(1 if index is None else len(index) for index in indices)
+    output = torch.empty(values.shape[0], n_prefix + n_columns, dtype=values.dtype, device=values.device)
+    start = n_prefix
+    for index in indices:
+        if index is None:
+            output[:, start] = 0
+            start += 1
+        else:
+            output[:, start:start+len(index)] = values[:, index]
+            start += len(index)
+    return output
+
+
+def pad_targets(values: torch.Tensor, counts: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Pad concatenated targets into [B, max_boxes, D] with a valid mask [B, max_boxes]
+    """
+    max_boxes = int(counts.max()) if len(counts) else 0
+    mask = torch.arange(max_boxes, device=counts.device).unsqueeze(0) < counts.unsqueeze(1)
+    padded = values.new_zeros((len(counts), max_boxes, values.shape[1]))
+    padded[mask] = values
+    return padded, mask
+
+
+def unpad_targets(padded: torch.Tensor, mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Inverse of `pad_targets`, returns concatenated targets [N, D] and their image index [N]
+    """
+    image_index = mask.nonzero()[:, 0]
+    return padded[mask], image_index
@@ -0,0 +1,129 @@
+import math
+import numpy as np
+import PIL.Image
+from easydict import EasyDict
+from typing import Union, List, Tuple, Iterator
+from torch.utils.data.sampler import Sampler
+
+KNOWN_BUCKET_ARGS = ['n_buckets', 'stride', 'seed']
+
+
+def check_bucket_args(bucket: Union[EasyDict, dict]):
+    """Check and normalize dataset `aspect_ratio_bucket` config
+
+    Args:
+        bucket (Union[EasyDict, dict]): bucket config, contains optional `n_buckets` (int, default 4),
+            `stride` (int, default 32) and `seed` (int, default 0)
+
+    Returns:
+        EasyDict: normalized bucket config
+    """
+    bucket = EasyDict(bucket)
+    if not all([key in KNOWN_BUCKET_ARGS for key in bucket]):
+        raise RuntimeError("Unknown dataset 'aspect_ratio_bucket' argument! Known arguments = %s, found %s" % (
+            KNOWN_BUCKET_ARGS, list(bucket.keys())))
+    bucket.n_buckets = bucket.get('n_buckets', 4)
+    bucket.stride = bucket.get('stride', 32)
+    bucket.seed = bucket.get('seed', 0)
+    for key in ['n_buckets', 'stride']:
+        if not isinstance(bucket[key], int) or bucket[key] < 1:
+            raise RuntimeError("Dataset 'aspect_ratio_bucket' '%s' must be a positive int, found %s" % (key, bucket[key]))
+    return bucket
+
+
+def get_image_shape(image) -> Tuple[int, int]:
+    """Get (height, width) of dataset image without decoding it, only the file header is read for image path
+    """
+    if isinstance(image, str):
+        with PIL.Image.open(image) as img:
+            width, height = img.size
+        return height, width
+    elif isinstance(image, PIL.Image.Image):
+        width, height = image.size
+        return height, width
+    elif isinstance(image, np.ndarray):
+        return tuple(image.shape[:2])
+    raise RuntimeError("Unknown return format of %s" % type(image))
+
+
+def create_bucket_shapes(image_shapes: np.ndarray, input_size: int, n_buckets: int = 4, stride: int = 32):
+    """Group images by aspect ratio and compute each bucket rectangular shape
+
+    Images are sorted by aspect ratio (height / width) and split into `n_buckets` equally
+    sized groups. Each bucket shape is the smallest multiple of `stride` that holds every
+    image of the bucket once its longest side is resized to `input_size`.
+
+    Args:
+        image_shapes (np.ndarray): array of (height, width) with shape [N,2]
+        input_size (int): longest side of the resized image
+        n_buckets (int, optional): number of buckets. Defaults to 4.
+        stride (int, optional): network stride, bucket shape is a multiple of this value. Defaults to 32.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: bucket index of each image [N], and bucket shapes (height, width) [n_buckets,2]
+    """
+    image_shapes = np.asarray(image_shapes, dtype=np.float64).reshape(-1, 2)
+    ratios = image_shapes[:, 0] / image_shapes[:, 1]
+    order = np.argsort(ratios, kind='stable')
+    bucket_ids = np.zeros(len(ratios), dtype=np.int64)
+    bucket_shapes = []
+    for indices in np.array_split(order, min(n_buckets, max(len(order), 1))):
+        if len(indices) == 0:
+            continue
+        bucket_ratios = ratios[indices]
+        height = input_size * min(1., bucket_ratios.max())
+        width = input_size * min(1., (1. / bucket_ratios).max())
+        bucket_ids[indices] = len(bucket_shapes)
+        bucket_shapes.append((int(math.ceil(height / stride) * stride), int(math.ceil(width / stride) * stride)))
+    return bucket_ids, np.asarray(bucket_shapes, dtype=np.int64).reshape(-1, 2)
+
+
+class AspectRatioBatchSampler(Sampler):
+    """Batch sampler yielding batches from a single aspect ratio bucket
+
+    Args:
+        bucket_ids (List[int]): bucket index of each dataset sample
+        batch_size (int): number of samples per batch
+        shuffle (bool, optional): shuffle samples within bucket and order of batches. Defaults to True.
+        drop_last (bool, optional): drop the last incomplete batch of each bucket. Defaults to False.
+        seed (int, optional): random seed for shuffling, offset by epoch. Defaults to 0.
+    """
+
+    def __init__(self, bucket_ids: Union[List[int], np.ndarray], batch_size: int,
+                 shuffle: bool = True, drop_last: bool = False, seed: int = 0):
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("batch_size should be a positive integer value, but got batch_size={}".format(batch_size))
+        self.bucket_ids = np.asarray(bucket_ids, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def _create_batches(self) -> List[List[int]]:
+        rng = np.random.RandomState(self.seed + self.epoch)
+        batches = []
+        for bucket in np.unique(self.bucket_ids):
+            indices = np.flatnonzero(self.bucket_ids == bucket)
+            if self.shuffle:
+                rng.shuffle(indices)
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start:start + self.batch_size].tolist()
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch)
+        if self.shuffle:
+            order = rng.permutation(len(batches))
+            batches = [batches[i] for i in order]
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = self._create_batches()
+        self.epoch += 1
+        return iter(batches)
+
+    def __len__(self) -> int:
+        _, counts = np.unique(self.bucket_ids, return_counts=True)
+        if self.drop_last:
+            return int(sum(count // self.batch_size for count in counts))
+        return int(sum(int(math.ceil(count / self.batch_size)) for count in counts))
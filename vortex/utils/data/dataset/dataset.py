@@ -1,16 +1,22 @@
 import os
 import sys
+import ast
+import json
 import warnings
 from pathlib import Path, PurePath
-from typing import Union
+from typing import Union, Dict, List
 import shutil
-import torchvision.datasets
 from pprint import PrettyPrinter
 from .torchvision import create_torchvision_dataset,SUPPORTED_TORCHVISION_DATASETS
+from .shard import create_shard_dataset, SHARD_DATASET
+from .materialize import create_materialized_dataset, MATERIALIZED_DATASET
 
 _file_path = Path(__file__)
 _default_dataset_path = os.path.join(
     os.getcwd(), "external", "datasets")
+_default_manifest_path = os.path.join(
+    os.environ.get('VORTEX_CACHE_DIR', os.path.join(str(Path.home()), '.cache', 'vortex')),
+    'dataset_manifest.json')
 _exclude_dirs = [
     '__pycache__'
 ]
@@ -26,14 +32,22 @@ pp = PrettyPrinter(indent=4)
 
 all_datasets = {
     'torchvision.datasets': SUPPORTED_TORCHVISION_DATASETS,
+    'shard': SHARD_DATASET,
+    'materialized': MATERIALIZED_DATASET,
     'external': []
 }
+## torchvision is only imported when one of its dataset is actually created
 supported_dataset = {
-    torchvision.datasets: SUPPORTED_TORCHVISION_DATASETS
+    'torchvision.datasets': SUPPORTED_TORCHVISION_DATASETS,
+    'shard': SHARD_DATASET,
+    'materialized': MATERIALIZED_DATASET
 }
+## dataset name -> (module name, dataset root path), imported on first use by `get_base_dataset`
+lazy_datasets = {}
+_scanned = False
 
 
-def register_dvc_dataset(module: str, path: Union[str, Path] = _default_dataset_path):
+def register_dvc_dataset(module: str, path: Union[str, Path] = _default_dataset_path, strict: bool = False):
     """
     Register DVC type dataset to be recognized by Vortex.
 
@@ -41,6 +55,8 @@ def register_dvc_dataset(module: str, path: Union[str, Path] = _default_dataset_
         - all dataset module should have `utils` directory
         - inside `utils`, `dataset.py` should be present
         - `dataset.py` should have `supported_dataset` which is list of str and `create_dataset` method
+
+    invalid dataset module is skipped with a warning, unless `strict` where ImportError is raised
     """
     global supported_dataset, all_datasets
 
@@ -58,6 +74,9 @@ def register_dvc_dataset(module: str, path: Union[str, Path] = _default_dataset_
             module = transformed_name
         exec('from %s.utils import dataset as %s' % (module, module))
     except Exception as e:
+        if strict:
+            raise ImportError('failed to import dataset module %s, original error message is "%s"'
+                              % (module, str(e))) from e
         warnings.warn(
             'failed to import dataset %s, original error message is "%s"' % (module, str(e)))
         return
@@ -65,46 +84,140 @@ def register_dvc_dataset(module: str, path: Union[str, Path] = _default_dataset_
     module_attributes = py_module.__dict__.keys()
     for attribute in _required_dataset_module_attributes:
         if not attribute in module_attributes:
+            if strict:
+                raise ImportError('dataset module %s is missing required attribute `%s`' % (module, attribute))
             warnings.warn('skipping dataset %s' % module)
             return
     warnings.warn('adding %s to available datasets' % module)
-    all_datasets['external'] += py_module.supported_dataset
+    all_datasets['external'] += [name for name in py_module.supported_dataset
+                                 if name not in all_datasets['external']]
     supported_dataset[py_module] = py_module.supported_dataset
+    for name in py_module.supported_dataset:
+        lazy_datasets.pop(name, None)
+
+
+def _read_supported_dataset(module_file: Path) -> Union[List[str], None]:
+    """
+    statically read `supported_dataset` list from dataset module source without importing it,
+    return None if it is not a literal list of str
+    """
+    try:
+        tree = ast.parse(module_file.read_text(), filename=str(module_file))
+    except (OSError, SyntaxError, ValueError):
+        return None
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        if not any(isinstance(target, ast.Name) and target.id == 'supported_dataset' for target in node.targets):
+            continue
+        try:
+            value = ast.literal_eval(node.value)
+        except ValueError:
+            return None
+        if isinstance(value, (list, tuple)) and all(isinstance(name, str) for name in value):
+            return list(value)
+        return None
+    return None
+
+
+def _load_manifest(manifest_path: Union[str, Path]) -> dict:
+    try:
+        with open(str(manifest_path)) as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_manifest(manifest: dict, manifest_path: Union[str, Path]):
+    manifest_path = Path(manifest_path)
+    try:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_suffix('.tmp.%s' % os.getpid())
+        with open(str(tmp_path), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(str(tmp_path), str(manifest_path))
+    except OSError as e:
+        warnings.warn('unable to write dataset manifest to %s : %s' % (manifest_path, str(e)))
 
 
-def _scan_dvc_dataset(path: Path, dataset_env: str = 'VORTEX_DATASET_ROOT'):
+def _scan_dvc_dataset(path: Path, dataset_env: str = 'VORTEX_DATASET_ROOT',
+                      manifest_path: Union[str, Path] = _default_manifest_path) -> Dict[str, List[str]]:
     """
-    given path, find all standardized dvc dataset
+    given path, find all standardized dvc dataset and register them lazily;
+    dataset names are read from a cached manifest (invalidated by each module's mtime)
+    so no dataset module is imported until it is requested by `get_base_dataset`
+
+    return mapping of module name to its dataset names
     """
+    global _scanned
+    _scanned = True
     path = os.environ.get(dataset_env, path)
-    ## python >= 3.6
-    # path : Path = Path(path)
     path = Path(path)
-    if path.exists() and path.is_dir():
-    # if not path.exists():
-    #     raise RuntimeError(
-    #         'trying to scan dataset from %s, but the path doesnt exists' % str(path))
-    # if not path.is_dir():
-    #     raise RuntimeError(
-    #         'trying to scan dataset from %s, but the path is not a directory' % str(path))
-        warnings.warn('scanning for dataset at: %s' % str(path))
-        for child in path.iterdir():
-            if child.is_dir():
-                dir_name = child.name
-                if dir_name in _exclude_dirs:
-                    continue
-                child2 = [ch.name for ch in child.iterdir()]
-                ok = all([req_dir in child2 for req_dir in _required_dirs])
-                if ok:
-                    register_dvc_dataset(dir_name, path=path)
-    else:
-        warnings.warn("'external/datasets/' directory is not found!, skipping external dataset scanning!")
-
-    warnings.warn('finished scanning dataset, available dataset(s) : \n%s' %
-                  (pp.pformat(all_datasets)))
+    found = {}
+    if not (path.exists() and path.is_dir()):
+        return found
+    root = str(path.resolve())
+    manifest = _load_manifest(manifest_path)
+    cached_modules = manifest.get(root, {})
+    modules = {}
+    for child in sorted(path.iterdir()):
+        if not child.is_dir() or child.name in _exclude_dirs:
+            continue
+        child2 = [ch.name for ch in child.iterdir()]
+        if not all([req_dir in child2 for req_dir in _required_dirs]):
+            continue
+        module_file = child / 'utils' / 'dataset.py'
+        try:
+            mtime = module_file.stat().st_mtime
+        except OSError:
+            mtime = None
+        cached = cached_modules.get(child.name, None)
+        if cached is not None and mtime is not None and cached.get('mtime', None) == mtime:
+            names = cached['supported_dataset']
+        else:
+            names = _read_supported_dataset(module_file) if mtime is not None else None
+        modules[child.name] = {'mtime': mtime, 'supported_dataset': names}
+        if names is None:
+            # not statically known, fallback to importing the module
+            register_dvc_dataset(child.name, path=path)
+            continue
+        module = child.name.replace('-', '_')
+        for name in names:
+            if name not in all_datasets['external']:
+                all_datasets['external'].append(name)
+                lazy_datasets[name] = (child.name, str(path))
+        found[module] = names
+    if modules != cached_modules:
+        manifest[root] = modules
+        _save_manifest(manifest, manifest_path)
+    return found
+
+
+def list_datasets() -> Dict[str, List[str]]:
+    """
+    list all available dataset names without importing any external dataset module
+    """
+    if not _scanned:
+        _scan_dvc_dataset(_default_dataset_path)
+    return {key: list(value) for key, value in all_datasets.items()}
+
+
+def is_iterable_dataset(dataset: str) -> bool:
+    """
+    whether the dataset is read sequentially (iterable-style), e.g. `ShardDataset`
+    """
+    return dataset in SHARD_DATASET
 
 
 def get_base_dataset(dataset: str, dataset_args: dict = {}):
+    if not _scanned:
+        _scan_dvc_dataset(_default_dataset_path)
+    if dataset in lazy_datasets:
+        module, path = lazy_datasets[dataset]
+        register_dvc_dataset(module, path=path, strict=True)
     flatten_datasets = [
         dataset for sublist in all_datasets.values() for dataset in sublist]
     if not dataset in flatten_datasets:
@@ -112,13 +225,13 @@ def get_base_dataset(dataset: str, dataset_args: dict = {}):
             dataset, pp.pformat(all_datasets)))
     for py_module, datasets in supported_dataset.items():
         if dataset in datasets:
-            if py_module is torchvision.datasets:
+            if py_module == 'torchvision.datasets':
                 dataset = create_torchvision_dataset(dataset, dataset_args)
                 return dataset
+            elif py_module == 'shard':
+                return create_shard_dataset(dataset, dataset_args)
+            elif py_module == 'materialized':
+                return create_materialized_dataset(dataset, dataset_args)
             else:
                 return py_module.create_dataset(**dataset_args)
     raise RuntimeError("unexpected error")
-
-
-# automatically scans for available datasets in default dataset
-_scan_dvc_dataset(_default_dataset_path)
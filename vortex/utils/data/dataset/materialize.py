@@ -0,0 +1,189 @@
+import json
+import random
+import numpy as np
+
+from pathlib import Path
+from typing import Union
+
+__all__ = [
+    'MATERIALIZED_DATASET',
+    'MaterializedDataset',
+    'create_materialized_dataset',
+    'materialize_epochs',
+]
+
+MATERIALIZED_DATASET = [
+    'MaterializedDataset',
+]
+
+META_FILE = 'materialized.json'
+IMAGES_FILE = 'images.npy'
+TARGETS_FILE = 'targets.npy'
+OFFSETS_FILE = 'offsets.npy'
+
+
+def _identity(sample):
+    return sample
+
+
+def _sample_seed(seed: int, epoch: int, index: int) -> int:
+    ## mixed, so different seeds don't give shifted overlapping streams
+    return int(np.random.SeedSequence((seed, epoch, index)).generate_state(1)[0])
+
+
+class _SeededEpochDataset:
+    """Augmented sample of (epoch, index), with python and numpy random state seeded from both,
+    so the output doesn't depend on the dataloader worker computing it
+    """
+
+    def __init__(self, dataset, epoch: int, seed: int):
+        self.dataset = dataset
+        self.epoch = epoch
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index: int):
+        sample_seed = _sample_seed(self.seed, self.epoch, index)
+        random.seed(sample_seed)
+        np.random.seed(sample_seed)
+        # Recent albumentations versions draw from their own generator instead of global random state
+        for augment in self.dataset.augments or []:
+            compose = getattr(augment, 'compose', None)
+            if hasattr(compose, 'set_random_seed'):
+                compose.set_random_seed(sample_seed)
+        image, target = self.dataset._get_raw_item(index, self.dataset._get_base_item(index))
+        return np.ascontiguousarray(image, dtype=np.uint8), np.asarray(target)
+
+
+class MaterializedDataset:
+    """Replay augmented epochs written by `materialize_epochs` from memory-mapped arrays,
+    images are already augmented and letterboxed, no decoding is needed
+
+    Training epoch `e` reads materialized epoch `e % epochs`, set with `set_epoch`
+    (called by the training pipeline at the start of each epoch).
+
+    Args:
+        root (str): directory of the materialized epochs
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        meta_file = self.root / META_FILE
+        if not meta_file.is_file():
+            raise RuntimeError("materialized dataset metadata '%s' not found, create it with 'materialize_epochs'" % meta_file)
+        with open(str(meta_file)) as f:
+            meta = json.load(f)
+        self.class_names = meta['class_names']
+        self.data_format = meta['data_format']
+        self.epochs = meta['epochs']
+        self.n_samples = meta['n_samples']
+        self.target_dtype = np.dtype(meta['target_dtype'])
+        self.target_ndim = meta['target_ndim']
+        self.epoch = 0
+        self._images, self._targets, self._offsets = None, None, None
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch % self.epochs
+
+    def _load(self):
+        # Memory maps are opened lazily so the dataset is cheap to send to dataloader workers
+        if self._images is None:
+            self._images = np.load(str(self.root / IMAGES_FILE), mmap_mode='r')
+            self._targets = np.load(str(self.root / TARGETS_FILE), mmap_mode='r')
+            self._offsets = np.load(str(self.root / OFFSETS_FILE))
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, index: int):
+        self._load()
+        position = self.epoch * self.n_samples + index
+        image = np.array(self._images[position])
+        target = self._targets[self._offsets[position]:self._offsets[position + 1]].astype(self.target_dtype)
+        if self.target_ndim == 1:
+            target = target.reshape(-1)
+        return image, target
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'], state['_targets'], state['_offsets'] = None, None, None
+        return state
+
+
+def create_materialized_dataset(dataset: str, dataset_args: dict):
+    if dataset not in MATERIALIZED_DATASET:
+        raise RuntimeError("Materialized dataset '%s' is not supported, available %s" % (dataset, MATERIALIZED_DATASET))
+    return MaterializedDataset(**dataset_args)
+
+
+def materialize_epochs(dataset, output_dir: Union[str, Path], epochs: int, seed: int = 0,
+                       num_workers: int = 0):
+    """Run the per-sample augmentation and letterbox of training `DatasetWrapper` offline for `epochs` epochs
+    with deterministic seeds, and write the uint8 images and targets to memory-mapped arrays
+    readable by `MaterializedDataset`
+
+    Output is the same for the same dataset, augmentations and `seed`, independent of `num_workers`.
+
+    Args:
+        dataset (DatasetWrapper): training dataset, with square `input_size` (no aspect ratio bucketing)
+        output_dir (Union[str,Path]): output directory
+        epochs (int): number of augmented epochs to materialize
+        seed (int, optional): random seed. Defaults to 0.
+        num_workers (int, optional): number of dataloader worker processes used for augmentation. Defaults to 0.
+
+    Returns:
+        Path: output directory
+    """
+    from torch.utils.data import DataLoader
+    if not isinstance(epochs, int) or epochs < 1:
+        raise RuntimeError("'epochs' must be a positive int, found %s" % epochs)
+    if dataset.bucket_ids is not None:
+        raise RuntimeError("materialized epochs doesn't support 'aspect_ratio_bucket'")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    n_samples = len(dataset)
+    size = dataset.preprocess_args.input_size
+    images = np.lib.format.open_memmap(str(output_dir / IMAGES_FILE), mode='w+',
+        dtype=np.uint8, shape=(epochs * n_samples, size, size, 3))
+    targets, offsets = [], [0]
+    target_dtype, target_ndim = None, None
+    for epoch in range(epochs):
+        loader = DataLoader(_SeededEpochDataset(dataset, epoch, seed), batch_size=None,
+            num_workers=num_workers, collate_fn=_identity)
+        for index, (image, target) in enumerate(loader):
+            images[epoch * n_samples + index] = image
+            if target_ndim is None:
+                target_ndim = target.ndim
+            elif target.ndim != target_ndim:
+                raise RuntimeError("materialized epochs expects targets of the same number of dimension, "
+                                   "found %s and %s at sample %s" % (target_ndim, target.ndim, index))
+            ## dtype of empty target (e.g. image without object) is not meaningful
+            if target.size:
+                if target_dtype is None:
+                    target_dtype = target.dtype
+                elif target.dtype != target_dtype:
+                    raise RuntimeError("materialized epochs expects targets of the same dtype, "
+                                       "found %s and %s at sample %s" % (target_dtype, target.dtype, index))
+            ## rows of 2-dimensional target (e.g. bounding boxes, possibly none), or a single row
+            targets.append(target.astype(np.float32).reshape(-1, target.shape[-1]) if target.ndim > 1
+                           else target.astype(np.float32).reshape(1, -1))
+            offsets.append(offsets[-1] + targets[-1].shape[0])
+    images.flush()
+    del images
+    np.save(str(output_dir / TARGETS_FILE), np.concatenate(targets, axis=0))
+    np.save(str(output_dir / OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    meta = {
+        'class_names': list(dataset.dataset.class_names),
+        'data_format': dict(dataset.data_format),
+        'epochs': epochs,
+        'n_samples': n_samples,
+        'input_size': size,
+        'seed': seed,
+        'target_dtype': str(target_dtype if target_dtype is not None else np.dtype(np.float32)),
+        'target_ndim': target_ndim,
+    }
+    with open(str(output_dir / META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return output_dir
@@ -0,0 +1,270 @@
+import io
+import os
+import json
+import random
+import tarfile
+import warnings
+import numpy as np
+
+from pathlib import Path
+from typing import Union, List
+
+__all__ = [
+    'SHARD_DATASET',
+    'ShardDataset',
+    'create_shard_dataset',
+    'write_shards',
+]
+
+SHARD_DATASET = [
+    'ShardDataset',
+]
+
+META_FILE = 'shards.json'
+TARGET_EXTENSIONS = ['.npy', '.json']
+
+
+def _get_rank():
+    """Rank and world size of distributed training, from `torch.distributed` or `RANK` and `WORLD_SIZE` variables"""
+    import torch.distributed as dist
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return int(os.environ.get('RANK', 0)), int(os.environ.get('WORLD_SIZE', 1))
+
+
+def _random(entropy) -> random.Random:
+    """Random generator of well mixed seed from tuple of int `entropy`, e.g. (seed, epoch)"""
+    return random.Random(int(np.random.SeedSequence(entropy).generate_state(1)[0]))
+
+
+def _decode_sample(image_bytes: bytes, target_bytes: bytes, target_ext: str):
+    import cv2
+    ## decoded to 3 channels BGR, same as image file read by `DatasetWrapper`
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if target_ext == '.json':
+        target = np.asarray(json.loads(target_bytes.decode('utf-8')))
+    else:
+        target = np.load(io.BytesIO(target_bytes))
+    return image, target
+
+
+def _iter_tar_samples(path: str):
+    """Sequentially read (key, image bytes, target bytes, target extension) from tar shard,
+    members of the same sample are expected to be adjacent
+    """
+    key, image_bytes, target_bytes, target_ext = None, None, None, None
+    with tarfile.open(path, mode='r|') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            member_key, ext = os.path.splitext(member.name)
+            if member_key != key:
+                if image_bytes is not None and target_bytes is not None:
+                    yield key, image_bytes, target_bytes, target_ext
+                key, image_bytes, target_bytes, target_ext = member_key, None, None, None
+            data = tar.extractfile(member).read()
+            if ext.lower() in TARGET_EXTENSIONS:
+                target_bytes, target_ext = data, ext.lower()
+            else:
+                image_bytes = data
+    if image_bytes is not None and target_bytes is not None:
+        yield key, image_bytes, target_bytes, target_ext
+
+
+class ShardDataset:
+    """Iterable dataset reading samples sequentially from local tar shards, created by `write_shards`
+
+    Each sample is stored in a shard as adjacent image file (any format decodable by OpenCV)
+    and target file (`.npy` or `.json`) sharing the same key. Dataset `class_names`, `data_format`
+    and shard list are read from `shards.json` in `root`.
+
+    When iterated, shards are split across distributed ranks then across dataloader workers,
+    so every sample is read once per epoch; shard order is shuffled and samples go through
+    a shuffle buffer of `shuffle_buffer` samples. Random access by `__getitem__` is also
+    supported (e.g. for validation), using an index of the shards members built on first
+    access; `__len__` and `__getitem__` cover every shard regardless of the rank, `rank_len`
+    is the number of samples iterated on this rank.
+
+    Args:
+        root (str): directory containing the shards and `shards.json`
+        shuffle_buffer (int): size of shuffle buffer, 0 to read in stored order. Defaults to 0.
+        seed (int): random seed for shard order and shuffle buffer, combined with epoch (see `set_epoch`)
+            or dataloader worker seed. Defaults to 0.
+    """
+    iterable = True
+
+    def __init__(self, root: Union[str, Path], shuffle_buffer: int = 0, seed: int = 0):
+        self.root = Path(root)
+        meta_file = self.root / META_FILE
+        if not meta_file.is_file():
+            raise RuntimeError("shard dataset metadata '%s' not found, create the shards with 'write_shards'" % meta_file)
+        with open(str(meta_file)) as f:
+            meta = json.load(f)
+        if not isinstance(shuffle_buffer, int) or shuffle_buffer < 0:
+            raise RuntimeError("ShardDataset 'shuffle_buffer' must be a non-negative int, found %s" % shuffle_buffer)
+        self.class_names = meta['class_names']
+        self.data_format = meta['data_format']
+        self.shards = [str(self.root / shard['name']) for shard in meta['shards']]
+        self.counts = [shard['count'] for shard in meta['shards']]
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        self._index, self._tars, self._tars_pid = None, None, None
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _rank_shards(self):
+        rank, world_size = _get_rank()
+        if len(self.shards) < world_size:
+            warnings.warn("number of shards (%s) is less than world size (%s), some rank will be idle" % (
+                len(self.shards), world_size))
+        return list(range(len(self.shards)))[rank::world_size]
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def rank_len(self):
+        return sum(self.counts[i] for i in self._rank_shards())
+
+    def __iter__(self):
+        import torch.utils.data
+        shards = self._rank_shards()
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None:
+            shards = shards[worker_info.id::worker_info.num_workers]
+            ## worker seed changes on every dataloader iteration
+            rng = _random((self.seed, worker_info.seed))
+        else:
+            rng = _random((self.seed, self.epoch))
+        if self.shuffle_buffer:
+            rng.shuffle(shards)
+        buffer = []
+        for shard in shards:
+            for _, image_bytes, target_bytes, target_ext in _iter_tar_samples(self.shards[shard]):
+                sample = _decode_sample(image_bytes, target_bytes, target_ext)
+                if not self.shuffle_buffer:
+                    yield sample
+                    continue
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(sample)
+                    continue
+                index = rng.randrange(len(buffer))
+                yield buffer[index]
+                buffer[index] = sample
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield sample
+
+    def _build_index(self):
+        self._index = []
+        for shard, path in enumerate(self.shards):
+            members = {}
+            with tarfile.open(path, mode='r') as tar:
+                for member in tar.getmembers():
+                    if member.isfile():
+                        key, ext = os.path.splitext(member.name)
+                        members.setdefault(key, {})[ext.lower()] = member
+            for key in sorted(members):
+                target_ext = next((ext for ext in members[key] if ext in TARGET_EXTENSIONS), None)
+                image_ext = next((ext for ext in members[key] if ext not in TARGET_EXTENSIONS), None)
+                if target_ext is None or image_ext is None:
+                    raise RuntimeError("malformed shard '%s', sample '%s' expects an image and a target file (%s), "
+                                       "found %s" % (path, key, ', '.join(TARGET_EXTENSIONS), list(members[key])))
+                self._index.append((shard, members[key][image_ext], members[key][target_ext], target_ext))
+
+    def _get_tar(self, shard: int):
+        # File handles are not shared across processes
+        if self._tars is None or self._tars_pid != os.getpid():
+            self._tars, self._tars_pid = {}, os.getpid()
+        if shard not in self._tars:
+            self._tars[shard] = tarfile.open(self.shards[shard], mode='r')
+        return self._tars[shard]
+
+    def __getitem__(self, index: int):
+        if self._index is None:
+            self._build_index()
+        shard, image_member, target_member, target_ext = self._index[index]
+        tar = self._get_tar(shard)
+        image_bytes = tar.extractfile(image_member).read()
+        target_bytes = tar.extractfile(target_member).read()
+        return _decode_sample(image_bytes, target_bytes, target_ext)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tars'], state['_tars_pid'] = None, None
+        return state
+
+
+def create_shard_dataset(dataset: str, dataset_args: dict):
+    if dataset not in SHARD_DATASET:
+        raise RuntimeError("Shard dataset '%s' is not supported, available %s" % (dataset, SHARD_DATASET))
+    return ShardDataset(**dataset_args)
+
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name=name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_shards(dataset, output_dir: Union[str, Path], samples_per_shard: int = 1000,
+                 prefix: str = 'shard') -> List[str]:
+    """Convert map-style base dataset (e.g. from `get_base_dataset`) to tar shards readable by `ShardDataset`
+
+    Image given as file path is stored as is, image array (or PIL Image) is stored as lossless PNG,
+    target is stored as `.npy`.
+
+    Args:
+        dataset: base dataset returning (image, target), with `class_names` and `data_format`
+        output_dir (Union[str,Path]): output directory of shards and `shards.json`
+        samples_per_shard (int, optional): number of samples in each shard. Defaults to 1000.
+        prefix (str, optional): shard file name prefix. Defaults to 'shard'.
+
+    Returns:
+        List[str]: path of created shards
+    """
+    import cv2
+    if not isinstance(samples_per_shard, int) or samples_per_shard < 1:
+        raise RuntimeError("'samples_per_shard' must be a positive int, found %s" % samples_per_shard)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    n_samples = len(dataset)
+    n_digits = max(len(str(n_samples)), 6)
+    shards = []
+    tar = None
+    for index in range(n_samples):
+        if index % samples_per_shard == 0:
+            if tar is not None:
+                tar.close()
+            name = '{}-{:06d}.tar'.format(prefix, len(shards))
+            shards.append({'name': name, 'count': 0})
+            tar = tarfile.open(str(output_dir / name), mode='w')
+        image, target = dataset[index]
+        if isinstance(image, (str, Path)):
+            ext = Path(image).suffix.lower()
+            with open(str(image), 'rb') as f:
+                image_bytes = f.read()
+        else:
+            ok, encoded = cv2.imencode('.png', np.asarray(image))
+            if not ok:
+                raise RuntimeError("failed to encode image of sample %s" % index)
+            ext, image_bytes = '.png', encoded.tobytes()
+        if isinstance(target, int):
+            target = np.array([target])
+        target_buffer = io.BytesIO()
+        np.save(target_buffer, np.asarray(target))
+        key = '{:0{}d}'.format(index, n_digits)
+        _add_member(tar, key + ext, image_bytes)
+        _add_member(tar, key + '.npy', target_buffer.getvalue())
+        shards[-1]['count'] += 1
+    if tar is not None:
+        tar.close()
+    meta = {
+        'class_names': list(dataset.class_names),
+        'data_format': dict(dataset.data_format),
+        'shards': shards,
+    }
+    with open(str(output_dir / META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return [str(output_dir / shard['name']) for shard in shards]
@@ -0,0 +1,122 @@
+import numpy as np
+from easydict import EasyDict
+from typing import Union, List
+
+KNOWN_SUBSET_ARGS = ['fraction', 'count', 'seed']
+
+
+def check_subset_args(subset: Union[EasyDict, dict]):
+    """Check and normalize dataset `subset` config
+
+    Args:
+        subset (Union[EasyDict, dict]): subset config, contains either `fraction` (float in (0,1]) or
+            `count` (int > 0), and optional `seed` (int, default 0)
+
+    Returns:
+        EasyDict: normalized subset config
+    """
+    subset = EasyDict(subset)
+    if not all([key in KNOWN_SUBSET_ARGS for key in subset]):
+        raise RuntimeError("Unknown dataset 'subset' argument! Known arguments = %s, found %s" % (
+            KNOWN_SUBSET_ARGS, list(subset.keys())))
+    fraction = subset.get('fraction', None)
+    count = subset.get('count', None)
+    if (fraction is None) == (count is None):
+        raise RuntimeError("Dataset 'subset' expects exactly one of 'fraction' or 'count', found %s" % dict(subset))
+    if fraction is not None and not (0. < float(fraction) <= 1.):
+        raise RuntimeError("Dataset 'subset' 'fraction' must be in range (0, 1], found %s" % fraction)
+    if count is not None and (not isinstance(count, int) or count < 1):
+        raise RuntimeError("Dataset 'subset' 'count' must be a positive int, found %s" % count)
+    if 'seed' not in subset:
+        subset.seed = 0
+    return subset
+
+
+def _class_label_from_target(target, data_format: EasyDict):
+    if isinstance(target, int):
+        return target
+    target = np.asarray(target)
+    if target.size == 1:
+        return int(target.flatten()[0])
+    class_label = data_format.get('class_label', None)
+    if class_label is None:
+        raise RuntimeError("Unable to deduce class label for stratified subset from target of shape %s" % str(target.shape))
+    return int(np.take(target, class_label.indices, axis=class_label.axis).flatten()[0])
+
+
+def get_class_labels(dataset, data_format: EasyDict) -> np.ndarray:
+    """Collect per-sample class labels of a classification dataset
+
+    Label arrays already held by the dataset (e.g. torchvision `targets` or `labels`) are
+    used directly; otherwise the dataset is iterated once, which for path-based datasets
+    does not decode any image.
+    """
+    candidates = [dataset]
+    if hasattr(dataset, 'dataset'):
+        candidates.append(dataset.dataset)
+    for candidate in candidates:
+        for attr in ['targets', 'labels']:
+            labels = getattr(candidate, attr, None)
+            if labels is not None and len(labels) == len(dataset):
+                return np.asarray(labels).astype(np.int64).flatten()
+    labels = [_class_label_from_target(dataset[i][1], data_format) for i in range(len(dataset))]
+    return np.asarray(labels, dtype=np.int64)
+
+
+def create_subset_indices(dataset, data_format: EasyDict, fraction: float = None,
+                          count: int = None, seed: int = 0) -> List[int]:
+    """Create deterministic subset indices of a dataset
+
+    Classification dataset (no `bounding_box` in `data_format`) is stratified by class label,
+    so each class keeps (approximately) the same proportion as in the full dataset.
+    Detection dataset is sampled uniformly per image.
+
+    Args:
+        dataset: map-style dataset, returning (image, target) pair
+        data_format (EasyDict): dataset data format
+        fraction (float, optional): fraction of dataset to be taken. Defaults to None.
+        count (int, optional): number of samples to be taken. Defaults to None.
+        seed (int, optional): random seed for sampling. Defaults to 0.
+
+    Returns:
+        List[int]: sorted subset indices
+    """
+    n_data = len(dataset)
+    n_subset = int(round(fraction * n_data)) if count is None else count
+    n_subset = max(1, min(n_subset, n_data))
+    rng = np.random.RandomState(seed)
+    if n_subset == n_data:
+        return list(range(n_data))
+    if 'bounding_box' in data_format:
+        indices = rng.choice(n_data, size=n_subset, replace=False)
+        return sorted(indices.tolist())
+
+    labels = get_class_labels(dataset, data_format)
+    classes, class_counts = np.unique(labels, return_counts=True)
+    # Largest remainder allocation, keep at least one sample per class when possible
+    quota = class_counts * (n_subset / n_data)
+    n_per_class = np.floor(quota).astype(np.int64)
+    if n_subset >= len(classes):
+        n_per_class = np.maximum(n_per_class, 1)
+    remainder = n_subset - n_per_class.sum()
+    if remainder > 0:
+        order = np.argsort(-(quota - np.floor(quota)), kind='stable')
+        for i in order:
+            if remainder == 0:
+                break
+            if n_per_class[i] < class_counts[i]:
+                n_per_class[i] += 1
+                remainder -= 1
+    elif remainder < 0:
+        order = np.argsort(-n_per_class, kind='stable')
+        for i in order:
+            if remainder == 0:
+                break
+            if n_per_class[i] > 1:
+                n_per_class[i] -= 1
+                remainder += 1
+    indices = []
+    for class_label, n_class in zip(classes, n_per_class):
+        class_indices = np.flatnonzero(labels == class_label)
+        indices.extend(rng.choice(class_indices, size=n_class, replace=False).tolist())
+    return sorted(indices)
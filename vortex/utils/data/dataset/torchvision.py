@@ -1,5 +1,4 @@
 import warnings
-import torchvision.datasets
 import inspect
 import numpy as np
 import pathlib
@@ -19,6 +18,19 @@ CLASSIFICATION_DATASET = [
 
 SUPPORTED_TORCHVISION_DATASETS = CLASSIFICATION_DATASET
 
+## dataset holding all images in memory, attribute name of (images, targets) and images layout
+IN_MEMORY_DATASET = {
+    'MNIST': ('data', 'targets', 'NHW'),
+    'FashionMNIST': ('data', 'targets', 'NHW'),
+    'KMNIST': ('data', 'targets', 'NHW'),
+    'EMNIST': ('data', 'targets', 'NHW'),
+    'QMNIST': ('data', 'targets', 'NHW'),
+    'CIFAR10': ('data', 'targets', 'NHWC'),
+    'CIFAR100': ('data', 'targets', 'NHWC'),
+    'SVHN': ('data', 'labels', 'NCHW'),
+    'STL10': ('data', 'labels', 'NCHW'),
+}
+
 
 class TorchvisionBaseDatasetWrapper():
     def __init__(self, dataset: str, dataset_args: dict):
@@ -37,6 +49,7 @@ class TorchvisionBaseDatasetWrapper():
             warnings.warn("'target_transform' argument is not supported in this implementation, to use augmentation please read Vortex documentation about data augmentation!!")
 
         # If dataset args support 'loader' params, supply loader with identity function so it return image file path
+        import torchvision.datasets
         dataset_class = getattr(torchvision.datasets, dataset)
         if 'loader' in inspect.signature(dataset_class).parameters:
             dataset_args['loader'] = lambda x: x
@@ -52,8 +65,28 @@ class TorchvisionBaseDatasetWrapper():
                 'class_label': None
             }
 
+        # Index in-memory images and targets directly instead of through PIL Image
+        self.images, self.targets = None, None
+        if dataset in IN_MEMORY_DATASET:
+            images_attr, targets_attr, layout = IN_MEMORY_DATASET[dataset]
+            images = getattr(self.dataset, images_attr, None)
+            targets = getattr(self.dataset, targets_attr, None)
+            if images is not None and targets is not None:
+                # Zero-copy view of torch tensor
+                self.images = np.asarray(images)
+                if layout == 'NCHW':
+                    self.images = self.images.transpose(0, 2, 3, 1)
+                self.targets = np.asarray(targets)
+                # QMNIST extended targets, first column is the class label
+                if self.targets.ndim > 1:
+                    self.targets = self.targets[:, 0]
+        self.in_memory = self.images is not None
+
     def __getitem__(self, index):
-        img, target = self.dataset[index]
+        if self.in_memory:
+            img, target = self.images[index], int(self.targets[index])
+        else:
+            img, target = self.dataset[index]
 
         # Handle if img returned is not the provided path
         if not isinstance(img, str):
@@ -68,6 +101,25 @@ class TorchvisionBaseDatasetWrapper():
             target = np.array([target])
         return img, target
 
+    def __getitems__(self, indices):
+        return [self[index] for index in indices]
+
+    def get_batch(self, indices):
+        """Index a batch from in-memory dataset, only available when `in_memory` is True
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: uint8 images with NHWC layout (3 channels) and targets of shape [N,1]
+        """
+        if not self.in_memory:
+            raise RuntimeError("get_batch is only available for in-memory dataset")
+        indices = np.asarray(indices)
+        images = self.images[indices]
+        # For dataset with grayscale image, convert 1-channel image to 3-channel image
+        if images.ndim == 3:
+            images = np.repeat(images[..., np.newaxis], 3, axis=-1)
+        targets = self.targets[indices].astype(np.int64)[:, np.newaxis]
+        return np.ascontiguousarray(images), targets
+
     def __len__(self):
         return len(self.dataset)
 
@@ -18,9 +18,14 @@ import warnings
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from ..augment import create_transform
 from .dataset import get_base_dataset
+from .subset import check_subset_args, create_subset_indices
+from .bucket import check_bucket_args, get_image_shape, create_bucket_shapes, AspectRatioBatchSampler
+from ..decode import read_image
+from vortex_runtime.letterbox import letterbox, letterbox_params
 
 KNOWN_DATA_FORMAT = ['class_label', 'bounding_box', 'landmarks']
 
@@ -40,11 +45,28 @@ class DatasetWrapper:
         preprocess_args (EasyDict): pre-process options for input image from config, see (###input context here).
         augments (sequence, or callable): augmentations to be applied to the output of external dataset, see (###input context here).
         annotation_name (EasyDict): (###unused), see (###input context here).
+        subset (EasyDict): optional deterministic subset of the dataset, with either `fraction` or `count`
+            and optional `seed`. Classification dataset is stratified by class, detection dataset by image.
+        aspect_ratio_bucket (EasyDict): optional aspect ratio bucketing at stage `train`, with `n_buckets`,
+            `stride` and `seed`. Images are padded to their bucket rectangular shape instead of a square
+            `input_size`, use `batch_sampler` to build batches from a single bucket.
+        decode_threads (int): number of threads used by `__getitems__` to decode and resize the images
+            of a batch concurrently, created lazily in each dataloader worker. 0 to fetch sequentially.
+
+    Batch augmentation (module `batch_augment`) is not applied per sample, it is kept at `batch_augments`
+    and the uint8 image is returned unnormalized, use `BatchAugmentCollate` to augment and normalize the batch.
+
+    For in-memory base dataset (e.g. torchvision MNIST or CIFAR) at stage `train` without per-sample
+    augmentation, `__getitems__` indexes the whole batch from the dataset arrays, then resizes and
+    normalizes it at once (`in_memory_batch`).
     """
 
     def __init__(self, dataset: str, stage: str, preprocess_args: Union[EasyDict, dict],
                  augmentations: Union[Tuple[str, dict], List, Callable] = None,
-                 dataset_args: Union[EasyDict, dict] = {}, annotation_name='bboxes'):
+                 dataset_args: Union[EasyDict, dict] = {}, annotation_name='bboxes',
+                 subset: Union[EasyDict, dict, None] = None,
+                 aspect_ratio_bucket: Union[EasyDict, dict, None] = None,
+                 decode_threads: int = 0):
 
         self.stage = stage
         self.preprocess_args = preprocess_args
@@ -58,8 +80,16 @@ class DatasetWrapper:
         # Data format standard check
         self.data_format = check_data_format_standard(self.data_format)
 
+        # Deterministic dataset subset, mapping wrapper index to base dataset index
+        self.subset_indices = None
+        if subset is not None:
+            subset = check_subset_args(subset)
+            self.subset_indices = create_subset_indices(self.dataset, self.data_format,
+                fraction=subset.get('fraction', None), count=subset.get('count', None), seed=subset.seed)
+
         # Configured computer vision augmentation initialization
         self.augments = None
+        self.batch_augments = None
         if stage == 'train' and augmentations is not None:
             self.augments = []
             if not isinstance(augmentations, List):
@@ -72,19 +102,32 @@ class DatasetWrapper:
                 tf_kwargs = module_args
                 tf_kwargs['data_format'] = self.data_format
                 augments = create_transform(module_name, **tf_kwargs)
-                self.augments.append(augments)
-        # Standardized computer vision augmentation initialization, longest resize and pad to square
-        standard_tf_kwargs = EasyDict()
-        standard_tf_kwargs.data_format = self.data_format
-        standard_tf_kwargs.transforms = [
-            {'transform': 'LongestMaxSize', 'args': {'max_size': preprocess_args.input_size}},
-            {'transform': 'PadIfNeeded', 'args': {'min_height': preprocess_args.input_size,
-                                                  'min_width': preprocess_args.input_size,
-                                                  'border_mode': cv2.BORDER_CONSTANT,
-                                                  'value': [0, 0, 0]}},
-        ]
-        self.standard_augments = create_transform(
-            'albumentations', **standard_tf_kwargs)
+                # Batch augmentation is applied after collation, see `BatchAugmentCollate`
+                if getattr(augments, 'batch_transform', False):
+                    if self.batch_augments is None:
+                        self.batch_augments = []
+                    self.batch_augments.append(augments)
+                else:
+                    self.augments.append(augments)
+        # Aspect ratio bucketing, letterbox to bucket rectangular shape instead of square
+        self.bucket_ids, self.bucket_shapes = None, None
+        if stage == 'train' and aspect_ratio_bucket is not None:
+            aspect_ratio_bucket = check_bucket_args(aspect_ratio_bucket)
+            self.bucket_seed = aspect_ratio_bucket.seed
+            image_shapes = [get_image_shape(self._get_base_item(index)[0]) for index in range(len(self))]
+            self.bucket_ids, self.bucket_shapes = create_bucket_shapes(image_shapes,
+                preprocess_args.input_size, n_buckets=aspect_ratio_bucket.n_buckets,
+                stride=aspect_ratio_bucket.stride)
+
+        # In-memory batch fast path, see `_get_batch`
+        self.in_memory_batch = stage == 'train' and getattr(self.dataset, 'in_memory', False) \
+            and not self.augments and self.bucket_ids is None
+
+        # Thread pool for batch fetch, see `__getitems__`
+        if not isinstance(decode_threads, int) or decode_threads < 0:
+            raise RuntimeError("Dataset 'decode_threads' must be a non-negative int, found %s" % decode_threads)
+        self.decode_threads = decode_threads
+        self._executor, self._executor_pid = None, None
 
         self.preprocess_args = preprocess_args
         self.annotation_name = annotation_name
@@ -95,15 +138,115 @@ class DatasetWrapper:
             assert isinstance(self.preprocess_args.input_size, int)
 
     def __len__(self):
+        if self.subset_indices is not None:
+            return len(self.subset_indices)
         return len(self.dataset)
 
+    def _get_base_item(self, index: int):
+        if self.subset_indices is not None:
+            index = self.subset_indices[index]
+        return self.dataset[index]
+
+    def batch_sampler(self, batch_size: int, shuffle: bool = True, drop_last: bool = False):
+        """Create batch sampler grouping samples of the same aspect ratio bucket,
+        only available when `aspect_ratio_bucket` is configured
+        """
+        if self.bucket_ids is None:
+            raise RuntimeError("batch_sampler requires 'aspect_ratio_bucket' to be configured")
+        return AspectRatioBatchSampler(self.bucket_ids, batch_size=batch_size,
+            shuffle=shuffle, drop_last=drop_last, seed=self.bucket_seed)
+
+    def set_epoch(self, epoch: int):
+        """Forward training epoch to epoch-dependent base dataset, e.g. `MaterializedDataset`"""
+        if hasattr(self.dataset, 'set_epoch'):
+            self.dataset.set_epoch(epoch)
+
+    @property
+    def batch_fetch(self):
+        """Whether the dataloader should fetch whole batch indices with `__getitems__`"""
+        return bool(self.decode_threads) or self.in_memory_batch
+
+    def _get_executor(self):
+        # Thread pool is not shared across processes, create one in each dataloader worker
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.decode_threads)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'], state['_executor_pid'] = None, None
+        return state
+
+    def __getitems__(self, indices: List[int]):
+        """Fetch a batch of samples, images are decoded and resized concurrently
+        in a thread pool of `decode_threads` (OpenCV releases the GIL)
+        """
+        base_indices = indices
+        if self.subset_indices is not None:
+            base_indices = [self.subset_indices[index] for index in indices]
+        if self.in_memory_batch:
+            return self._get_batch(base_indices)
+        if hasattr(self.dataset, '__getitems__'):
+            base_items = self.dataset.__getitems__(base_indices)
+        else:
+            base_items = [self.dataset[index] for index in base_indices]
+        if self.decode_threads and len(indices) > 1:
+            return list(self._get_executor().map(self._get_item, indices, base_items))
+        return [self._get_item(index, item) for index, item in zip(indices, base_items)]
+
+    def _get_batch(self, base_indices: List[int]):
+        """Letterbox and normalize a batch of in-memory dataset images with batched tensor operations"""
+        images, targets = self.dataset.get_batch(base_indices)
+        images = torch.from_numpy(images)
+        size = (self.preprocess_args.input_size, self.preprocess_args.input_size)
+        _, (offset_x, offset_y), (width, height) = letterbox_params(images.shape[1:3], size)
+        input_normalization = self.preprocess_args.input_normalization
+        if 'scaler' not in input_normalization:
+            input_normalization.scaler = 255
+        # NHWC uint8 to NCHW float, kept as uint8 when no resize is needed for batch augmentation
+        if self.batch_augments is None:
+            images = to_tensor(images, scaler=input_normalization.scaler)
+        elif (height, width) != tuple(images.shape[1:3]):
+            images = images.permute(0, 3, 1, 2).float()
+        else:
+            images = images.permute(0, 3, 1, 2)
+        if (height, width) != tuple(images.shape[2:]):
+            images = torch.nn.functional.interpolate(images, size=(height, width),
+                mode='bilinear', align_corners=False)
+        if (height, width) != size:
+            images = torch.nn.functional.pad(images, (offset_x, size[1] - width - offset_x,
+                offset_y, size[0] - height - offset_y))
+        if self.batch_augments is None:
+            images = normalize(images, input_normalization.mean, input_normalization.std)
+        else:
+            # Keep uint8 image with HWC layout, normalized after batch augmentation
+            if images.is_floating_point():
+                images = images.round_().clamp_(0, 255).to(torch.uint8)
+            images = images.permute(0, 2, 3, 1).contiguous()
+        return list(zip(images, torch.from_numpy(targets)))
+
     def __getitem__(self, index: int):
-        image, target = self.dataset[index]
+        if isinstance(index, (list, tuple)):
+            return self.__getitems__(index)
+        return self._get_item(index, self._get_base_item(index))
+
+    def _get_raw_item(self, index: int, base_item: tuple):
+        """Decode, augment and letterbox a sample, returning uint8 image and target numpy array before normalization"""
+        image, target = base_item
+        # Letterbox size, square or aspect ratio bucket shape
+        if self.bucket_ids is not None:
+            size = tuple(self.bucket_shapes[self.bucket_ids[index]])
+        else:
+            size = (self.preprocess_args.input_size, self.preprocess_args.input_size)
         # Currently support decoding image file provided it's string path using OpenCV (BGR format), for future roadmap if using another decoder
         if isinstance(image, str):
             if not Path(image).is_file():
                 raise RuntimeError("Image file at '%s' not found!! Please check!" % (image))
-            image = cv2.imread(image)
+            # Reduced resolution JPEG decode when nothing but letterbox is applied on pixels,
+            # targets are relative to image size hence unchanged
+            has_augments = self.stage == 'train' and self.augments is not None
+            image, _ = read_image(image, size=None if has_augments else size)
 
         # If dataset is PIL Image, convert to numpy array, support for torchvision dataset
         elif isinstance(image, PIL.Image.Image):
@@ -140,7 +283,10 @@ class DatasetWrapper:
                     raise RuntimeError("The configured augmentations resulting in 0 shape target!! Please check your augmentation and avoid this!!")
         if not isinstance(image, PIL.Image.Image) and not isinstance(image, np.ndarray):
             raise RuntimeError('Expected augmentation output in PIL.Image.Image or numpy.ndarray format, got %s ' % type(image))
-        if (np.all(image >= 0.) and np.all(image <= 1.)) or isinstance(image, torch.Tensor):
+        if isinstance(image, PIL.Image.Image):
+            image = np.array(image)
+        # Single scan for the common case, unnormalized image has pixel value above 1
+        if image.max() <= 1. and image.min() >= 0.:
             pixel_min, pixel_max = np.min(image), np.max(image)
             if pixel_min == 0. and pixel_max == 0.:
                 raise RuntimeError('Augmentation image output producing blank image ( all pixel value == 0 ), please check and visualize your augmentation process!!')
@@ -148,8 +294,19 @@ class DatasetWrapper:
                 raise RuntimeError('Augmentation image output expect unnormalized pixel value (0-255), got min %2.2f and max %2.2f' % (pixel_min, pixel_max))
         # Configured computer vision augment -- END
         # Standard computer vision augment -- START
-        image, target = self.standard_augments(image, target)
-        if self.stage == 'train':
+        # Longest resize and pad to square (or bucket shape), with a single affine warp
+        image_shape, scale, offset = image.shape, 1., (0, 0)
+        if tuple(image_shape[:2]) != size:
+            image, scale, offset = letterbox(image, size)
+        target = letterbox_targets(target, self.data_format, image_shape, size, scale, offset)
+        return image, target
+
+    def _get_item(self, index: int, base_item: tuple):
+        image, target = self._get_raw_item(index, base_item)
+        if self.stage == 'train' and self.batch_augments is not None:
+            # Keep uint8 image, normalized after batch augmentation
+            image = torch.from_numpy(np.ascontiguousarray(image))
+        elif self.stage == 'train':
             input_normalization = self.preprocess_args.input_normalization
             if 'scaler' not in input_normalization:
                 input_normalization.scaler=255
@@ -169,6 +326,33 @@ class DatasetWrapper:
         return data
 
 
+class IterableDatasetWrapper(DatasetWrapper, torch.utils.data.IterableDataset):
+    """ Wrapper for iterable base dataset (e.g. `ShardDataset`), samples are read sequentially from the base
+    dataset and go through the same augmentation and preprocess as `DatasetWrapper`.
+
+    Shuffling is done by the base dataset, `subset`, `aspect_ratio_bucket` and `decode_threads`
+    are not supported as they require random access.
+    """
+
+    def __init__(self, *args, **kwargs):
+        for option in ['subset', 'aspect_ratio_bucket']:
+            if kwargs.get(option, None) is not None:
+                raise RuntimeError("'%s' is not supported by iterable dataset" % option)
+        if kwargs.get('decode_threads', 0):
+            raise RuntimeError("'decode_threads' is not supported by iterable dataset")
+        super().__init__(*args, **kwargs)
+
+    def __len__(self):
+        ## number of samples iterated on this rank, e.g. split of shards across distributed ranks
+        if hasattr(self.dataset, 'rank_len'):
+            return self.dataset.rank_len()
+        return len(self.dataset)
+
+    def __iter__(self):
+        for index, base_item in enumerate(self.dataset):
+            yield self._get_item(index, base_item)
+
+
 def check_data_format_standard(data_format: EasyDict):
     def _convert_indices_to_list(indices: EasyDict):
         '''
@@ -238,6 +422,32 @@ def check_data_format_standard(data_format: EasyDict):
         raise RuntimeError('Empty data_format dictionary! Please check!')
 
 
+def letterbox_targets(target: np.ndarray, data_format: EasyDict, image_shape: Tuple[int, int],
+                      size: Tuple[int, int], scale: float, offset: Tuple[int, int]):
+    """Map relative bounding box and landmarks coordinates to letterboxed image of (height, width) `size`
+    """
+    if not ('bounding_box' in data_format or 'landmarks' in data_format):
+        return target
+    height, width = image_shape[:2]
+    target = target.astype('float32')
+    ## relative coordinate on letterboxed image = (relative * image size * scale + offset) / letterbox size
+    if 'bounding_box' in data_format:
+        x, y, w, h = data_format.bounding_box.indices
+        axis = data_format.bounding_box.axis
+        gain_x, gain_y = width * scale / size[1], height * scale / size[0]
+        boxes = np.take(target, [x, y, w, h], axis=axis)
+        boxes *= np.array([gain_x, gain_y, gain_x, gain_y], dtype=np.float32)
+        boxes[:, 0:2] += np.array([offset[0] / size[1], offset[1] / size[0]], dtype=np.float32)
+        np.put_along_axis(target, values=boxes, indices=np.array([x, y, w, h])[np.newaxis, :], axis=axis)
+    if 'landmarks' in data_format:
+        indices, axis = data_format.landmarks.indices, data_format.landmarks.axis
+        gain = np.tile([width * scale / size[1], height * scale / size[0]], len(indices) // 2).astype(np.float32)
+        shift = np.tile([offset[0] / size[1], offset[1] / size[0]], len(indices) // 2).astype(np.float32)
+        landmarks = np.take(target, indices, axis=axis) * gain + shift
+        np.put_along_axis(target, values=landmarks, indices=np.array(indices)[np.newaxis, :], axis=axis)
+    return target
+
+
 def check_and_fix_coordinates(image: np.ndarray, target: np.ndarray, data_format: EasyDict):
     # Check bounding box coordinates
     if 'bounding_box' in data_format:
@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+import PIL.Image
+
+from pathlib import Path
+from typing import Union, Tuple, Iterator
+
+__all__ = [
+    'get_reduced_factor',
+    'read_image',
+    'read_video',
+    'video_fps',
+]
+
+REDUCED_EXTENSIONS = ['.jpg', '.jpeg', '.jpe']
+
+## reduced decode factor -> OpenCV read flag, largest first
+REDUCED_READ_MODES = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+def get_reduced_factor(image_shape: Tuple[int, int], size: Tuple[int, int]) -> int:
+    """Largest reduced decode factor which still leaves the image at or above
+    its letterboxed size inside (height, width) `size`, 1 if no reduction is possible
+
+    Args:
+        image_shape (Tuple[int,int]): (height, width) of the full resolution image
+        size (Tuple[int,int]): (height, width) of the resized image
+
+    Returns:
+        int: decode factor, one of 8, 4, 2 or 1
+    """
+    height, width = image_shape[:2]
+    scale = min(size[0] / height, size[1] / width)
+    resized_height, resized_width = height * scale, width * scale
+    for factor, _ in REDUCED_READ_MODES:
+        if height // factor >= resized_height and width // factor >= resized_width:
+            return factor
+    return 1
+
+
+def read_image(path: Union[str, Path], size: Union[Tuple[int, int], None] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Decode image file in BGR format; for JPEG file and given target `size`, decode at reduced resolution
+    using the largest `IMREAD_REDUCED_*` factor which keeps the image at or above the target size
+
+    Args:
+        path (Union[str,Path]): image file path
+        size (Tuple[int,int], optional): (height, width) the image will be resized to. Defaults to None, full decode.
+
+    Returns:
+        Tuple[np.ndarray, Tuple[int,int]]: decoded image and (height, width) of the full resolution image
+    """
+    path = str(path)
+    factor = 1
+    if size is not None and Path(path).suffix.lower() in REDUCED_EXTENSIONS:
+        try:
+            ## only the file header is read
+            with PIL.Image.open(path) as image:
+                width, height = image.size
+            ## decoder applies EXIF orientation, consider both orientation
+            factor = min(get_reduced_factor((height, width), size), get_reduced_factor((width, height), size))
+        except (OSError, ValueError):
+            factor = 1
+    if factor == 1:
+        image = cv2.imread(path)
+        return image, (tuple(image.shape[:2]) if image is not None else None)
+    image = cv2.imread(path, dict(REDUCED_READ_MODES)[factor])
+    if image is None:
+        return image, None
+    ## EXIF orientation may swap height and width of decoded image
+    if abs(image.shape[0] * factor - height) > abs(image.shape[0] * factor - width):
+        height, width = width, height
+    return image, (height, width)
+
+
+def read_video(path: Union[str, Path]) -> Iterator[np.ndarray]:
+    """Decode frames of video file sequentially in BGR format, only the current frame is kept in memory
+
+    Args:
+        path (Union[str,Path]): video file path, or any source supported by `cv2.VideoCapture`
+
+    Yields:
+        np.ndarray: decoded frame
+    """
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise RuntimeError("can't open video '%s'" % path)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        capture.release()
+
+
+def video_fps(path: Union[str, Path], default: float = 30.) -> float:
+    """Frame rate of video file, `default` if it is unknown"""
+    capture = cv2.VideoCapture(str(path))
+    fps = capture.get(cv2.CAP_PROP_FPS) if capture.isOpened() else 0.
+    capture.release()
+    return fps if fps and fps > 0 else default
@@ -3,12 +3,19 @@ from easydict import EasyDict
 from vortex.utils.logger.base_logger import ExperimentLogger
 
 supported_logger = {}
+## registered logger module(s), imported on first `create_logger` call,
+## e.g. `comet_ml` is never imported when logging is disabled
+_registered_modules = []
 
 _REQUIRED_ATTRIBUTES = [
     'create_logger'
 ]
 
 def register_module(module : str) :
+    if not module in _registered_modules :
+        _registered_modules.append(module)
+
+def _import_module(module : str) :
     global supported_logger
     exec('from . import %s' %module)
     module_attributes = eval('%s' %module).__dict__.keys()
@@ -46,8 +53,10 @@ def create_logger(logger: Union[EasyDict], config: Union[EasyDict] = None, *args
 
     provider = logger.module
     provider_args = logger.args
+    if provider in _registered_modules and not provider in supported_logger:
+        _import_module(provider)
     if not provider in supported_logger:
-        raise ValueError("%s logger not supported, available : %s" %(provider, supported_logger.keys()))
+        raise ValueError("%s logger not supported, available : %s" %(provider, _registered_modules))
     logger = supported_logger[provider].create_logger(provider_args, config, **kwargs)
     return logger
 
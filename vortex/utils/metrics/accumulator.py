@@ -0,0 +1,163 @@
+import numpy as np
+
+from typing import Union, Tuple
+
+__all__ = [
+    'ClassificationAccumulator',
+]
+
+
+class ClassificationAccumulator(object):
+    """Accumulate classification ground truth, top-1 prediction and its score into preallocated arrays
+
+    The confusion matrix is updated incrementally. Per-class curves are computed with one sort
+    of the accumulated labels instead of per-class one-hot score matrices. With `curve_bins`,
+    scores are not stored per sample but counted into `curve_bins` score bins per class,
+    memory is then independent of the number of samples.
+
+    Args:
+        n_samples (int): expected number of samples, arrays grow if exceeded
+        n_classes (int, optional): number of classes, grows with the largest label found. Defaults to 0.
+        curve_bins (int, optional): number of score bins for bounded-memory curves. Defaults to None, exact curves.
+    """
+
+    def __init__(self, n_samples: int, n_classes: int = 0, curve_bins: Union[int, None] = None):
+        if curve_bins is not None and (not isinstance(curve_bins, int) or curve_bins < 1):
+            raise RuntimeError("expects `curve_bins` to be a positive int or None, got %s" % curve_bins)
+        self.curve_bins = curve_bins
+        self.n_classes = 0
+        self.count = 0
+        self.confusion = np.zeros((0, 0), dtype=np.int64)
+        if curve_bins is None:
+            capacity = max(int(n_samples), 1)
+            self.labels = np.zeros(capacity, dtype=np.int64)
+            self.predictions = np.zeros(capacity, dtype=np.int64)
+            self.scores = np.zeros(capacity, dtype=np.float64)
+        else:
+            ## [n_classes, curve_bins] score histogram of correct and wrong prediction, by ground truth class
+            self.hist_positive = np.zeros((0, curve_bins), dtype=np.int64)
+            self.hist_negative = np.zeros((0, curve_bins), dtype=np.int64)
+        self._grow_classes(n_classes)
+
+    def _grow_classes(self, n_classes: int):
+        if n_classes <= self.n_classes:
+            return
+        pad = n_classes - self.n_classes
+        self.confusion = np.pad(self.confusion, ((0, pad), (0, pad)))
+        if self.curve_bins is not None:
+            self.hist_positive = np.pad(self.hist_positive, ((0, pad), (0, 0)))
+            self.hist_negative = np.pad(self.hist_negative, ((0, pad), (0, 0)))
+        self.n_classes = n_classes
+
+    def _grow_samples(self, n_samples: int):
+        capacity = len(self.labels)
+        if n_samples <= capacity:
+            return
+        capacity = max(n_samples, 2 * capacity)
+        for name in ['labels', 'predictions', 'scores']:
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def update(self, labels, predictions, scores):
+        """Add a batch of ground truth class labels, predicted class labels and predicted scores"""
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        predictions = np.asarray(predictions, dtype=np.int64).reshape(-1)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        n = len(labels)
+        if n == 0:
+            return
+        self._grow_classes(int(max(labels.max(), predictions.max())) + 1)
+        np.add.at(self.confusion, (labels, predictions), 1)
+        if self.curve_bins is None:
+            self._grow_samples(self.count + n)
+            self.labels[self.count:self.count+n] = labels
+            self.predictions[self.count:self.count+n] = predictions
+            self.scores[self.count:self.count+n] = scores
+        else:
+            bins = np.clip((scores * self.curve_bins).astype(np.int64), 0, self.curve_bins - 1)
+            correct = labels == predictions
+            np.add.at(self.hist_positive, (labels[correct], bins[correct]), 1)
+            np.add.at(self.hist_negative, (labels[~correct], bins[~correct]), 1)
+        self.count += n
+
+    def merge(self, other: 'ClassificationAccumulator'):
+        """Add the samples accumulated by `other`, e.g. from another validation shard"""
+        if self.curve_bins != other.curve_bins:
+            raise RuntimeError("can't merge accumulator with `curve_bins` %s to %s" % (other.curve_bins, self.curve_bins))
+        self._grow_classes(other.n_classes)
+        self.confusion[:other.n_classes, :other.n_classes] += other.confusion
+        if self.curve_bins is None:
+            n = other.count
+            self._grow_samples(self.count + n)
+            self.labels[self.count:self.count+n] = other.labels[:n]
+            self.predictions[self.count:self.count+n] = other.predictions[:n]
+            self.scores[self.count:self.count+n] = other.scores[:n]
+        else:
+            self.hist_positive[:other.n_classes] += other.hist_positive
+            self.hist_negative[:other.n_classes] += other.hist_negative
+        self.count += other.count
+        return self
+
+    @property
+    def correct(self) -> int:
+        return int(np.trace(self.confusion))
+
+    @property
+    def classes(self) -> np.ndarray:
+        """Class labels found in ground truth or prediction"""
+        return np.flatnonzero(self.confusion.sum(axis=0) + self.confusion.sum(axis=1))
+
+    @property
+    def truth_classes(self) -> np.ndarray:
+        """Class labels found in ground truth"""
+        return np.flatnonzero(self.confusion.sum(axis=1))
+
+    def confusion_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ground truth, prediction, count) of non-empty confusion matrix cells,
+        usable as `y_true`, `y_pred` and `sample_weight` of sklearn metrics
+        """
+        labels, predictions = np.nonzero(self.confusion)
+        return labels, predictions, self.confusion[labels, predictions]
+
+    def curve_inputs(self):
+        """For each ground truth class, yield (class label, scores, truths, weights) of one-vs-rest curve
+        among the samples of that class : score of the predicted class is one entry, positive when
+        correct, and every other class of the sample is a zero score entry; the classes of a sample
+        are the classes found in ground truth, not `n_classes`
+
+        Yields:
+            Tuple[int,np.ndarray,np.ndarray,np.ndarray]: usable as `y_score`, `y_true` and `sample_weight`
+            of sklearn curves
+        """
+        n_classes = len(self.truth_classes)
+        if self.curve_bins is None:
+            labels = self.labels[:self.count]
+            order = np.argsort(labels, kind='stable')
+            sorted_labels = labels[order]
+            starts = np.searchsorted(sorted_labels, self.truth_classes, side='left')
+            ends = np.searchsorted(sorted_labels, self.truth_classes, side='right')
+        else:
+            centers = (np.arange(self.curve_bins) + .5) / self.curve_bins
+        for i, class_label in enumerate(self.truth_classes):
+            if self.curve_bins is None:
+                index = order[starts[i]:ends[i]]
+                scores = self.scores[index]
+                truths = self.predictions[index] == class_label
+                weights = np.ones(len(index), dtype=np.int64)
+            else:
+                positive, negative = self.hist_positive[class_label], self.hist_negative[class_label]
+                nonzero_positive, nonzero_negative = np.flatnonzero(positive), np.flatnonzero(negative)
+                scores = np.concatenate([centers[nonzero_positive], centers[nonzero_negative]])
+                truths = np.concatenate([np.ones(len(nonzero_positive), dtype=bool), np.zeros(len(nonzero_negative), dtype=bool)])
+                weights = np.concatenate([positive[nonzero_positive], negative[nonzero_negative]])
+            n_samples = int(self.confusion[class_label].sum())
+            n_wrong = n_samples - int(self.confusion[class_label, class_label])
+            ## zero score entries : the true class of wrong prediction, and the rest of the classes
+            zero_weights = np.array([n_wrong, n_samples * (n_classes - 1) - n_wrong], dtype=np.int64)
+            keep = zero_weights > 0
+            scores = np.concatenate([scores, np.zeros(2)[keep]])
+            truths = np.concatenate([truths, np.array([True, False])[keep]])
+            weights = np.concatenate([weights, zero_weights[keep]])
+            yield int(class_label), scores, truths.astype(np.int64), weights
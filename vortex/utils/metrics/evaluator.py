@@ -11,6 +11,8 @@ import enforce
 __all__ = [
     'BoundingBoxes',
     'DetectionEvaluator',
+    'StreamingDetectionEvaluator',
+    'box_iou_matrix',
     'best_match',
     'mark_bbox',
     'mark_bboxes',
@@ -274,6 +276,12 @@ class DetectionEvaluator:
         for label in labels:
             self.gt.add_box(label)
 
+    def merge(self, other: 'DetectionEvaluator'):
+        """Add the detections and labels of `other`, e.g. from another validation shard"""
+        self.bboxes.add_boxes(other.bboxes.bbox_list)
+        self.gt.add_boxes(other.gt.bbox_list)
+        return self
+
     def evaluate(self, iou_threshold: Union[float, None] = None) -> List[Dict[str, Union[float, int]]]:
         if iou_threshold is None:
             iou_threshold = self.iou_threshold
@@ -282,3 +290,175 @@ class DetectionEvaluator:
         # class_map = self.bboxes.class_map
         mean_ap /= self.gt.n_classes
         return results, mean_ap
+
+
+def _growable_append(array: np.ndarray, size: int, values: np.ndarray) -> np.ndarray:
+    """Write `values` at `array[size:]`, doubling the capacity of `array` if necessary"""
+    n = size + len(values)
+    if n > len(array):
+        grown = np.empty(max(n, 2 * len(array)), dtype=array.dtype)
+        grown[:size] = array[:size]
+        array = grown
+    array[size:n] = values
+    return array
+
+
+def box_iou_matrix(labels: np.ndarray, detections: np.ndarray) -> np.ndarray:
+    """IoU of each label (row) with each detection (column), both given as [N,4] (x, y, w, h),
+    same as `BoundingBox.intersection` / `BoundingBox.union`
+    """
+    def to_x1y1x2y2(boxes):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return boxes[:, 0], boxes[:, 1], boxes[:, 0] + boxes[:, 2], boxes[:, 1] + boxes[:, 3]
+    x1a, y1a, x2a, y2a = (v[:, None] for v in to_x1y1x2y2(labels))
+    x1b, y1b, x2b, y2b = (v[None, :] for v in to_x1y1x2y2(detections))
+    intersect = (x1a < x2b) & (x2a > x1b) & (y1a < y2b) & (y2a > y1b)
+    intersection = np.where(intersect,
+        (np.minimum(x2a, x2b) - np.maximum(x1a, x1b)) * (np.minimum(y2a, y2b) - np.maximum(y1a, y1b)), 0.)
+    union = (np.abs((x2a - x1a) * (y2a - y1a)) + np.abs((x2b - x1b) * (y2b - y1b))) - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = intersection / union
+    return np.nan_to_num(iou, nan=0.)
+
+
+class StreamingDetectionEvaluator:
+    """
+    Detection evaluator which matches detections to labels per image as they arrive,
+    only keeping (score, tp) of each detection and the number of labels per class,
+    gives the same result as `DetectionEvaluator`
+
+    With `score_bins`, scores are counted into `score_bins` bins of equal width in [0, 1] per class
+    instead, memory is then independent of the number of images and detections.
+
+    Args:
+        iou_threshold (float): minimum IoU of true positive detection. Defaults to 0.5.
+        score_bins (int, optional): number of score histogram bins. Defaults to None, exact scores.
+    """
+
+    def __init__(self, iou_threshold: float = 0.5, score_bins: Union[int, None] = None):
+        if score_bins is not None and (not isinstance(score_bins, int) or score_bins < 1):
+            raise RuntimeError("expects `score_bins` to be a positive int or None, got %s" % score_bins)
+        self.iou_threshold = iou_threshold
+        self.score_bins = score_bins
+        ## class -> number of labels, in order of first appearance
+        self.n_labels = {}
+        ## class -> [scores, tp, size] or [tp histogram, fp histogram]
+        self.detections = {}
+        self.n_images = 0
+
+    def _add(self, class_label, scores: np.ndarray, tp: np.ndarray):
+        if self.score_bins is None:
+            entry = self.detections.setdefault(class_label,
+                [np.empty(16, dtype=np.float64), np.empty(16, dtype=bool), 0])
+            entry[0] = _growable_append(entry[0], entry[2], scores)
+            entry[1] = _growable_append(entry[1], entry[2], tp)
+            entry[2] += len(scores)
+        else:
+            entry = self.detections.setdefault(class_label,
+                [np.zeros(self.score_bins, dtype=np.int64), np.zeros(self.score_bins, dtype=np.int64)])
+            bins = np.clip((scores * self.score_bins).astype(np.int64), 0, self.score_bins - 1)
+            np.add.at(entry[0], bins[tp], 1)
+            np.add.at(entry[1], bins[~tp], 1)
+
+    def update(self, detections: np.ndarray, detection_classes: np.ndarray, detection_scores: np.ndarray,
+               labels: np.ndarray, label_classes: np.ndarray):
+        """Match the detections of a single image to its labels
+
+        Each label is matched to the detection of the same class with highest IoU above `iou_threshold`,
+        unmatched detections are false positives. Detections of a class without label in the image
+        are not counted, same as `DetectionEvaluator`.
+
+        Args:
+            detections (np.ndarray): [N,4] detection boxes (x, y, w, h)
+            detection_classes (np.ndarray): [N] detection class labels
+            detection_scores (np.ndarray): [N] detection confidence scores
+            labels (np.ndarray): [M,4] ground truth boxes (x, y, w, h)
+            label_classes (np.ndarray): [M] ground truth class labels
+        """
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 4)
+        detection_classes = np.asarray(detection_classes).reshape(-1)
+        detection_scores = np.asarray(detection_scores, dtype=np.float64).reshape(-1)
+        labels = np.asarray(labels, dtype=np.float64).reshape(-1, 4)
+        label_classes = np.asarray(label_classes).reshape(-1)
+        self.n_images += 1
+        for class_label in label_classes.tolist():
+            self.n_labels.setdefault(class_label, 0)
+        for class_label in dict.fromkeys(label_classes.tolist()):
+            class_labels = labels[label_classes == class_label]
+            self.n_labels[class_label] += len(class_labels)
+            detection_mask = detection_classes == class_label
+            if not np.any(detection_mask):
+                continue
+            scores = detection_scores[detection_mask]
+            iou = box_iou_matrix(class_labels, detections[detection_mask])
+            best = np.argmax(iou, axis=1)
+            best_iou = iou[np.arange(len(class_labels)), best]
+            ## a detection is counted as true positive once for every label it matched
+            n_matches = np.bincount(best[best_iou > self.iou_threshold], minlength=len(scores))
+            tp_scores = np.repeat(scores, n_matches)
+            fp_scores = scores[n_matches == 0]
+            self._add(class_label, np.concatenate([tp_scores, fp_scores]),
+                np.concatenate([np.ones(len(tp_scores), dtype=bool), np.zeros(len(fp_scores), dtype=bool)]))
+
+    def merge(self, other: 'StreamingDetectionEvaluator'):
+        """Add the matches of `other`, e.g. from another validation shard"""
+        if self.score_bins != other.score_bins or self.iou_threshold != other.iou_threshold:
+            raise RuntimeError("can't merge evaluator with different `score_bins` or `iou_threshold`")
+        for class_label, n in other.n_labels.items():
+            self.n_labels[class_label] = self.n_labels.get(class_label, 0) + n
+        for class_label, entry in other.detections.items():
+            if self.score_bins is None:
+                self._add(class_label, entry[0][:entry[2]], entry[1][:entry[2]])
+            elif class_label in self.detections:
+                self.detections[class_label][0] += entry[0]
+                self.detections[class_label][1] += entry[1]
+            else:
+                self.detections[class_label] = [entry[0].copy(), entry[1].copy()]
+        self.n_images += other.n_images
+        return self
+
+    def _curve(self, class_label):
+        n_labels = self.n_labels[class_label]
+        if self.score_bins is None:
+            scores, tp, size = self.detections[class_label]
+            scores, tp = scores[:size], tp[:size]
+            ## descending score, true positive first for equal score
+            order = np.lexsort((~tp, -scores))
+            tp = tp[order].astype(np.float64)
+            acc_tp, acc_fp = np.cumsum(tp), np.cumsum(1. - tp)
+        else:
+            ## highest bin first, true positives of a bin before its false positives
+            hist_tp, hist_fp = self.detections[class_label][0][::-1], self.detections[class_label][1][::-1]
+            acc_tp = np.cumsum(hist_tp).astype(np.float64)
+            acc_fp = (np.cumsum(hist_fp) - hist_fp).astype(np.float64)
+            keep = (hist_tp + hist_fp) > 0
+            acc_tp, acc_fp = acc_tp[keep], acc_fp[keep]
+        recall = acc_tp / n_labels
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.nan_to_num(acc_tp / (acc_fp + acc_tp), nan=0.)
+        ap = 0.
+        for pt in [0.1*i for i in range(0, 11)]:
+            mask = recall >= pt
+            ap += precision[mask].max() if np.any(mask) else 0.
+        ap /= 11
+        return ap, precision, recall
+
+    def evaluate(self, iou_threshold: Union[float, None] = None) -> List[Dict[str, Union[float, int]]]:
+        if iou_threshold is not None and iou_threshold != self.iou_threshold:
+            raise RuntimeError("streaming evaluator matches detections with `iou_threshold` {} on update, " \
+                "can't evaluate with {}".format(self.iou_threshold, iou_threshold))
+        results = []
+        for class_label in self.n_labels:
+            if class_label not in self.detections:
+                continue
+            class_ap, class_prec, class_recall = self._curve(class_label)
+            results.append({
+                "class": class_label,
+                "precision": class_prec,
+                "recall": class_recall,
+                "ap": class_ap,
+            })
+        mean_ap = sum(result['ap'] for result in results)
+        if len(self.n_labels):
+            mean_ap /= len(self.n_labels)
+        return results, mean_ap
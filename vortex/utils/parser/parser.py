@@ -129,9 +129,11 @@ def __dataloader_tree(required: bool = True, exp_step: ExperimentType = Experime
                                 docstring='dataloader currently only support pytorch DataLoader')
     loader = ExperimentNode('dataloader', parent=dataloader)
     loader_args = ExperimentNode('args', parent=dataloader)
-    # collater = ExperimentNode('collater', parent=dataloader)
-    # collater_class = ExperimentNode('collater', parent=collater)
-    # collater_args = ExperimentNode('args', parent=collater)
+    collater = ExperimentNode('collater', parent=dataloader, required=False,
+                              docstring='additional arguments for model collater, e.g. `padded`')
+    collater_args = ExperimentNode('args', parent=collater, required=False)
+    autotune = ExperimentNode('autotune', parent=dataloader, required=False,
+                              docstring='measure and select dataloader `num_workers`, `prefetch_factor`, `persistent_workers` and `pin_memory`')
     return dataloader
 
 
@@ -141,6 +143,13 @@ def __validation_tree(required: bool = True, exp_step: ExperimentType = Experime
     validation_args = ExperimentNode('args', parent=validation)
     validation_score = ExperimentNode('score_threshold', parent=validation_args, required=False)
     validation_iou = ExperimentNode('iou_threshold', parent=validation_args, required=False)
+    validation_pipelined = ExperimentNode('pipelined', parent=validation_args, required=False,
+                                          docstring='update results on a separate thread, overlapped with prediction')
+    validation_queue_size = ExperimentNode('queue_size', parent=validation_args, required=False)
+    validation_streaming = ExperimentNode('streaming', parent=validation_args, required=False,
+                                          docstring='detection evaluation matching detections per image as results arrive')
+    validation_curve_bins = ExperimentNode('curve_bins', parent=validation_args, required=False,
+                                           docstring='score bins for bounded-memory pr (and roc) curve')
     return validation
 
 
@@ -192,6 +201,12 @@ def __dataset_tree(required: bool = True, exp_step: ExperimentType = ExperimentT
             'dataset', parent=dataset_train, required=train_required, docstring='dataset class')
         dataset_train_args = ExperimentNode(
             'args', parent=dataset_train, required=train_required, docstring='arguments to be passed to dataset class')
+        dataset_train_subset = ExperimentNode(
+            'subset', parent=dataset_train, required=False, docstring='deterministic subset of dataset, `fraction` or `count` and `seed`')
+        dataset_train_bucket = ExperimentNode(
+            'aspect_ratio_bucket', parent=dataset_train, required=False, docstring='group images into aspect ratio buckets padded to rectangular shape, `n_buckets`, `stride` and `seed`')
+        dataset_train_threads = ExperimentNode(
+            'decode_threads', parent=dataset_train, required=False, docstring='number of threads decoding the images of a batch in each dataloader worker')
     if add_eval:
         dataset_eval = ExperimentNode(
             'eval', parent=dataset, required=eval_required, docstring='validation dataset')
@@ -199,6 +214,14 @@ def __dataset_tree(required: bool = True, exp_step: ExperimentType = ExperimentT
             'dataset', parent=dataset_eval, required=eval_required, docstring='dataset class')
         dataset_eval_args = ExperimentNode(
             'args', parent=dataset_eval, required=eval_required, docstring='arguments to be passed to dataset class')
+        dataset_eval_subset = ExperimentNode(
+            'subset', parent=dataset_eval, required=False, docstring='deterministic subset of dataset, `fraction` or `count` and `seed`')
+        dataset_eval_threads = ExperimentNode(
+            'decode_threads', parent=dataset_eval, required=False, docstring='number of threads decoding the images of a batch in each dataloader worker')
+        dataset_eval_loader = ExperimentNode(
+            'dataloader', parent=dataset_eval, required=False, docstring='validation dataloader, workers are kept across validation rounds')
+        dataset_eval_loader_args = ExperimentNode(
+            'args', parent=dataset_eval_loader, required=False, docstring='arguments for validation pytorch DataLoader, e.g. `num_workers`')
     dataloader = __dataloader_tree(required=train_required)
     dataloader.parent = dataset
     return dataset
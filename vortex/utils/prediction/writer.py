@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+from pathlib import Path
+from typing import Union, List, Dict, Any
+
+__all__ = [
+    'IMAGE_EXTENSIONS',
+    'list_images',
+    'prediction_record',
+    'BulkCheckpoint',
+    'JSONLinesWriter',
+    'ParquetWriter',
+    'create_writer',
+]
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.jpe', '.png', '.bmp', '.tif', '.tiff', '.webp']
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+
+def list_images(sources: List[Union[str, Path]]) -> List[str]:
+    """Image paths of `sources` in deterministic order
+
+    Each source may be an image file, a directory (walked recursively, files with
+    `IMAGE_EXTENSIONS` sorted by path) or a `.txt` file listing one image path per line.
+    """
+    paths = []
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            paths.extend(sorted(str(path) for path in source.rglob('*')
+                                if path.suffix.lower() in IMAGE_EXTENSIONS and path.is_file()))
+        elif source.suffix.lower() == '.txt':
+            with open(str(source)) as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif source.exists():
+            paths.append(str(source))
+        else:
+            raise RuntimeError("image source '%s' doesn't exist" % source)
+    return paths
+
+
+def prediction_record(path: str, prediction: Union[Dict, None], error: Union[str, None] = None) -> Dict[str, Any]:
+    """Record of `prediction` of image `path` to be written, with every prediction value as array"""
+    record = {'path': str(path), 'error': error}
+    for key, value in (prediction or {}).items():
+        record[key] = np.asarray(value) if value is not None else None
+    return record
+
+
+def _serializable(record: Dict) -> Dict:
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in record.items()}
+
+
+def _atomic_write(path: Path, content: str):
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, str(path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BulkCheckpoint:
+    """Progress of bulk prediction written next to its output
+
+    Holds the number of images whose records are durably written, the writer state needed to
+    discard records written after it (e.g. file offset) and the identity of the run, so a
+    run with a different model or image list doesn't resume from it.
+
+    Args:
+        output (Union[str,Path]): bulk prediction output path
+        identity (dict): json-serializable identity of the run, e.g. model path and image list hash
+    """
+
+    def __init__(self, output: Union[str, Path], identity: Dict):
+        output = Path(output)
+        self.path = output.parent / (output.name + CHECKPOINT_SUFFIX)
+        self.identity = hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.done = 0
+        self.state = {}
+
+    @staticmethod
+    def hash_paths(paths: List[str]) -> str:
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(path.encode('utf-8'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    def load(self) -> bool:
+        """Restore progress, False if there is no checkpoint to resume"""
+        if not self.path.is_file():
+            return False
+        with open(str(self.path)) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('identity') != self.identity:
+            raise RuntimeError("checkpoint '%s' belongs to a different model, image list or arguments, "
+                               "remove it or disable resume to overwrite the output" % self.path)
+        self.done, self.state = checkpoint['done'], checkpoint['state']
+        return True
+
+    def save(self, done: int, state: Dict):
+        self.done, self.state = done, state
+        _atomic_write(self.path, json.dumps({'identity': self.identity, 'done': done, 'state': state}))
+
+    def remove(self):
+        if self.path.is_file():
+            self.path.unlink()
+
+
+class JSONLinesWriter:
+    """Append prediction records to a JSON Lines file, one record per line
+
+    Args:
+        path (Union[str,Path]): output file
+        state (dict, optional): checkpointed state to resume from, records after it are discarded. \
+                                Defaults to None, start a new file.
+    """
+
+    def __init__(self, path: Union[str, Path], state: Union[Dict, None] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if state:
+            self.file = open(str(self.path), 'r+')
+            self.file.truncate(state['offset'])
+            self.file.seek(state['offset'])
+        else:
+            self.file = open(str(self.path), 'w')
+
+    def write(self, records: List[Dict]):
+        self.file.write(''.join(json.dumps(_serializable(record)) + '\n' for record in records))
+
+    def commit(self, final: bool = False) -> Dict:
+        """Make written records durable, returns the writer state to checkpoint"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'offset': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Write prediction records to a directory of Parquet files, one file per commit
+
+    The directory can be read as a single table with `pyarrow.dataset.dataset(path)`.
+    Prediction arrays are stored as (nested) list of float32 columns, one per field of the model
+    `prediction_format`, whose number of dimension is known from the field 'axis' of per-image output
+    (e.g. one row per image for classification, rows of detections for detection).
+
+    Args:
+        path (Union[str,Path]): output directory
+        prediction_format (dict): model output format, field name to 'indices' and 'axis'
+        state (dict, optional): checkpointed state to resume from, files after it are removed. \
+                                Defaults to None, start a new directory.
+    """
+
+    def __init__(self, path: Union[str, Path], prediction_format: Dict, state: Union[Dict, None] = None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("unable to import pyarrow, required for parquet output, "
+                              "you can install it using `pip3 install pyarrow`")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.part = state['part'] if state else 0
+        ## remove parts written after the checkpoint
+        for part in self.path.glob('part-*.parquet'):
+            if int(part.stem.split('-')[-1]) >= self.part:
+                part.unlink()
+        ## field of per-image output of 1 dimension is a single row, otherwise rows of the image
+        self.schema = self._schema({key: int(fmt['axis']) + 1 for key, fmt in sorted(prediction_format.items())})
+        self.records = []
+
+    def _schema(self, columns: Dict[str, int]):
+        fields = [('path', self.pa.string()), ('error', self.pa.string())]
+        for key, ndim in columns.items():
+            dtype = self.pa.float32()
+            for _ in range(ndim):
+                dtype = self.pa.list_(dtype)
+            fields.append((key, dtype))
+        return self.pa.schema(fields)
+
+    def write(self, records: List[Dict]):
+        self.records.extend(records)
+
+    def commit(self, final: bool = False) -> Dict:
+        """Write records since the last commit as a new part file, returns the writer state to checkpoint"""
+        if self.records:
+            table = self.pa.Table.from_pylist([_serializable(record) for record in self.records],
+                                              schema=self.schema)
+            filename = self.path / 'part-{:05d}.parquet'.format(self.part)
+            tmp_filename = filename.parent / ('.' + filename.name + '.tmp')
+            self.pq.write_table(table, str(tmp_filename))
+            os.replace(str(tmp_filename), str(filename))
+            self.part += 1
+            self.records = []
+        return {'part': self.part}
+
+    def close(self):
+        pass
+
+
+def create_writer(path: Union[str, Path], output_format: Union[str, None] = None, state: Union[Dict, None] = None,
+                  prediction_format: Union[Dict, None] = None):
+    """Prediction record writer of `output_format` ('jsonl' or 'parquet'), inferred from `path` suffix if None,
+    'parquet' requires the model `prediction_format` for its schema
+    """
+    if output_format is None:
+        output_format = 'parquet' if Path(path).suffix.lower() == '.parquet' else 'jsonl'
+    if output_format == 'jsonl':
+        return JSONLinesWriter(path, state)
+    elif output_format == 'parquet':
+        if prediction_format is None:
+            raise RuntimeError("expects model `prediction_format` for parquet output")
+        return ParquetWriter(path, prediction_format, state)
+    raise RuntimeError("unsupported bulk prediction output format %s, supported : `jsonl`, `parquet`" % output_format)
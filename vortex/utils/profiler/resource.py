@@ -1,3 +1,4 @@
+import os
 import matplotlib
 import matplotlib.pyplot as plt
 import re
@@ -55,6 +56,7 @@ class CPUMonitor(threading.Thread) :
         super(CPUMonitor, self).__init__(*args, **kwargs)
         self.name = name
         self.cpu_percent_data = []
+        self.cpus = None
         self.cv = threading.Condition()
         self.running = False
         self.dt = dt
@@ -69,8 +71,14 @@ class CPUMonitor(threading.Thread) :
     def run(self) :
         self.running = True
         running = True
+        ## only the cpus the process may run on, e.g. backend process of parallel validation pinned to
+        ## its own cpus, so the load of other processes on other cpus is not reported
+        if hasattr(os, 'sched_getaffinity') :
+            self.cpus = sorted(os.sched_getaffinity(0))
         while running :
             cpu_percent = psutil.cpu_percent(interval=self.dt, percpu=True)
+            if self.cpus is not None :
+                cpu_percent = [cpu_percent[cpu] for cpu in self.cpus if cpu < len(cpu_percent)]
             self.cpu_percent_data.append(cpu_percent)
             with self.cv :
                 running = self.running
@@ -78,6 +86,7 @@ class CPUMonitor(threading.Thread) :
     def report(self) :
         results = dict(
             cpu_percent=self.cpu_percent_data,
+            cpus=self.cpus,
         )
         return results
     
@@ -93,7 +102,8 @@ class CPUMonitor(threading.Thread) :
         plt.gcf().set_size_inches((6.4,9.6))
         cpu_data_array = np.asarray(self.cpu_percent_data)
         n_cpu = 1 if len(cpu_data_array.shape)==1 else cpu_data_array.shape[-1]
-        columns = ['cpu{}'.format(i) for i in range(n_cpu)] if n_cpu > 1 else ['cpu']
+        cpus = self.cpus if self.cpus is not None and len(self.cpus) == n_cpu else range(n_cpu)
+        columns = ['cpu{}'.format(i) for i in cpus] if n_cpu > 1 else ['cpu']
         linewidth = 0.75
         cpu_data = pd.DataFrame(
             cpu_data_array, columns=columns
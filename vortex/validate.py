@@ -2,11 +2,11 @@ import argparse
 import logging
 
 from vortex.utils.parser import load_config, check_config
-from vortex.core.pipelines import PytorchValidationPipeline
 
 description='Vortex Pytorch model validation pipeline; successful runs will produce autogenerated reports'
 
 def main(args):
+    from vortex.core.pipelines import PytorchValidationPipeline
 
     config = load_config(args.config)
     check_result = check_config(config, 'validate')
@@ -14,12 +14,20 @@ def main(args):
     if not check_result.valid:
         raise RuntimeError("invalid config : %s" % str(check_result))
     weights_file=args.weights
+    prediction_cache = None
+    if args.cache_dir is not None:
+        from vortex.core.engine.validator.prediction_cache import PredictionCache
+        prediction_cache = PredictionCache(args.cache_dir, max_size=args.cache_size)
+        if args.clear_cache:
+            prediction_cache.invalidate()
 
     validation_executor = PytorchValidationPipeline(config=config,
                                                      weights = weights_file,
                                                      backends = args.devices,
-                                                     generate_report = True)
-    eval_results = validation_executor.run(batch_size=args.batch_size)
+                                                     generate_report = True,
+                                                     prediction_cache = prediction_cache)
+    eval_results = validation_executor.run(batch_size=args.batch_size, parallel=args.parallel,
+                                           shards=args.shards)
     if 'pr_curves' in eval_results :
         eval_results.pop('pr_curves')
     print('validation results: {}'.format(
@@ -37,6 +45,11 @@ def add_parser(parent_parser,subparsers = None):
     parser.add_argument("--quiet", dest='debug', action='store_false')
     parser.add_argument("-d","--devices", default=[], nargs="*", help='computation device to be used for prediction, possible to list multiple devices')
     parser.add_argument("-b","--batch-size", default=1, type=int, help='batch size for validation')
+    parser.add_argument("--parallel", action='store_true', help='validate multiple backends concurrently, each in its own process pinned to a disjoint set of cpus')
+    parser.add_argument("--shards", default=1, type=int, help='split validation dataset into shards validated concurrently, each in its own process, results are merged exactly')
+    parser.add_argument("--cache-dir", default=None, help='prediction cache directory, predictions are reused when the same model file is validated again on the same dataset')
+    parser.add_argument("--cache-size", default=1024, type=float, help='maximum size of prediction cache in MB, least recently used entries are removed')
+    parser.add_argument("--clear-cache", action='store_true', help='remove every prediction cache entry before validation')
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description=description)
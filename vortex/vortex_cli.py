@@ -12,7 +12,11 @@ from vortex import (
     hypopt,
     predict,
     ir_runtime_predict,
-    ir_runtime_validate
+    ir_runtime_validate,
+    list_datasets,
+    convert_shards,
+    materialize,
+    serve
 )
 
 STAGES = [
@@ -22,7 +26,11 @@ STAGES = [
     hypopt,
     predict,
     ir_runtime_predict,
-    ir_runtime_validate
+    ir_runtime_validate,
+    list_datasets,
+    convert_shards,
+    materialize,
+    serve
 ]
 
 def main():
@@ -5,6 +5,98 @@ from pathlib import Path
 from collections import namedtuple, OrderedDict
 from typing import Union, List, Dict, Tuple, Any
 
+from vortex_runtime.letterbox import letterbox, letterbox_batch
+
+IMAGE_INDEX = 'image_index'
+
+class ColumnarResults(dict):
+    """
+    prediction results of a batch in columnar layout;
+    one array per output field holding the rows (e.g. detections) of every image,
+    grouped by image in batch order, and `image_index` column of the image of each row;
+    `row_per_image` is True when every image has exactly one row, e.g. classification
+    """
+    def __init__(self, columns : Dict[str,np.ndarray], n_images : int, row_per_image : bool = False) :
+        super(ColumnarResults, self).__init__(columns)
+        self.n_images = n_images
+        self.row_per_image = row_per_image
+
+    @property
+    def fields(self) -> List[str] :
+        return [key for key in self.keys() if key != IMAGE_INDEX]
+
+    def _bounds(self) -> np.ndarray :
+        if self.row_per_image :
+            return np.arange(self.n_images + 1)
+        return np.searchsorted(self[IMAGE_INDEX], np.arange(self.n_images + 1))
+
+    def head(self, n : int) -> 'ColumnarResults' :
+        """
+        results of the first `n` images, e.g. to drop padded batch slot(s); columns are views
+        """
+        if n >= self.n_images :
+            return self
+        end = self._bounds()[n]
+        return ColumnarResults({key: value[:end] for key, value in self.items()},
+            n_images=n, row_per_image=self.row_per_image)
+
+    def split(self) -> List[Dict[str,np.ndarray]] :
+        """
+        per-image results, same layout as `BaseRuntime` results as dict;
+        values are views of the columns, field is None for image without row
+        """
+        fields = self.fields
+        if self.row_per_image :
+            return [{key: self[key][i] for key in fields} for i in range(self.n_images)]
+        bounds = self._bounds()
+        return [{key: self[key][start:end] if end > start else None for key in fields}
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def format_columns(outputs : Union[np.ndarray,List[np.ndarray]], output_format : Dict[str,Dict]) -> ColumnarResults :
+    """
+    format batched model `outputs`, array or list of per-image arrays, to columnar results;
+    each field is taken once from the rows of every image, per `output_format` 'indices' and 'axis'
+    of per-image output; per-image output of 1 dimension is a single row
+    """
+    n_images = len(outputs)
+    if isinstance(outputs, np.ndarray) and outputs.ndim >= 2 and all(outputs.shape) :
+        ## uniform batch, rows are a view of the outputs
+        image_ndim = outputs.ndim - 1
+        rows = outputs if image_ndim == 1 else outputs.reshape((-1,) + outputs.shape[2:])
+        counts = np.full(n_images, 1 if image_ndim == 1 else outputs.shape[1])
+    else :
+        outputs = [np.asarray(output) for output in outputs]
+        image_ndim = max((output.ndim for output in outputs), default=1)
+        rows = [output.reshape((1,) + output.shape) if output.ndim == 1 else output
+            for output in outputs]
+        counts = np.array([len(row) if all(row.shape) else 0 for row in rows], dtype=np.int64)
+        rows = [row for row, count in zip(rows, counts) if count]
+        rows = np.concatenate(rows) if len(rows) else None
+    ## axis of per-image output of 1 dimension is shifted by row axis
+    shift = 1 if image_ndim == 1 else 0
+    columns = {}
+    for key, fmt in output_format.items() :
+        if rows is None :
+            columns[key] = np.zeros((0, len(fmt['indices'])), dtype=np.float32)
+            continue
+        columns[key] = np.take(rows, indices=fmt['indices'], axis=int(fmt['axis']) + shift)
+    columns[IMAGE_INDEX] = np.repeat(np.arange(n_images), counts)
+    return ColumnarResults(columns, n_images=n_images,
+        row_per_image=image_ndim == 1 and bool(np.all(counts == 1)))
+
+
+def aligned_empty(shape : Tuple[int,...], dtype, alignment : int = 64) -> np.ndarray :
+    """
+    uninitialized array of `shape` whose data starts at `alignment` bytes boundary
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = (-raw.ctypes.data) % alignment
+    return raw[offset:offset + nbytes].view(dtype).reshape(shape)
+
+
 class BaseRuntime:
     """
     Standardized runtime class;
@@ -49,9 +141,35 @@ class BaseRuntime:
         self.input_specs = input_specs
         assert all(isinstance(name, str) for name in class_names)
         self.class_names = class_names
+        self._input_buffer = None
 
     def predict(self, *args, **kwargs):
         raise NotImplementedError
+
+    def input_buffer(self) -> Union[np.ndarray,None] :
+        """
+        NHWC batch buffer of 'input' spec shape and type, allocated once and owned by the runtime;
+        images may be resized straight into its slots (see `resize_batch` `dst`)
+        and the same buffer passed to every call, so steady-state inference doesn't allocate input;
+        the buffer is overwritten by the next batch, calls sharing it must not be concurrent;
+        None if 'input' type is not uint8, the type of decoded images
+        """
+        if self._input_buffer is None :
+            spec = self.input_specs['input']
+            ## note : onnx input dtype may include 'tensor()', e.g. 'tensor(uint8)'
+            dtype = spec['type'].replace('tensor(','').replace(')','')
+            if dtype != 'uint8' :
+                return None
+            shape = spec['shape']
+            n, h, w, c = shape if shape[-1] == 3 else tuple(shape[i] for i in [0,2,3,1])
+            self._input_buffer = self._allocate_input_buffer((n, h, w, c), np.dtype(dtype))
+        return self._input_buffer
+
+    def _allocate_input_buffer(self, shape : Tuple[int,int,int,int], dtype : np.dtype) -> np.ndarray :
+        """
+        allocate `input_buffer`, subclass may override e.g. to use page-locked memory
+        """
+        return aligned_empty(shape, dtype)
     
     @staticmethod
     def is_available() :
@@ -61,19 +179,40 @@ class BaseRuntime:
     def resize_stretch(image : np.ndarray, size : Tuple[int,int]) :
         return cv2.resize(image, size)
     
-    ## TODO : implement resize pad
-    # @staticmethod
-    # def resize_pad(image : np.ndarray, size : Tuple[int,int]) :
-    #     return image
+    @staticmethod
+    def resize_pad(image : np.ndarray, size : Tuple[int,int]) :
+        """
+        resize keeping aspect ratio and pad to `size` (height, width), see `letterbox`
+        """
+        image, _, _ = letterbox(image, size)
+        return image
 
     @staticmethod
-    def resize_batch(images : List[np.ndarray], size : Tuple[int,int,int,int], resize_kind='stretch') :
+    def resize_batch(images : List[np.ndarray], size : Tuple[int,int,int,int], resize_kind='stretch', return_params=False,
+                     dst : Union[np.ndarray,None] = None) :
         """
         helper function to resize list of 
         np.ndarray (of possibly different size) 
-        to single np array of same size
+        to single np array of same size;
+        with `resize_kind` 'pad', images are letterboxed directly into the batch array
+        and `return_params` additionally returns per-image scales and offsets;
+        images are resized into slots of preallocated NHWC `dst` (e.g. `input_buffer`) if given
         """
-        assert resize_kind in ['stretch'] and len(size)==4
+        assert resize_kind in ['stretch', 'pad'] and len(size)==4
+        if resize_kind == 'pad':
+            batch_image, scales, offsets = letterbox_batch(images, size, dst=dst)
+            return (batch_image, scales, offsets) if return_params else batch_image
+        if dst is not None:
+            _, h, w, _ = dst.shape
+            if dst.shape[1:] != (h, w) + images[0].shape[2:] or dst.dtype != images[0].dtype \
+                or not dst.flags['C_CONTIGUOUS'] :
+                ## cv2 would silently write into a new array instead
+                raise RuntimeError("expects `dst` to be C-contiguous array of images dtype %s, got shape %s and dtype %s"
+                                   % (images[0].dtype, dst.shape, dst.dtype))
+            for i, image in enumerate(images):
+                cv2.resize(image, (w,h), dst=dst[i])
+            dst[len(images):] = 0
+            return (dst, None, None) if return_params else dst
         n, h, w, c = size if size[-1]==3 else tuple(size[i] for i in [0,3,1,2])
         resize = lambda x: BaseRuntime.resize_stretch(x, (h,w))
         dtype = images[0].dtype
@@ -81,19 +220,18 @@ class BaseRuntime:
         batch_pad = [np.zeros((h,w,c),dtype=dtype)] * n_pad
         batch_image = list(map(resize, images))
         batch_image = batch_image + batch_pad
-        return np.stack(batch_image)
+        batch_image = np.stack(batch_image)
+        if return_params:
+            return batch_image, None, None
+        return batch_image
 
-    def __call__(self, *args, **kwargs):
+    def __call__(self, *args, columnar=False, **kwargs):
+        """
+        predict and format outputs, as `ColumnarResults` of the batch if `columnar`,
+        otherwise as list of `result_type` per image
+        """
         outputs = self.predict(*args, **kwargs)
-        results = []
-        for output in outputs:
-            result = {
-                key: np.take(
-                    output, axis=int(fmt['axis']),
-                    indices=fmt['indices'],
-                ) if all(output.shape) else None 
-                for key, fmt in self.output_format.items()
-            }
-            result = self.result_type(**result)
-            results.append(result)
-        return results
+        results = format_columns(outputs, self.output_format)
+        if columnar :
+            return results
+        return [self.result_type(**result) for result in results.split()]
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+from typing import Union, List, Tuple
+
+__all__ = [
+    'letterbox_params',
+    'letterbox',
+    'letterbox_batch',
+    'letterbox_to_original',
+]
+
+
+def letterbox_params(image_shape: Tuple[int, int], size: Tuple[int, int]):
+    """Compute letterbox scale and offset of an image
+
+    Args:
+        image_shape (Tuple[int,int]): (height, width) of the image
+        size (Tuple[int,int]): (height, width) of the letterboxed image
+
+    Returns:
+        Tuple[float, Tuple[int,int], Tuple[int,int]]: scale, (offset_x, offset_y) and resized (width, height)
+    """
+    height, width = image_shape[:2]
+    scale = min(size[0] / height, size[1] / width)
+    new_width = min(int(round(width * scale)), size[1])
+    new_height = min(int(round(height * scale)), size[0])
+    offset_x = (size[1] - new_width) // 2
+    offset_y = (size[0] - new_height) // 2
+    return scale, (offset_x, offset_y), (new_width, new_height)
+
+
+def letterbox(image: np.ndarray, size: Tuple[int, int], dst: Union[np.ndarray, None] = None,
+              interpolation: int = cv2.INTER_LINEAR):
+    """Resize image keeping its aspect ratio and pad it to `size`, centered;
+    the resize and pad is done with a single `cv2.warpAffine` into `dst`
+
+    Args:
+        image (np.ndarray): image with layout HWC or HW
+        size (Tuple[int,int]): (height, width) of the letterboxed image
+        dst (np.ndarray, optional): preallocated C-contiguous destination buffer of shape (height, width[, channel])
+            and the same dtype as `image`, e.g. a slice of batch array. Defaults to None, a new array is allocated.
+        interpolation (int, optional): OpenCV interpolation flag. Defaults to cv2.INTER_LINEAR.
+
+    Returns:
+        Tuple[np.ndarray, float, Tuple[int,int]]: letterboxed image, scale and (offset_x, offset_y);
+            absolute coordinate in original image is mapped to `coord * scale + offset`
+    """
+    height, width = int(size[0]), int(size[1])
+    shape = (height, width) + tuple(image.shape[2:])
+    if dst is None:
+        dst = np.empty(shape, dtype=image.dtype)
+    elif dst.shape != shape or dst.dtype != image.dtype or not dst.flags['C_CONTIGUOUS']:
+        ## cv2 would silently write into a new array instead
+        raise RuntimeError("expects letterbox `dst` to be C-contiguous array of shape %s and dtype %s, "
+                           "got shape %s and dtype %s" % (shape, image.dtype, dst.shape, dst.dtype))
+    scale, (offset_x, offset_y), (new_width, new_height) = letterbox_params(image.shape, (height, width))
+    scale_x, scale_y = new_width / image.shape[1], new_height / image.shape[0]
+    ## pixel center aligned, equivalent to cv2.resize followed by constant padding
+    matrix = np.array([
+        [scale_x, 0., offset_x + 0.5 * scale_x - 0.5],
+        [0., scale_y, offset_y + 0.5 * scale_y - 0.5]], dtype=np.float64)
+    dst = cv2.warpAffine(image, matrix, (width, height), dst=dst, flags=interpolation,
+        borderMode=cv2.BORDER_REPLICATE)
+    ## replicated border only used for interpolation at image edge, clear the padding
+    dst[:offset_y] = 0
+    dst[offset_y + new_height:] = 0
+    dst[:, :offset_x] = 0
+    dst[:, offset_x + new_width:] = 0
+    return dst, scale, (offset_x, offset_y)
+
+
+def letterbox_batch(images: List[np.ndarray], size: Tuple[int, int, int, int], dst: Union[np.ndarray, None] = None):
+    """Letterbox list of images (of possibly different size) into a single batch array
+
+    Args:
+        images (List[np.ndarray]): list of HWC images
+        size (Tuple[int,int,int,int]): batch shape, either NHWC or NCHW (channel is deduced from last axis == 3)
+        dst (np.ndarray, optional): preallocated NHWC batch buffer. Defaults to None, a new array is allocated.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: batch array NHWC, scales [N] and offsets [N,2] of (x, y),
+            remaining batch slot(s) are zero-filled
+    """
+    assert len(size) == 4
+    n, h, w, c = size if size[-1] == 3 else tuple(size[i] for i in [0, 2, 3, 1])
+    assert len(images) <= n, "expects 'images' <= n batch ({}) got {}".format(n, len(images))
+    if dst is None:
+        dst = np.empty((n, h, w, c), dtype=images[0].dtype)
+    scales = np.ones(n, dtype=np.float32)
+    offsets = np.zeros((n, 2), dtype=np.float32)
+    for i, image in enumerate(images):
+        _, scales[i], offsets[i] = letterbox(image, (h, w), dst=dst[i])
+    dst[len(images):] = 0
+    return dst, scales, offsets
+
+
+def letterbox_to_original(coordinates: np.ndarray, size: Tuple[int, int], scale: float,
+                          offset: Tuple[float, float]) -> np.ndarray:
+    """Map relative coordinates on letterboxed image to absolute coordinates on original image
+
+    Args:
+        coordinates (np.ndarray): relative coordinates with interleaved x, y on last axis,
+            e.g. bounding box x1, y1, x2, y2 or landmarks
+        size (Tuple[int,int]): (height, width) of the letterboxed image
+        scale (float): letterbox scale
+        offset (Tuple[float,float]): letterbox (offset_x, offset_y)
+
+    Returns:
+        np.ndarray: absolute coordinates on original image
+    """
+    coordinates[..., 0::2] = (coordinates[..., 0::2] * size[1] - offset[0]) / scale
+    coordinates[..., 1::2] = (coordinates[..., 1::2] * size[0] - offset[1]) / scale
+    return coordinates
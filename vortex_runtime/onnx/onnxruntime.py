@@ -1,8 +1,6 @@
-import onnx
 import numpy as np
 
 from vortex_runtime.basic_runtime import BaseRuntime
-from vortex_runtime.onnx.helper import get_output_format, get_input_specs, get_output_names, get_class_names
 
 from pathlib import Path
 from collections import OrderedDict
@@ -25,7 +23,9 @@ class OnnxRuntime(BaseRuntime) :
         'parallel' : 1,
     }
     def __init__(self, model : Union[str,Path], providers : Any, fallback : bool, input_name : str = 'input', output_name : Union[str,List[str]] = 'output', execution_mode : Union[str,int] = 'sequential', graph_optimization_level : Union[str,int] = 'basic') :
+        import onnx
         import onnxruntime
+        from vortex_runtime.onnx.helper import get_output_format, get_input_specs, get_output_names, get_class_names
         sess_options = onnxruntime.SessionOptions()
         if graph_optimization_level in OnnxRuntime.graph_optimization_level.keys() :
             graph_optimization_level = OnnxRuntime.graph_optimization_level[graph_optimization_level]
@@ -1,4 +1,3 @@
-import torch
 import numpy as np
 
 from vortex_runtime.basic_runtime import BaseRuntime
@@ -6,6 +5,9 @@ from pathlib import Path
 from typing import Union, List
 from collections import OrderedDict
 
+## torch is imported inside each method, so that importing `vortex_runtime`
+## (e.g. for onnx runtime) doesn't pay for torch
+
 __all__ = [
     "TorchScriptRuntime", 
     "TorchScriptRuntimeCpu", 
@@ -13,8 +15,9 @@ __all__ = [
 ]
 
 class TorchScriptRuntime(BaseRuntime):
-    def __init__(self, model: Union[str, Path, torch.nn.Module], device: Union[str, torch.device], 
+    def __init__(self, model: Union[str, Path, 'torch.nn.Module'], device: Union[str, 'torch.device'], 
                  *args, **kwargs):
+        import torch
         if isinstance(model, (str, Path)):
             if not str(model).endswith('.pt') or str(model).endswith('.pth'):
                 raise RuntimeError("Unknown model file extension from {}".format(str(model)))
@@ -38,7 +41,7 @@ class TorchScriptRuntime(BaseRuntime):
         input_spec = OrderedDict([
             (name.replace("_input_shape", ""), {
                 "shape": shape.tolist(), 
-                "type": "uint8" if name == "input" else "float"
+                "type": "uint8" if name == "input_input_shape" else "float"
             }) 
             for name, shape in self.model.named_buffers(recurse=False) if name.endswith("_input_shape")
         ])
@@ -57,6 +60,19 @@ class TorchScriptRuntime(BaseRuntime):
         self.input_pos = {
             name: getattr(self.model, name + '_input_pos').item() for name in input_spec.keys()
         }
+        ## tensors reused across calls : additional inputs by name as (value, tensor),
+        ## page-locked host and device copy of `input_buffer`
+        self._input_tensors = {}
+        self._pinned_input = None
+        self._device_input = None
+
+    def _allocate_input_buffer(self, shape, dtype):
+        import torch
+        if self.device.type != 'cuda':
+            return super(TorchScriptRuntime, self)._allocate_input_buffer(shape, dtype)
+        ## page-locked, so host to device copy of the buffer is asynchronous
+        self._pinned_input = torch.from_numpy(np.empty(shape, dtype=dtype)).pin_memory()
+        return self._pinned_input.numpy()
         
     ## TODO : check signature properly (?)
     def predict(self, x, *args, **kwargs) -> np.ndarray:
@@ -64,10 +80,16 @@ class TorchScriptRuntime(BaseRuntime):
         # args = {name: torch.tensor(value) for name, value in zip(self.input_specs, args)}
         # kwargs = {name: torch.tensor(value) for name, value in kwargs.items()}
         # kwargs = {**args, **kwargs}
+        import torch
 
         args, kwargs = self._resolve_inputs(*args, **kwargs)
         with torch.no_grad():
-            x = torch.as_tensor(x, device=self.device)
+            if self._pinned_input is not None and x is self._input_buffer:
+                if self._device_input is None:
+                    self._device_input = torch.empty_like(self._pinned_input, device=self.device)
+                x = self._device_input.copy_(self._pinned_input, non_blocking=True)
+            else:
+                x = torch.as_tensor(x, device=self.device)
             output = self.model(x, *args, **kwargs)
         if isinstance(output, torch.Tensor):
             output = output.cpu().numpy()
@@ -83,43 +105,52 @@ class TorchScriptRuntime(BaseRuntime):
         if device == "cpu":
             return True     # cpu runtime always available
         elif "cuda" in device:
+            import torch
             return torch.cuda.is_available()
         else:
             raise RuntimeError("Unknown device of '{}'".format(device))
 
     def _resolve_inputs(self, *args, **kwargs):
+        import torch
         args = list(args)
         for name, val in kwargs.items():
-            args.insert(self.input_pos[name]-1, torch.tensor(val, device=self.device))
+            ## tensor of the previous call is reused while its value doesn't change, e.g. thresholds
+            value, tensor = self._input_tensors.get(name, (None, None))
+            array = np.asarray(val)
+            if value is None or value.dtype != array.dtype or not np.array_equal(value, array):
+                tensor = torch.tensor(val, device=self.device)
+                self._input_tensors[name] = (array.copy(), tensor)
+            args.insert(self.input_pos[name]-1, tensor)
         return tuple(args), {}
 
 
 class TorchScriptRuntimeCpu(TorchScriptRuntime):
-    def __init__(self, model: Union[str, Path, torch.nn.Module], *args, **kwargs):
-        super(TorchScriptRuntimeCpu, self).__init__(model, device=torch.device("cpu"))
+    def __init__(self, model: Union[str, Path, 'torch.nn.Module'], *args, **kwargs):
+        super(TorchScriptRuntimeCpu, self).__init__(model, device="cpu")
 
     @staticmethod
     def is_available():
-        return TorchScriptRuntime.is_available(device=torch.device("cpu"))
+        return TorchScriptRuntime.is_available(device="cpu")
 
 class TorchScriptRuntimeCuda(TorchScriptRuntime):
-    def __init__(self, model: Union[str, Path, torch.nn.Module], device_id: Union[int] = None,
+    def __init__(self, model: Union[str, Path, 'torch.nn.Module'], device_id: Union[int] = None,
                  *args, **kwargs):
         if not self.is_valid_device(device_id):
             raise RuntimeError("CUDA GPU device {} is not available".format(device_id))
         device = "cuda"
         if device_id is not None:
             device = device + ":{}".format(device_id)
-        super(TorchScriptRuntimeCuda, self).__init__(model, device=torch.device(device))
+        super(TorchScriptRuntimeCuda, self).__init__(model, device=device)
 
     @staticmethod
     def is_available(device_id: Union[int] = None):
-        cuda_available = TorchScriptRuntime.is_available(device=torch.device("cuda"))
+        cuda_available = TorchScriptRuntime.is_available(device="cuda")
         valid = TorchScriptRuntimeCuda.is_valid_device(device_id)
         return cuda_available and valid
 
     @staticmethod
     def is_valid_device(device_id: Union[int] = None):
+        import torch
         if device_id is not None and device_id > 0:
             if device_id < 0 or device_id >= torch.cuda.device_count():
                 return False